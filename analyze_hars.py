@@ -0,0 +1,48 @@
+"""
+Summarise the load times of many HAR files, using every core of the box.
+
+    python analyze_hars.py hars/ --workers 8
+"""
+import argparse
+import os
+
+from modules.haralyzer.multihar import MultiHarParser, PERCENTILES
+
+
+def get_har_files(paths):
+    har_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            har_files += sorted(
+                os.path.join(path, f) for f in os.listdir(path) if f.endswith(".har")
+            )
+        else:
+            har_files.append(path)
+    return har_files
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    arg_parser.add_argument("paths", nargs="+", help="HAR files or directories of HAR files")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes (default: number of CPUs)")
+    arg_parser.add_argument("-p", "--page-id", default=None, help="only analyze pages with this ID")
+    args = arg_parser.parse_args(argv)
+
+    har_files = get_har_files(args.paths)
+    if not har_files:
+        arg_parser.error("no HAR files found")
+
+    multi_har = MultiHarParser(har_files=har_files, page_id=args.page_id, workers=args.workers)
+    summary = multi_har.summary()
+
+    columns = ["count", "mean", "stdev"] + [f"p{pct}" for pct in PERCENTILES]
+    print(f"Analyzed {len(multi_har.pages)} page(s) from {len(har_files)} HAR file(s)")
+    print(f"{'(ms)':<8}" + "".join(f"{column:>10}" for column in columns))
+    for asset_type, stats in summary.items():
+        print(f"{asset_type:<8}" + "".join(f"{str(stats[column]):>10}" for column in columns))
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
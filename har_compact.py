@@ -0,0 +1,35 @@
+"""
+Convert HAR files to the compact column cache read by HarParser.from_file.
+
+    python har_compact.py hars/
+"""
+import argparse
+import os
+import time
+
+from analyze_hars import get_har_files
+from modules.haralyzer.compact import CompactHar
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    arg_parser.add_argument("paths", nargs="+", help="HAR files or directories of HAR files")
+    arg_parser.add_argument("-f", "--force", action="store_true", help="rewrite caches that are up to date")
+    args = arg_parser.parse_args(argv)
+
+    for har_file in get_har_files(args.paths):
+        if not args.force and CompactHar.open(har_file) is not None:
+            print(f"{har_file}: up to date")
+            continue
+        start = time.time()
+        cache_path = CompactHar.write(har_file)
+        cache_size = sum(
+            os.path.getsize(os.path.join(cache_path, f)) for f in os.listdir(cache_path)
+        )
+        print(
+            f"{har_file}: {os.path.getsize(har_file)} -> {cache_size} bytes in {round(time.time() - start, 2)}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
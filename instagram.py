@@ -2,6 +2,7 @@ import os
 import time
 import json
 import random
+from functools import partial
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -10,23 +11,23 @@ from datetime import datetime
 
 from utils.applogger import apptest_logger, report_logger
 
-from browsermobproxy import Server
-
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 
 from utils.data import load_yaml, get_abs_path, save_har, get_filenames
-from utils.metrics import ms_to_s, convert_bytes, remove_size_suffix, gb_to_mb
-from utils.system import kill_existing_proc
+from utils.metrics import MediaStats, convert_bytes, get_overall_score, ms_to_s
 from utils.reports import ReportEntry, dump_report
 
-from modules.browser import FireFoxBrowser
+from modules.browser import ExtensionCapture, FireFoxBrowser, ProxyCapture
+from modules.pool import SessionPool
+from modules.apptests.base import ThinkTime
 from modules.apptests.instagram import BaseTest, InstagramTest
 
-from modules.haralyzer.assets import HarParser, HarPage
+from modules.haralyzer.aggregate import HarTail, aggregate_har_file
+from modules.haralyzer.filters import EntryFilter
 
 from utils.applogger import apptest_logger as logger
 
-from statistics import mean
 
 
 PATH = get_abs_path(__file__)
@@ -36,8 +37,29 @@ CFG = load_yaml(f"{PATH}/config.yaml")
 GLOBAL_DL_THREHOLD = CFG["global"]["download_threshold"]
 ENABLE_QUIC = CFG["global"]["enable_quic"]
 LANGUAGE = CFG["language"]
+BASE_URL = CFG["websites"]["thegram"].get("base_url", "https://www.instagram.com")
+# number of browsers that run at the same time, each in its own download dir under HAR_LOCATION
+BROWSER_WORKERS = CFG["global"].get("browser_workers", 1)
+# pause between the actions of the simulated user, (low, high) in seconds
+THINK_TIME = ThinkTime(*CFG["global"].get("think_time_seconds", (0.5, 2.0)))
+# how the network traffic is recorded: "extension" (devtools) or "proxy" (BrowserMob Proxy)
+CAPTURE = CFG["global"].get("capture", "extension")
 
 HOUR_IN_SECONDS = 3600
+HAR_LOCATION = f"{PATH}/hars"
+
+# images/video > than 0.2 jiggabytes are saved for repeatable tests
+TEST_URLS_CONTENT_TYPE = "(image|video)"
+TEST_URLS_CONTENT_SIZE = 200000
+
+# how often the live report pulls the new network entries from the browser
+LIVE_INTERVAL_SECONDS = 60
+
+
+def get_capture():
+    if CAPTURE == "proxy":
+        return ProxyCapture(api_url=CFG["global"].get("proxy_api_url"), poll_interval=LIVE_INTERVAL_SECONDS)
+    return ExtensionCapture()
 
 
 def choose_random_account():
@@ -48,83 +70,169 @@ def choose_random_account():
     return account
 
 
-def story_browsing(handle, duration):
-    account = choose_random_account()
+class LiveReport:
+    """
+    Pulls the network entries of a running browser session every ``interval``
+    seconds and folds the new ones into running totals, so there is feedback
+    during long sessions instead of only once the HAR file is exported. Pass
+    it as the on_tick callback of a test.
+    """
+
+    def __init__(
+        self,
+        browser,
+        har_filename,
+        dl_threshold,
+        interval=LIVE_INTERVAL_SECONDS,
+        save_urls=False,
+        content_type="(image|video|media|mp4)",
+    ):
+        self.browser = browser
+        self.har_filename = har_filename
+        self.dl_threshold = dl_threshold
+        self.interval = interval
+        self.tail = HarTail(
+            watches=get_watches(dl_threshold, content_type, save_urls),
+            keep_entries=["interesting"],
+        )
+        self._next_poll = time.monotonic() + interval
+
+    def __call__(self):
+        if time.monotonic() >= self._next_poll:
+            self.poll()
+
+    def poll(self):
+        self._next_poll = time.monotonic() + self.interval
+        try:
+            export = self.browser.get_har_entries(start=self.tail.offset)
+        except WebDriverException as e:
+            logger.debug(f"Could not export the HAR log of {self.har_filename!r}: {e}")
+            return []
+        if not export or "error" in export:
+            logger.debug(f"Could not export the HAR log of {self.har_filename!r}: {export}")
+            return []
+
+        new_entries = self.tail.update(export["entries"], offset=export["start"], pages=export["pages"])
+        pages = self.tail.pages
+        if pages:
+            page = pages[-1]
+            interesting_count = sum(p.interesting_count for p in pages)
+            logger.info(
+                f"{self.har_filename!r}: {len(new_entries)} new entries ({self.tail.entry_count} total), "
+                f"{interesting_count} images/videos above {self.dl_threshold} milliseconds, "
+                f"{MediaStats.from_page(page, 'image').describe('images')}, "
+                f"{MediaStats.from_page(page, 'video').describe('videos')}"
+            )
+        return new_entries
+
+    def report(self):
+        """
+        Report of everything seen so far, like the one analyze_harfile creates
+        from the exported HAR file
+        """
+        pages = self.tail.pages
+        if not pages:
+            return None
+        interesting_entries = [entry for page in pages for entry in page.get_files("interesting")]
+        first_start_time = interesting_entries[0].startTime if interesting_entries else None
+        return ReportEntry(pages[-1], interesting_entries, first_start_time, self.har_filename)
+
+
+def report_harfile(har_filename, browsing_time, save_urls=False, har_location=HAR_LOCATION):
+    report_entry = analyze_harfile(
+        har_filename=har_filename, browsing_time=browsing_time, dl_threshold=GLOBAL_DL_THREHOLD, save_urls=save_urls, har_location=har_location
+    )
+
+    if report_entry["report"]:
+        dump_report(
+            browsing_time, report_entry=report_entry['report'], root_path=PATH, dl_threshold=GLOBAL_DL_THREHOLD
+        )
+
+    return report_entry
+
+
+def _submit_report(analysis_executor, *args, **kwargs):
+    """
+    Runs the analysis of a HAR file on the analysis thread if there is one
+    (see SessionPool), otherwise right away
+    """
+    if analysis_executor:
+        return analysis_executor.submit(report_harfile, *args, **kwargs)
+    return report_harfile(*args, **kwargs)
+
+
+def story_browsing(handle, duration, live_interval=None, account=None, har_location=HAR_LOCATION, analysis_executor=None):
+    account = account or choose_random_account()
     timestamp = time.time()
     log_header = {"url": "https://instagram.com", "header_key": "x-fb-product-log", "header_value": f"ta:15:starlink-debug-{timestamp}"}
     loss_detect_header = {"url": "https://instagram.com", "header_key": "X-FB-Socket-Option", "header_value": "QUIC_ADAPTIVE_LOSS_DETECTION=1"}
     har_filename = f"instagram_{timestamp}-{'http3' if ENABLE_QUIC else 'http1.1-2'}"
 
-    with FireFoxBrowser(har_filename=har_filename, enable_quic=ENABLE_QUIC, headers=[log_header, loss_detect_header]) as browser:
+    with FireFoxBrowser(har_filename=har_filename, har_location=har_location, enable_quic=ENABLE_QUIC, headers=[log_header, loss_detect_header], capture=get_capture()) as browser:
+        live_report = LiveReport(browser, har_filename, GLOBAL_DL_THREHOLD, interval=live_interval) if live_interval else None
         ig = InstagramTest(
             username=account["username"],
             password=account["password"],
             driver=browser.driver,
             autologin=True,
             default_element_timeout=20,
-            searchbox_translation=LANGUAGE["component"]["searchbox"][LANGUAGE["selected"]]
+            searchbox_translation=LANGUAGE["component"]["searchbox"][LANGUAGE["selected"]],
+            on_tick=live_report,
+            think_time=THINK_TIME,
+            base_url=BASE_URL
         )
         
         ig.browse_stories(handle=handle, duration=duration)
 
     # generate report
-    report_entry = analyze_harfile(har_filename=har_filename, browsing_time=CFG["global"]["browsing_minutes"], dl_threshold=GLOBAL_DL_THREHOLD, save_urls=False)
-
-    if report_entry["report"]:
-        dump_report(
-            CFG["global"]["browsing_minutes"], report_entry=report_entry['report'], root_path=PATH, dl_threshold=GLOBAL_DL_THREHOLD
-        )
+    return _submit_report(analysis_executor, har_filename, CFG["global"]["browsing_minutes"], save_urls=False, har_location=har_location)
 
-    return
 
-def hashtag_browsing(hashtag, duration):
-    account = choose_random_account()
+def hashtag_browsing(hashtag, duration, live_interval=None, account=None, har_location=HAR_LOCATION, analysis_executor=None):
+    account = account or choose_random_account()
     timestamp = time.time()
     log_header = {"url": "https://instagram.com", "header_key": "x-fb-product-log", "header_value": f"ta:15:starlink-debug-{timestamp}"}
     loss_detect_header = {"url": "https://instagram.com", "header_key": "X-FB-Socket-Option", "header_value": "QUIC_ADAPTIVE_LOSS_DETECTION=1"}
     har_filename = f"instagram_{timestamp}-{'http3' if ENABLE_QUIC else 'http1.1-2'}"
 
-    with FireFoxBrowser(har_filename=har_filename, enable_quic=ENABLE_QUIC, headers=[log_header, loss_detect_header]) as browser:
+    with FireFoxBrowser(har_filename=har_filename, har_location=har_location, enable_quic=ENABLE_QUIC, headers=[log_header, loss_detect_header], capture=get_capture()) as browser:
+        live_report = LiveReport(browser, har_filename, GLOBAL_DL_THREHOLD, interval=live_interval, save_urls=True) if live_interval else None
         ig = InstagramTest(
             username=account["username"],
             password=account["password"],
             driver=browser.driver,
             autologin=True,
-            searchbox_translation=LANGUAGE["component"]["searchbox"][LANGUAGE["selected"]]
+            searchbox_translation=LANGUAGE["component"]["searchbox"][LANGUAGE["selected"]],
+            on_tick=live_report,
+            think_time=THINK_TIME,
+            base_url=BASE_URL
         )
         
         #ig.get_content(urls[-5:], wait=10)
         #ig.get_content(["https://google.com"], wait=10)
         ig.browse_hashtag(hashtag=hashtag, duration=duration)
 
-    report_entry = analyze_harfile(
-        har_filename=f"{har_filename}", browsing_time=duration, dl_threshold=GLOBAL_DL_THREHOLD, save_urls=True
-    )
-    dump_report(
-        duration, report_entry=report_entry['report'], root_path=PATH, dl_threshold=GLOBAL_DL_THREHOLD
-    )
-
-    return
+    return _submit_report(analysis_executor, har_filename, duration, save_urls=True, har_location=har_location)
 
 
 def visualize_harfile(har_filenames, filetype):
     filetype = filetype.lower()
 
-    for idx, har_filename in enumerate(hars):
+    for idx, har_filename in enumerate(har_filenames):
 
-        with open(f"hars/{har_filename}.har", "r") as f:
-            har_parser = HarParser(json.loads(f.read()))
-            first_start_time = None
-            interesting_entries = []
+        # stream the har file so only the plotted entries are kept in memory
+        pages = aggregate_har_file(
+            f"hars/{har_filename}.har",
+            watches=dict(plotted=EntryFilter(content_type=filetype, status_code="(200|206)")),
+            keep_entries=["plotted"],
+        )
+        if pages:
             for (
                 page
             ) in (
-                har_parser.pages
+                pages
             ):  # TODO: this function only supports one page really, this doesn't make a lot of sense
-                entries = page.filter_entries(
-                    content_type=filetype,
-                    status_code="(200|206)",
-                )
+                entries = page.get_files("plotted")
 
             if filetype == "image":
                 total_download_size = convert_bytes(page.image_size)
@@ -155,95 +263,75 @@ def visualize_harfile(har_filenames, filetype):
     plt.show()
 
 
-def analyze_harfile(har_filename, browsing_time, dl_threshold, save_urls=False, content_type="(image|video|media|mp4)"): # TODO: make more modular. method in instagramtest class?
-    with open(f"hars/{har_filename}.har", "r") as f:
-        har_parser = HarParser(json.loads(f.read()))
-        first_start_time = None
-        interesting_entries = []
-        num_entries = 0
-        page = None
-        for (
-            page
-        ) in (
-            har_parser.pages
-        ):  # TODO: this function only supports one page really, this doesn't make a lot of sense
-            entries = page.filter_entries(
-                content_type=content_type,
-                receive_time__gt=dl_threshold,
-                status_code="(200|206)",
-            )
-            num_entries = len(entries)
-            first_start_time = entries[0].startTime if num_entries else None
-            print(f"Analyzed har file: {har_filename!r}.har")
-            print(f"Browsed for {browsing_time} minute(s)")
-            for entry in entries:
-                interesting_entries.append(entry)
-                print(
-                    f"{entry.startTime} - Downloaded {entry.response.mimeType!r} ({convert_bytes(entry.response.bodySize)}) in {ms_to_s(entry.timings['receive'])} seconds from {entry.response.url.split('https://')[1].split('/')[0]} ({entry.serverAddress})"
-                )
-
-        print(f"First download time of image/video content {first_start_time}")
-        print(
-            f"Number of Images and Videos downloaded above {dl_threshold} milliseconds {num_entries}"
+def get_watches(dl_threshold, content_type, save_urls=False):
+    """
+    Filters of the entries that are reported on: the ones that took longer
+    than the download threshold, all media and the test URLs
+    """
+    watches = dict(
+        interesting=EntryFilter(
+            content_type=content_type,
+            receive_time__gt=dl_threshold,
+            status_code="(200|206)",
+        ),
+        media=EntryFilter(content_type=content_type),
+    )
+    if save_urls:
+        watches["test_urls"] = EntryFilter(
+            content_type=TEST_URLS_CONTENT_TYPE,
+            status_code="200",
+            content_size=TEST_URLS_CONTENT_SIZE,
         )
+    return watches
 
-        total_images_download_size = convert_bytes(page.image_size) if page else 0
-        total_images_load_time = ms_to_s(page.image_load_time) if page else 0
-        total_videos_download_size = convert_bytes(page.video_size) if page else 0
-        total_videos_load_time = ms_to_s(page.video_load_time) if page else 0
 
-        try:
-            images_score = round(
-                10.0
-                - (
-                    total_images_load_time
-                    / remove_size_suffix(
-                        gb_to_mb(total_images_download_size)
-                        if "G" in total_images_download_size
-                        else total_images_download_size
-                    )
-                ),
-                2,
-            )  # TODO: hacky but OK for now
-
-        except (ZeroDivisionError, TypeError):
-            images_score = 0
+def analyze_harfile(har_filename, browsing_time, dl_threshold, save_urls=False, content_type="(image|video|media|mp4)", har_location=HAR_LOCATION): # TODO: make more modular. method in instagramtest class?
+    # stream the har file, only the entries we report on are kept in memory
+    pages = aggregate_har_file(
+        f"{har_location}/{har_filename}.har",
+        watches=get_watches(dl_threshold, content_type, save_urls),
+        keep_entries=["interesting", "test_urls"],
+    )
+    first_start_time = None
+    interesting_entries = []
+    num_entries = 0
+    page = None
+    for (
+        page
+    ) in (
+        pages
+    ):  # TODO: this function only supports one page really, this doesn't make a lot of sense
+        entries = page.get_files("interesting")
+        num_entries = len(entries)
+        first_start_time = entries[0].startTime if num_entries else None
+        print(f"Analyzed har file: {har_filename!r}.har")
+        print(f"Browsed for {browsing_time} minute(s)")
+        for entry in entries:
+            interesting_entries.append(entry)
+            print(
+                f"{entry.startTime} - Downloaded {entry.response.mimeType!r} ({convert_bytes(entry.response.bodySize)}) in {ms_to_s(entry.timings['receive'])} seconds from {entry.response.url.split('https://')[1].split('/')[0]} ({entry.serverAddress})"
+            )
 
-        try:
-            videos_score = round(
-                10.0
-                - (
-                    total_videos_load_time
-                    / remove_size_suffix(
-                        gb_to_mb(total_videos_download_size)
-                        if "G" in total_videos_download_size
-                        else total_videos_download_size
-                    )
-                ),
-                2,
-            )  # TODO: hacky but OK for now
-        except (ZeroDivisionError, TypeError):
-            videos_score = 0
-
-        if images_score and videos_score:
-            overall_score = mean([images_score, videos_score])
-        
-        elif images_score and not videos_score:
-            overall_score = images_score
-        
-        elif videos_score and not images_score:
-            overall_score = videos_score 
+    print(f"First download time of image/video content {first_start_time}")
+    print(
+        f"Number of Images and Videos downloaded above {dl_threshold} milliseconds {num_entries}"
+    )
 
-        if page:
+    # numbers all the way, only formatted when printed
+    image_stats = MediaStats.from_page(page, "image")
+    video_stats = MediaStats.from_page(page, "video")
+    images_score = image_stats.score
+    videos_score = video_stats.score
+    overall_score = get_overall_score(images_score, videos_score)
 
-            print(f"Total Load time: {ms_to_s(page.get_load_time(content_type=content_type))}s")
-        
-            print(f"{len(page.video_files)} ({total_videos_download_size}) videos downloaded in {total_videos_load_time}")
+    if page:
 
-            print(
-                f"{len(page.image_files)} ({total_images_download_size}) images downloaded in {total_images_load_time} second(s). Images Score {images_score}. Videos Score {videos_score}"
-            )
-            print(f"Overall Score: {round(overall_score, 2)}")
+        print(f"Total Load time: {ms_to_s(page.media_load_time)}s")
+    
+        print(video_stats.describe("videos"))
+
+        print(f"{image_stats.describe('images')}. Images Score {images_score}. Videos Score {videos_score}")
+        print(f"Overall Score: {overall_score}")
 
 
     if page:
@@ -264,13 +352,9 @@ def analyze_harfile(har_filename, browsing_time, dl_threshold, save_urls=False,
 
 def generate_repeatable_test_urls(page):
     # get entry URLs for repeatable tests
-    content_type = "(image|video)"
-    content_size = 200000
-    dl_urls = [entry.response.url for entry in page.filter_entries(
-        content_type=content_type,
-        status_code="200",
-        content_size=content_size # images/video > than 0.2 jiggabytes
-            )]
+    content_type = TEST_URLS_CONTENT_TYPE
+    content_size = TEST_URLS_CONTENT_SIZE
+    dl_urls = [entry.response.url for entry in page.get_files("test_urls")]
     
     os.makedirs(TEST_DATA_PATH, exist_ok=True)
 
@@ -288,10 +372,17 @@ if __name__ == "__main__":
     # Randomized Test
     for _ in range(100000):
         try:
-            _ = hashtag_browsing(hashtag="cars", duration=1)
-            #_ = story_browsing(handle='"redbull"', duration=5)
-            #_ = story_browsing(handle="thekingofdiet", duration=5)
-            #_ = story_browsing(handle="theyoungtravelier", duration=5)
+            if BROWSER_WORKERS > 1:
+                pool = SessionPool(BROWSER_WORKERS, CFG["websites"]["thegram"]["accounts"], HAR_LOCATION)
+                results = pool.run([partial(hashtag_browsing, hashtag="cars", duration=1) for _ in range(BROWSER_WORKERS)])
+                # the pool returns the exceptions of the sessions, retry only if none of them ran
+                if all(isinstance(result, Exception) for result in results):
+                    raise results[0]
+            else:
+                _ = hashtag_browsing(hashtag="cars", duration=1)
+                #_ = story_browsing(handle='"redbull"', duration=5)
+                #_ = story_browsing(handle="thekingofdiet", duration=5)
+                #_ = story_browsing(handle="theyoungtravelier", duration=5)
             break
         except Exception as e:
             logger.debug(f"Exception running test. Did not run test for this time slot: {e}")
@@ -1,12 +1,101 @@
 import time
-from random import randint
+from random import randint, triangular
 from selenium import webdriver
-from typing import List, Optional
+from typing import Callable, List, Optional
+
+# Installs a PerformanceObserver that remembers when the last resource of the
+# document finished loading, and returns how long ago that was in ms
+NETWORK_IDLE_SCRIPT = """
+    if (window.__uxLastResourceEnd === undefined) {
+        window.__uxLastResourceEnd = performance.now();
+        new PerformanceObserver(list => {
+            for (const entry of list.getEntries()) {
+                window.__uxLastResourceEnd = Math.max(window.__uxLastResourceEnd, entry.responseEnd);
+            }
+        }).observe({type: "resource", buffered: true});
+    }
+    if (document.readyState !== "complete") {
+        return 0;
+    }
+    return performance.now() - window.__uxLastResourceEnd;
+"""
+
+
+class network_idle:
+    """
+        Expected condition for WebDriverWait: the document has loaded and no
+        resource finished loading for ``idle_ms`` milliseconds.
+    """
+
+    def __init__(self, idle_ms: Optional[int] = 500):
+        self.idle_ms = idle_ms
+
+    def __call__(self, driver: webdriver) -> bool:
+        return driver.execute_script(NETWORK_IDLE_SCRIPT) >= self.idle_ms
+
+
+class ThinkTime:
+    """
+        Deliberate human-like pause between two actions, in seconds. The pause is
+        drawn from a triangular distribution between ``low`` and ``high`` that
+        peaks at ``mode`` (the middle by default). ThinkTime(0, 0) disables it.
+    """
+
+    def __init__(self, low: Optional[float] = 0.5, high: Optional[float] = 2.0, mode: Optional[float] = None):
+        if low > high:
+            raise ValueError("low must not be greater than high")
+        self.low = low
+        self.high = high
+        self.mode = mode
+
+    def __repr__(self):
+        return f"ThinkTime({self.low}, {self.high}, mode={self.mode})"
+
+    def __call__(self) -> float:
+        if self.low == self.high:
+            return self.low
+        return triangular(self.low, self.high, self.mode)
 
 
 class BaseTest:
-    def __init__(self, driver: webdriver):
+    def __init__(
+        self,
+        driver: webdriver,
+        on_tick: Optional[Callable[[], None]] = None,
+        think_time: Optional[ThinkTime] = None
+    ):
+        """
+            on_tick is called regularly while a test is browsing (i.e. - to
+            analyze the network entries of the session while it runs). It is
+            called from the browsing thread, so it can use the driver.
+
+            think_time is the pause between the actions of a simulated user.
+        """
         self.driver = driver
+        self.on_tick = on_tick
+        self.think_time = think_time if think_time is not None else ThinkTime()
+
+    def tick(self) -> None:
+        if self.on_tick:
+            self.on_tick()
+
+    def think(self) -> None:
+        """
+            Pauses like a user would between two actions
+        """
+        self.sleep(self.think_time())
+
+    def sleep(self, seconds: float, interval: Optional[float] = 1) -> None:
+        """
+            Sleeps for ``seconds``, calling tick at least every ``interval`` seconds
+        """
+        end = time.monotonic() + seconds
+        while True:
+            self.tick()
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
 
     def get_content(
         self,
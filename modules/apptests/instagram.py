@@ -8,13 +8,14 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions
 
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 
 from modules.browser import scrolldown, scrollup
+from utils.applogger import apptest_logger
 
-from modules.apptests.base import BaseTest
+from modules.apptests.base import BaseTest, ThinkTime, network_idle
 
-from typing import Optional
+from typing import Callable, Optional
 
 
 class InstagramTest(BaseTest):
@@ -25,23 +26,53 @@ class InstagramTest(BaseTest):
         driver: webdriver,
         autologin: Optional[bool] = True,
         default_element_timeout: Optional[int] = 10,
-        searchbox_translation: Optional[str] = "Search"
+        searchbox_translation: Optional[str] = "Search",
+        on_tick: Optional[Callable[[], None]] = None,
+        think_time: Optional[ThinkTime] = None,
+        network_idle_ms: Optional[int] = 500,
+        base_url: Optional[str] = "https://www.instagram.com"
     ):
-        self.base_url = "https://www.instagram.com"
+        self.base_url = base_url
         self.username = username
         self.password = password
         self.driver = driver
         self.default_element_timeout = default_element_timeout
         self.searchbox_translation = searchbox_translation
-        super().__init__(driver)
+        self.network_idle_ms = network_idle_ms
+        super().__init__(driver, on_tick=on_tick, think_time=think_time)
         if autologin:
             self.login()
 
+    def wait_for(self, condition, timeout: Optional[int] = None):
+        """
+            Waits until ``condition`` (an expected condition) is met and returns its result.
+            Raises TimeoutException after ``timeout`` seconds, default_element_timeout by default.
+        """
+        if not timeout:
+            timeout = self.default_element_timeout
+        return WebDriverWait(self.driver, timeout).until(condition)
+
+    def wait_for_network_idle(self, timeout: Optional[int] = None, strict: Optional[bool] = False) -> bool:
+        """
+            Waits until no resource finished loading for network_idle_ms. Instagram keeps polling in
+            the background, so the network may never go quiet: unless ``strict``, a timeout is only
+            logged and False is returned, the page itself has loaded by then.
+        """
+        try:
+            self.wait_for(network_idle(self.network_idle_ms), timeout=timeout)
+        except TimeoutException:
+            if strict:
+                raise
+            apptest_logger.debug(f"Network was not idle for {self.network_idle_ms} ms at {self.driver.current_url}, carrying on")
+            return False
+        return True
+
     def login(self) -> bool:
         self.driver.get(self.base_url)
-        time.sleep(10)  # TODO: Start randomizing time sleeps
 
-        username = self.driver.find_element(By.XPATH, "//*[@name='username']") # TODO: Major error handling with context manager/etc
+        username = self.wait_for(
+            expected_conditions.element_to_be_clickable((By.XPATH, "//*[@name='username']"))
+        )
         password = self.driver.find_element(By.XPATH, "//*[@name='password']")
         credentials_submit = self.driver.find_element(By.XPATH, "//*[@type='submit']")
 
@@ -49,14 +80,16 @@ class InstagramTest(BaseTest):
         password.clear()
 
         username.send_keys(self.username)
-        time.sleep(2)
+        self.think()
         password.send_keys(self.password)
+        self.think()
 
-        time.sleep(5)
-
+        login_url = self.driver.current_url
         credentials_submit.click()
 
-        time.sleep(5) # TODO: increase, eventually get smarter here
+        # logged in once instagram has navigated away from the login form
+        self.wait_for(expected_conditions.url_changes(login_url))
+        self.wait_for_network_idle()
 
         return True
 
@@ -64,17 +97,26 @@ class InstagramTest(BaseTest):
         """
             Lookup hashtag, keyboard, or handle
         """
-        time.sleep(10) 
-        searchbox = self.driver.find_element(
-            By.CSS_SELECTOR, f"input[placeholder='{placeholder}']"
+        searchbox = self.wait_for(
+            expected_conditions.element_to_be_clickable((By.CSS_SELECTOR, f"input[placeholder='{placeholder}']"))
         )
         searchbox.clear()
         searchbox.send_keys(word)
-        time.sleep(2)
-        searchbox.send_keys(Keys.ENTER)
-        time.sleep(2)
+
+        # wait for the search suggestions before picking the first one
+        self.wait_for_network_idle()
+        self.think()
+        search_url = self.driver.current_url
         searchbox.send_keys(Keys.ENTER)
-        time.sleep(10)
+        self.think()
+        try:
+            searchbox.send_keys(Keys.ENTER)
+        except StaleElementReferenceException:
+            # the first enter already opened the result
+            pass
+
+        self.wait_for(expected_conditions.url_changes(search_url))
+        self.wait_for_network_idle()
         return
 
     def browse_hashtag(
@@ -109,8 +151,6 @@ class InstagramTest(BaseTest):
         if not randowait:
             wait = 0.3
 
-        time.sleep(20)
-
         # lookup a hashtag
         self._input_ig_searchbox(word=f"#{hashtag}", placeholder=self.searchbox_translation)
 
@@ -126,6 +166,7 @@ class InstagramTest(BaseTest):
             if time.time() > timeout:
                 break
 
+            self.tick()
             scrolldown(driver=self.driver, cnt=1, delay=0)
             scrollup(
                 driver=self.driver, cnt=15, delay=0.1
@@ -168,8 +209,6 @@ class InstagramTest(BaseTest):
         if not element_timeout:
             element_timeout = self.default_element_timeout
 
-        time.sleep(10)
-
         # wait for presentation div to load, and subsequently the first story
         presentation = WebDriverWait(self.driver, element_timeout).until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, "div[role='presentation']")))
         first_story = WebDriverWait(presentation, element_timeout).until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, "div[role='button']")))
@@ -178,6 +217,6 @@ class InstagramTest(BaseTest):
         first_story.click()
 
         # wait for some period of time and let the stories roll...
-        time.sleep(60 * duration)
+        self.sleep(60 * duration)
 
         return
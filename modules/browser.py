@@ -1,33 +1,299 @@
 import os
 import time
 import json
+import shutil
+import hashlib
 import logging
+import tempfile
+import zipfile
+import threading
 import functools
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from copy import copy
 from typing import Optional, List, Dict
+import psutil
 from utils.applogger import apptest_logger
 
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import WebDriverException
 
 from utils.data import load_yaml, get_abs_path
 from utils.metrics import ms_to_s
-from utils.system import kill_existing_proc
-
-#from browsermobproxy import Server
+from utils.system import terminate_procs, wait_for_file
 
 PATH = get_abs_path(__file__)
 PATH_WINDOWS = str(PATH.parent).replace(r'/', r'\\')
 
-PROCS_TO_KILL = ["firefox.exe"]
-WINDOWS_PROCS_TO_KILL = ["firefox.exe"]
+# pre-built profiles are kept here, one directory per hash of their contents
+PROFILE_CACHE_LOCATION = f"{PATH.parent}/profiles"
+PROFILE_TEMPLATE_VERSION = 1
+HEADER_MOD_ID = "jid0-oEwF5ZcskGhjFv4Kk4lYc@jetpack"
+BROWSERMOB_PROXY_PATH = f"{PATH}/browsermob-proxy-2.1.4/bin/browsermob-proxy"
+
 BASE_EXTENSIONS = [
     "har_export_trigger-0.6.1-an+fx.xpi",
     "header_mod.xpi"
     ]
 
 
+def get_extension_id(xpi_path: str, known_ids: List[str]) -> str:
+    """
+        The id of a Firefox extension, from its manifest or else the id of
+        known_ids that it was signed for (extensions from addons.mozilla.org
+        do not always declare their id)
+    """
+    with zipfile.ZipFile(xpi_path) as xpi:
+        manifest = json.loads(xpi.read("manifest.json"))
+        for key in ("browser_specific_settings", "applications"):
+            extension_id = manifest.get(key, {}).get("gecko", {}).get("id")
+            if extension_id:
+                return extension_id
+        signature = xpi.read("META-INF/mozilla.rsa") if "META-INF/mozilla.rsa" in xpi.namelist() else b""
+    for extension_id in known_ids:
+        if extension_id.encode() in signature:
+            return extension_id
+    raise ValueError(f"Could not find the id of the extension {xpi_path!r}")
+
+
+class HarCapture(ABC):
+    """
+        Records the network traffic of a browser session. The browser calls
+        prepare before it starts (to change its options), start once it runs,
+        export when the session is over and stop last, even if something failed.
+    """
+
+    def prepare(self, browser: "FireFoxBrowser") -> None:
+        pass
+
+    def start(self, browser: "FireFoxBrowser") -> None:
+        pass
+
+    @abstractmethod
+    def get_entries(self, browser: "FireFoxBrowser", start: Optional[int] = 0) -> dict:
+        """
+            Returns a dict with the entries of the session from index ``start``
+            on, the index of the first returned entry (start) and the pages
+        """
+
+    @abstractmethod
+    def export(self, browser: "FireFoxBrowser", har_file: str) -> bool:
+        """
+            Writes the HAR file of the session, returns False if it failed
+        """
+
+    def stop(self, browser: "FireFoxBrowser") -> None:
+        pass
+
+
+class ExtensionCapture(HarCapture):
+    """
+        Records with the network monitor of the browser devtools, exported
+        through the har_export_trigger extension
+    """
+
+    def get_entries(self, browser: "FireFoxBrowser", start: Optional[int] = 0) -> dict:
+        """
+            Exports the HAR log of the running session without downloading it.
+            Only the entries from index ``start`` on are sent back, if the log
+            has fewer entries than that (i.e. - it was cleared) all of them are.
+        """
+        return browser.driver.execute_async_script(
+            """
+                let start = arguments[0];
+                let done = arguments[arguments.length - 1];
+                HAR.triggerExport().then(harFile => {
+                    let entries = harFile.entries || [];
+                    if (entries.length < start) {
+                        start = 0;
+                    }
+                    done({start: start, entries: entries.slice(start), pages: harFile.pages || []});
+                }).catch(error => done({error: String(error)}));
+            """,
+            start,
+        )
+
+    def export(self, browser: "FireFoxBrowser", har_file: str) -> bool:
+        """
+            Injects javascript to request the HAR file, then downloads it
+            automatically to har_location. The script returns the size of the
+            file once the download has been started, and the download is
+            complete when the file on disk has that size. Waits at most
+            har_export_timeout seconds.
+        """
+        filename = os.path.basename(har_file)
+        browser.driver.set_script_timeout(browser.har_export_timeout)
+        start = time.monotonic()
+        try:
+            har_size = browser.driver.execute_async_script(
+                f"""
+                    let done = arguments[arguments.length - 1];
+                    HAR.triggerExport().then(harFile => {{
+                        let bb = new Blob([JSON.stringify({{log: harFile}}) ], {{ type: 'application/json' }});
+                        let a = document.createElement('a');
+                        a.download = '{filename}';
+                        a.href = window.URL.createObjectURL(bb);
+                        a.click();
+                        done(bb.size);
+                    }}).catch(error => done(null));
+                """)
+        except WebDriverException as e:
+            apptest_logger.debug(f"HAR export of {filename!r} failed: {e}")
+            return False
+
+        remaining = max(browser.har_export_timeout - (time.monotonic() - start), 0)
+        return wait_for_file(har_file, expected_size=har_size, timeout=remaining)
+
+
+class ProxyCapture(HarCapture):
+    """
+        Records with BrowserMob Proxy. The browser is pointed at the proxy and
+        every poll_interval seconds the recorded HAR is swapped for a new one
+        through the proxy's REST API (PUT /proxy/<port>/har returns the
+        previous HAR). Each swap only carries the entries since the last one,
+        they are appended to the HAR file right away and kept for get_entries
+        until it is called with a later start, so there is never one big HAR to
+        transfer at the end of a session.
+
+        Requests that are still in flight during a swap are recorded without
+        their response.
+
+        api_url is the REST API of a running proxy server, if not given the
+        server at server_path is started.
+    """
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        server_path: Optional[str] = BROWSERMOB_PROXY_PATH,
+        server_port: Optional[int] = 8080,
+        poll_interval: Optional[float] = 30,
+        capture_options: Optional[Dict[str, str]] = None
+    ):
+        self.api_url = api_url
+        self.server_path = server_path
+        self.server_port = server_port
+        self.poll_interval = poll_interval
+        self.capture_options = capture_options or {"captureHeaders": "true"}
+        self.server = None
+        self.port = None
+        self.entry_count = 0
+        # entries from index _first on, older ones have been handed out already
+        self._entries: List[dict] = []
+        self._first = 0
+        self._pages: Dict[str, dict] = {}
+        self._har_file = None
+        self._har_path = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._poller = None
+
+    def _request(self, method: str, path: str, data: Optional[Dict[str, str]] = None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(f"{self.api_url}{path}", data=body, method=method)
+        with urllib.request.urlopen(request, timeout=60) as response:
+            content = response.read()
+        return json.loads(content) if content else None
+
+    def prepare(self, browser: "FireFoxBrowser") -> None:
+        if not self.api_url:
+            from browsermobproxy import Server
+
+            self.server = Server(self.server_path, {"port": self.server_port})
+            self.server.start()
+            self.api_url = self.server.url
+        self.port = self._request("POST", "/proxy")["port"]
+
+        host = urllib.parse.urlparse(self.api_url).hostname
+        browser.options.set_preference("network.proxy.type", 1)
+        for scheme in ("http", "ssl"):
+            browser.options.set_preference(f"network.proxy.{scheme}", host)
+            browser.options.set_preference(f"network.proxy.{scheme}_port", self.port)
+        browser.options.set_preference("network.proxy.no_proxies_on", "")
+        browser.options.set_preference("network.proxy.allow_hijacking_localhost", True)
+        # the proxy decrypts https with its own certificate
+        browser.options.accept_insecure_certs = True
+
+    def start(self, browser: "FireFoxBrowser") -> None:
+        self._har_path = os.path.join(browser.har_location, f"{browser.har_filename}.har")
+        self._har_file = open(f"{self._har_path}.part", "w")
+        self._har_file.write('{"log": {"version": "1.2", "creator": {"name": "BrowserMob Proxy", "version": "2.1.4"}, "entries": [')
+        self._swap_har(browser.har_session_name)
+        self._poller = threading.Thread(target=self._poll, args=(browser.har_session_name,), daemon=True)
+        self._poller.start()
+
+    def _poll(self, page_ref: str) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self._swap_har(page_ref)
+            except (OSError, ValueError) as e:
+                # includes a response that is not JSON, try again at the next poll
+                apptest_logger.debug(f"Could not get the HAR from the proxy: {e}")
+
+    def _swap_har(self, page_ref: str) -> None:
+        """
+            Starts a new HAR and records the entries of the previous one
+        """
+        with self._lock:
+            har = self._request("PUT", f"/proxy/{self.port}/har", dict(self.capture_options, initialPageRef=page_ref))
+            log = (har or {}).get("log", {})
+            for page in log.get("pages", []):
+                self._pages.setdefault(page["id"], page)
+            entries = log.get("entries", [])
+            for entry in entries:
+                self._har_file.write(("," if self.entry_count else "") + json.dumps(entry))
+                self.entry_count += 1
+            self._har_file.flush()
+            self._entries += entries
+
+    def get_entries(self, browser: "FireFoxBrowser", start: Optional[int] = 0) -> dict:
+        """
+            The entries recorded from index start on. Entries before start are
+            not kept after the call, so start can only move forward.
+        """
+        with self._lock:
+            start = min(max(start, self._first), self.entry_count)
+            del self._entries[:start - self._first]
+            self._first = start
+            return {"start": start, "entries": list(self._entries), "pages": list(self._pages.values())}
+
+    def export(self, browser: "FireFoxBrowser", har_file: str) -> bool:
+        if self._har_file is None:
+            return False
+        self._stopped.set()
+        if self._poller:
+            self._poller.join()
+        try:
+            self._swap_har(browser.har_session_name)
+        except (OSError, ValueError) as e:
+            apptest_logger.debug(f"Could not get the HAR from the proxy: {e}")
+        with self._lock:
+            self._har_file.write(f"], \"pages\": {json.dumps(list(self._pages.values()))}}}}}")
+            self._har_file.close()
+            self._har_file = None
+        os.replace(f"{self._har_path}.part", har_file)
+        return True
+
+    def stop(self, browser: "FireFoxBrowser") -> None:
+        # let a swap that is running finish before the file is closed
+        self._stopped.set()
+        if self._poller:
+            self._poller.join()
+        with self._lock:
+            if self._har_file is not None:
+                self._har_file.close()
+                self._har_file = None
+        try:
+            if self.port:
+                self._request("DELETE", f"/proxy/{self.port}")
+        except OSError as e:
+            apptest_logger.debug(f"Could not close proxy {self.port}: {e}")
+        if self.server:
+            self.server.stop()
+
+
 class FireFoxBrowser: # TODO: add baseclass for browser
     def __init__(
         self,
@@ -41,26 +307,26 @@ class FireFoxBrowser: # TODO: add baseclass for browser
         extension_names: Optional[List[str]] = None,
         enable_quic: Optional[bool] = True,
         options: Optional[List[str]] = None,
-        headers: Optional[List[Dict[str, str]]] = None
+        headers: Optional[List[Dict[str, str]]] = None,
+        har_export_timeout: Optional[int] = 120,
+        profile_cache_location: Optional[str] = PROFILE_CACHE_LOCATION,
+        capture: Optional[HarCapture] = None
     ):
         if host_type == "windows":
             if not extension_path:
                 extension_path = f"{PATH_WINDOWS}\extensions\\firefox\\"
 
-            self._procs_to_kill = WINDOWS_PROCS_TO_KILL
-
         elif host_type == "linux":
             if not extension_path:
                 extension_path = f"{PATH}\extensions\\firefox\\"
 
-            self._procs_to_kill = LINUX_PROCS_TO_KILL
-
         if not extension_names:
             self.extension_names = BASE_EXTENSIONS
         else:
-            self.extension_names = self.extension_names + BASE_EXTENSIONS
+            self.extension_names = extension_names + BASE_EXTENSIONS
 
-        self.profile = webdriver.FirefoxProfile()
+        self.profile = None
+        self.profile_cache_location = profile_cache_location
         self.driver = None
         self.process_kill_wait = process_kill_wait
         self.webdriver_path = webdriver_path
@@ -72,21 +338,24 @@ class FireFoxBrowser: # TODO: add baseclass for browser
         self.enable_quic = enable_quic
         self.options = options
         self.headers = headers
+        self.har_export_timeout = har_export_timeout
+        # devtools + har_export_trigger by default, ProxyCapture for BrowserMob Proxy
+        self.capture = capture or ExtensionCapture()
+        # geckodriver and the firefox processes it launched
+        self._procs: List[psutil.Process] = []
 
     def __enter__(self):
         self._build_options()
-        kill_existing_proc(self._procs_to_kill, self.process_kill_wait)
+        os.makedirs(self.har_location, exist_ok=True)
+        self.capture.prepare(self)
         self._build_profile()
         self.driver = webdriver.Firefox(
             executable_path=self.webdriver_path, 
             firefox_profile=self.profile,
             options=self.options
         )
-
-        # Add extensions here
-        for extension_name in self.extension_names:
-            self.driver.install_addon(self.extension_path + extension_name, temporary=True)
-            self.driver.firefox_profile.add_extension(extension=self.extension_path + extension_name)
+        self._track_procs()
+        self.capture.start(self)
 
         # add custom headers here
         if self.headers:
@@ -102,28 +371,47 @@ class FireFoxBrowser: # TODO: add baseclass for browser
         
         return data
 
+    def get_har_entries(self, start: Optional[int] = 0) -> dict:
+        """
+            The network entries of the running session, see HarCapture.get_entries
+        """
+        return self.capture.get_entries(self, start)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if (exc_type or exc_val or exc_tb):
             apptest_logger.debug(f"{exc_type} | {exc_val} | {exc_tb}")
 
-        # inject javascript to request HAR file, then download it automatically
-        self.driver.execute_script(
-            f"""
-                HAR.triggerExport().then(harFile => {{
-                    let bb = new Blob([JSON.stringify({{log: harFile}}) ], {{ type: 'application/json' }});
-                    let a = document.createElement('a');
-                    a.download = '{self.har_filename}.har';
-                    a.href = window.URL.createObjectURL(bb);
-                    a.click();
-                }});
-            """)
-
-        # wait a bit for cleanup
-        time.sleep(20)
-
-        self.driver.quit()
+        try:
+            self.export_har()
+            self._track_procs()
+            self.driver.quit()
+        finally:
+            self.capture.stop(self)
+            # only stop what this browser launched, other sessions keep running
+            terminate_procs(self._procs, timeout=self.process_kill_wait)
         return True
 
+    def _track_procs(self) -> None:
+        """
+            Remembers the geckodriver process of the driver and every process
+            it started (firefox and its content processes)
+        """
+        try:
+            service_proc = psutil.Process(self.driver.service.process.pid)
+            procs = [service_proc] + service_proc.children(recursive=True)
+        except (AttributeError, psutil.Error) as e:
+            apptest_logger.debug(f"Could not find the browser processes: {e}")
+            return
+        pids = {proc.pid for proc in self._procs}
+        self._procs += [proc for proc in procs if proc.pid not in pids]
+
+    def export_har(self) -> bool:
+        """
+            Writes the HAR file of the session to har_location, see HarCapture.export
+        """
+        har_file = os.path.join(self.har_location, f"{self.har_filename}.har")
+        return self.capture.export(self, har_file)
+
     def _build_options(self):
         """
             Options to include on FireFox start such as --headless and --devtools
@@ -135,7 +423,7 @@ class FireFoxBrowser: # TODO: add baseclass for browser
         else:
             options_to_add = copy(self.options)
             self.options = Options()
-            for argument in self.options:
+            for argument in options_to_add:
                 self.options.add_argument(argument)
         
         # set the default downloads directory to be the har location directory
@@ -143,74 +431,137 @@ class FireFoxBrowser: # TODO: add baseclass for browser
         self.options.set_preference("browser.download.dir", self.har_location)
         return
         
-    def _build_profile(self):
-        # QUIC Settings
-        self.profile.set_preference("http3", self.enable_quic)
-        self.profile.set_preference("network.http.http3.enabled", self.enable_quic)
-
-        # Disable Browser Cache
-        self.profile.set_preference("browser.cache.disk.enable", False) # TODO: doesn't work
-        self.profile.set_preference("browser.cache.memory.enable", False)
-        self.profile.set_preference("browser.cache.check_doc_frequency", 1)
+    def _get_template_preferences(self) -> Dict[str, object]:
+        """
+            Preferences that are the same for every session and are stored in the profile template
+        """
+        return {
+            # QUIC Settings
+            "http3": self.enable_quic,
+            "network.http.http3.enabled": self.enable_quic,
+
+            # Disable Browser Cache
+            "browser.cache.disk.enable": False, # TODO: doesn't work
+            "browser.cache.memory.enable": False,
+            "browser.cache.check_doc_frequency": 1,
+
+            # enable automatic HAR file export
+            "devtools.netmonitor.har.includeResponseBodies": False,
+            "devtools.netmonitor.har.forceExport": True,
+            "extensions.netmonitor.har.enableAutomation": True,
+            "extensions.netmonitor.har.contentAPIToken": "test", # Har trigger by script injected into page
+            "browser.helperApps.neverAsk.saveToDisk": "application/json",
+            "browser.download.folderList": 2,
+
+            # enable the extensions installed in the profile without asking
+            "extensions.autoDisableScopes": 0,
+
+            # Statically set uuids for base extensions TODO: (very small chance of collision, try to make dynamic in future)
+            "extensions.webextensions.uuids": self._extension_mappings,
+        }
+
+    def _get_profile_template(self) -> str:
+        """
+            Returns the directory of a profile with the template preferences and the
+            extensions installed. The profile is only built the first time, it is
+            cached in profile_cache_location under a hash of everything that goes into it.
+        """
+        preferences = self._get_template_preferences()
+        key = hashlib.sha256()
+        key.update(json.dumps([PROFILE_TEMPLATE_VERSION, preferences], sort_keys=True).encode())
+        for extension_name in self.extension_names:
+            with open(self.extension_path + extension_name, "rb") as f:
+                key.update(extension_name.encode())
+                key.update(hashlib.sha256(f.read()).digest())
+        template_dir = os.path.join(self.profile_cache_location, key.hexdigest()[:16])
+        if os.path.isdir(template_dir):
+            return template_dir
+
+        apptest_logger.debug(f"Building profile template {template_dir!r}")
+        profile = webdriver.FirefoxProfile()
+        for name, value in preferences.items():
+            profile.set_preference(name, value)
+        # installed as <id>.xpi, the way Firefox installs signed extensions in a profile
+        extensions_dir = os.path.join(profile.path, "extensions")
+        os.makedirs(extensions_dir, exist_ok=True)
+        known_ids = list(json.loads(self._extension_mappings))
+        for extension_name in self.extension_names:
+            xpi_path = self.extension_path + extension_name
+            extension_id = get_extension_id(xpi_path, known_ids)
+            shutil.copyfile(xpi_path, os.path.join(extensions_dir, f"{extension_id}.xpi"))
+        profile.webdriver_accept_untrusted_certs = True
+        profile.update_preferences()
+
+        # build next to the cache and rename, so a half written template is never used
+        os.makedirs(self.profile_cache_location, exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=self.profile_cache_location)
+        shutil.copytree(profile.path, os.path.join(build_dir, "profile"))
+        try:
+            os.rename(os.path.join(build_dir, "profile"), template_dir)
+        except OSError:
+            # another session built the same template at the same time
+            pass
+        shutil.rmtree(build_dir, ignore_errors=True)
+        shutil.rmtree(profile.path, ignore_errors=True)
+        return template_dir
 
-        # enable automatic HAR file export
+    def _build_profile(self):
+        """
+            Copies the profile template for this session and sets the preferences that are
+            specific to the session
+        """
+        self.profile = webdriver.FirefoxProfile(self._get_profile_template())
         self.profile.set_preference("devtools.netmonitor.har.defaultLogDir", self.har_location)
-        self.profile.set_preference("devtools.netmonitor.har.includeResponseBodies", False)
-        self.profile.set_preference("devtools.netmonitor.har.forceExport", True)
-        self.profile.set_preference("extensions.netmonitor.har.enableAutomation", True)
-        self.profile.set_preference("extensions.netmonitor.har.contentAPIToken", "test") # Har trigger by script injected into page
-        self.profile.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/json")
-        self.profile.set_preference("browser.download.folderList", 2)
-
-        # Statically set uuids for base extensions TODO: (very small chance of collision, try to make dynamic in future)
-        self.profile.set_preference("extensions.webextensions.uuids", self._extension_mappings)
-
         self.profile.webdriver_accept_untrusted_certs = True
         self.profile.update_preferences()
         return
 
     def _insert_headers(self, headers: List[Dict[str, str]]) -> None:
         """
-            Inserts a header into the "Modify Header Value" extension 
+            Inserts headers into the "Modify Header Value" extension 
             which will send a specified header key/value pair to the specified
             url for every request. This extension is installed as one of the base 
             extensions for this program. More info: https://addons.mozilla.org/en-US/firefox/addon/modify-header-value/
+
+            The rules are sent to the extension's background page from its options page, which
+            stores them in the extension's storage like adding them in the options page would.
         """
 
         # go to extension's option page
         # format to get to an extension's page should be like the following: #moz-extension://2bd549f8-aeba-40db-a51c-398f96c7ec16/data/options/options.html
-        self.driver.get(f"moz-extension://{json.loads(self._extension_mappings)['jid0-oEwF5ZcskGhjFv4Kk4lYc@jetpack']}/data/options/options.html")
-
-        for header in headers:
-            _ = self._insert_header(**header)
-        
-        return
-
-    def _insert_header(self, url: str, header_key: str, header_value: str) -> None:
-        # set url
-        url_box = self.driver.find_element(
-            By.CSS_SELECTOR, "input[placeholder='URL (i.e. https://www.google.com/ or *)']"
+        self.driver.get(f"moz-extension://{json.loads(self._extension_mappings)[HEADER_MOD_ID]}/data/options/options.html")
+
+        rules = [
+            dict(
+                url=header["url"],
+                name=header["header_key"],
+                value=header["header_value"],
+                # same defaults as adding a rule in the options page
+                state="active",
+                checked_d=True,
+                checked_s=True,
+                checked_a=True,
+                checked_m=False,
+                checked_r=False,
+            )
+            for header in headers
+        ]
+        self.driver.execute_script(
+            """
+                let rules = arguments[0].map(rule => {
+                    // the options page stores normalized urls
+                    if (rule.url !== "*") {
+                        try { rule.url = new URL(rule.url).href; } catch (e) { rule.url = ""; }
+                    }
+                    return rule;
+                });
+                chrome.runtime.sendMessage({path: "options-to-background", method: "store", data: {headerArray: rules}});
+            """,
+            rules,
         )
-        url_box.clear()
-        url_box.send_keys(url)
         
-        # set header name
-        header_key_box = self.driver.find_element(
-            By.CSS_SELECTOR, "input[placeholder='name (i.e. User-Agent)']"
-        )
-        header_key_box.clear()
-        header_key_box.send_keys(header_key)
-
-        # set header value
-        header_value_box = self.driver.find_element(
-            By.CSS_SELECTOR, "input[title='Enter a valid value']"
-        )
-        header_value_box.clear()
-        header_value_box.send_keys(header_value)
-
-        header_value_box.send_keys(Keys.ENTER)
+        return
 
-        return 
 
 def scrolldown(
     driver: webdriver, cnt: Optional[int] = 1, delay: Optional[int] = 5
@@ -0,0 +1,385 @@
+"""
+Running aggregations over HAR entries. Entries are folded in one at a time,
+so a page can be summarised while its entries are streamed from disk without
+keeping them in memory, or while a browser session is still running.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .assets import HarEntry, HarPage
+from .filters import EntryFilter
+from .intervals import IntervalUnion
+from .stream import HarStreamReader
+
+
+class AssetStats:
+    """
+    Running totals for the entries that matched one filter.
+    """
+
+    # Suffix of the HarPage property and the AssetStats attribute it reads,
+    # i.e. - ``image_load_time`` is ``stats["image"].load_time``
+    FIELDS = {
+        "count": "count",
+        "size": "size",
+        "size_trans": "size_trans",
+        "load_time": "load_time",
+        "files": "entries",
+    }
+
+    def __init__(self, keep_entries: bool = False):
+        """
+        :param keep_entries: Whether to keep the matching entries
+        :type keep_entries: bool
+        """
+        self.count = 0
+        self.size = 0
+        self.size_trans = 0
+        self.total_time = 0
+        self.busy = IntervalUnion()
+        self.entries: Optional[List[HarEntry]] = [] if keep_entries else None
+
+    def add(self, entry: HarEntry) -> None:
+        """
+        :param entry: Entry to fold into the totals
+        :type entry: HarEntry
+        """
+        self.count += 1
+        body_size = entry.response.bodySize
+        if body_size > 0:
+            self.size += body_size
+        self.size_trans += entry.response.transferSize
+        self.total_time += entry.time
+        start = entry.startTimeMs
+        if start is not None:
+            # Same as HarParser.get_asset_busy_time
+            self.busy.add(start, start + max(int(entry.time), 1))
+        if self.entries is not None:
+            self.entries.append(entry)
+
+    @property
+    def load_time(self) -> int:
+        """
+        :return: Milliseconds where at least one matching entry was loading
+        :rtype: int
+        """
+        return int(round(self.busy.length))
+
+
+class PageAggregator:
+    """
+    Summarises the entries of one page as they are added.
+
+    Every asset type of ``HarPage.ASSET_TYPES`` is tracked, and additional
+    filters can be registered with ``watch``. The totals mirror the ``HarPage``
+    properties of the same name, so ``image_size``, ``image_size_trans``,
+    ``image_load_time`` and ``image_count`` are available for every tracked name.
+    """
+
+    def __init__(self, page_id: str, page: dict = None):
+        """
+        :param page_id: Page ID
+        :type page_id: str
+        :param page: The ``pages`` item of the HAR file, if known
+        :type page: dict
+        """
+        self.page_id = page_id
+        self.page = page or {}
+        self.asset_types = dict(HarPage.ASSET_TYPES)
+        self.entry_count = 0
+        self.page_size = 0
+        self.page_size_trans = 0
+        self._filters: Dict[str, EntryFilter] = {}
+        self.stats: Dict[str, AssetStats] = {}
+        # Property name and the (watched name, AssetStats attribute) it reads
+        self._metrics: Dict[str, Tuple[str, str]] = {}
+        for asset_type, content_type in self.asset_types.items():
+            self.watch(asset_type, EntryFilter.cached(content_type=content_type))
+
+    def __repr__(self):
+        return f"PageAggregator for {self.page_id} ({self.entry_count} entries)"
+
+    def __getattr__(self, name: str):
+        # Only called for attributes that do not exist, the names registered
+        # by ``watch`` mimic the HarPage properties
+        metric = self.__dict__.get("_metrics", {}).get(name)
+        if metric is not None:
+            watched, field = metric
+            value = getattr(self.stats[watched], field)
+            if value is not None:
+                return value
+        raise AttributeError(f"{type(self).__name__!r} has no attribute {name!r}")
+
+    @property
+    def title(self) -> str:
+        """
+        :return: Title of the page
+        :rtype: str
+        """
+        return self.page.get("title", "")
+
+    @property
+    def startedDateTime(self) -> Optional[str]:
+        """
+        :return: Start time of the page
+        :rtype: Optional[str]
+        """
+        return self.page.get("startedDateTime")
+
+    @property
+    def pageTimings(self) -> dict:
+        """
+        :return: Page timings of the page
+        :rtype: dict
+        """
+        return self.page.get("pageTimings", {})
+
+    @property
+    def page_load_time(self) -> Optional[int]:
+        """
+        :return: Load time for the page
+        :rtype: Optional[int]
+        """
+        return self.pageTimings.get("onLoad")
+
+    def watch(
+        self, name: str, entry_filter: EntryFilter, keep_entries: bool = False
+    ) -> AssetStats:
+        """
+        Tracks the totals of the entries matching ``entry_filter`` under
+        ``name``. Only entries added after the call are counted.
+
+        :param name: Name of the totals (i.e. - 'image' for ``image_size``)
+        :type name: str
+        :param entry_filter: Entries to include
+        :type entry_filter: EntryFilter
+        :param keep_entries: Whether to keep the matching entries, they are
+            available as ``<name>_files``
+        :type keep_entries: bool
+        :return: Totals for the filter
+        :rtype: AssetStats
+        """
+        self._filters[name] = entry_filter
+        stats = self.stats[name] = AssetStats(keep_entries=keep_entries)
+        for suffix, field in AssetStats.FIELDS.items():
+            self._metrics[f"{name}_{suffix}"] = (name, field)
+        return stats
+
+    def add(self, entry: Union[dict, HarEntry]) -> None:
+        """
+        Folds an entry into every total it matches.
+
+        :param entry: Entry to add
+        :type entry: Union[dict, HarEntry]
+        """
+        if isinstance(entry, dict):
+            entry = HarEntry(entry)
+        self.entry_count += 1
+        body_size = entry.response.bodySize
+        if body_size > 0:
+            self.page_size += body_size
+        self.page_size_trans += entry.response.transferSize
+        for name, entry_filter in self._filters.items():
+            if entry_filter(entry):
+                self.stats[name].add(entry)
+
+    def get_files(self, name: str) -> List[HarEntry]:
+        """
+        Kept entries for a watched filter, sorted chronologically.
+
+        :param name: Name the filter was watched with
+        :type name: str
+        :return: Entries that matched the filter
+        :rtype: List[HarEntry]
+        """
+        entries = self.stats[name].entries
+        if entries is None:
+            raise ValueError(f"Entries are not kept for {name!r}")
+        if all(entry.startTimeMs is not None for entry in entries):
+            return sorted(entries, key=lambda entry: entry.startTimeMs)
+        return list(entries)
+
+
+def _new_aggregator(
+    page_id: str, watches: Dict[str, EntryFilter], keep_entries: Iterable[str]
+) -> PageAggregator:
+    aggregator = PageAggregator(page_id)
+    for name, entry_filter in watches.items():
+        aggregator.watch(name, entry_filter, name in keep_entries)
+    return aggregator
+
+
+def is_complete(entry: dict) -> bool:
+    """
+    Whether an exported entry has finished loading. Requests that are still in
+    flight are exported without a status or receive timing (and so are
+    requests that failed).
+
+    :param entry: Raw HAR entry
+    :type entry: dict
+    :return: True if the response has been received
+    :rtype: bool
+    """
+    receive = entry.get("timings", {}).get("receive")
+    return bool(entry.get("response", {}).get("status")) and (
+        isinstance(receive, (int, float)) and receive >= 0
+    )
+
+
+class HarTail:
+    """
+    Follows the HAR log of a running browser session. The log is exported
+    again and again while it grows at the end, ``update`` is given the entries
+    of an export from ``offset`` on and folds only the entries that have not
+    been seen before into one ``PageAggregator`` per page.
+
+    ``offset`` is the index of the first entry that was still loading at the
+    last update, so the next export only needs to include the entries from
+    there on. An entry that is still not complete after ``max_pending``
+    updates (i.e. - a failed request) is folded in as it is.
+    """
+
+    def __init__(
+        self,
+        watches: Dict[str, EntryFilter] = None,
+        keep_entries: Iterable[str] = (),
+        max_pending: int = 3,
+    ):
+        """
+        :param watches: Additional filters to track on every page
+        :type watches: Dict[str, EntryFilter]
+        :param keep_entries: Names of the filters whose entries should be kept
+        :type keep_entries: Iterable[str]
+        :param max_pending: Number of updates to wait for an entry to complete
+        :type max_pending: int
+        """
+        self.watches = watches or {}
+        self.keep_entries = set(keep_entries)
+        self.max_pending = max_pending
+        self.offset = 0
+        self.entry_count = 0
+        self._seen = set()
+        self._pending: Dict[tuple, int] = {}
+        self._pages: Dict[str, PageAggregator] = {}
+        self._page_order: List[str] = []
+
+    @staticmethod
+    def entry_key(index: int, entry: dict) -> Tuple[int, str, str, str]:
+        """
+        :param index: Index of the entry in the log
+        :type index: int
+        :param entry: Raw HAR entry
+        :type entry: dict
+        :return: What identifies an entry across exports
+        :rtype: Tuple[int, str, str, str]
+        """
+        request = entry.get("request", {})
+        return (
+            index,
+            entry.get("startedDateTime"),
+            request.get("method"),
+            request.get("url"),
+        )
+
+    @property
+    def pages(self) -> List[PageAggregator]:
+        """
+        :return: One aggregator per page, the unknown page first, then the
+            pages in the order of the HAR log
+        :rtype: List[PageAggregator]
+        """
+        page_ids = ["unknown"] + self._page_order
+        page_ids += [p for p in self._pages if p not in page_ids]
+        return [self._pages[p] for p in page_ids if p in self._pages]
+
+    def update(
+        self, entries: List[dict], offset: int = 0, pages: List[dict] = None
+    ) -> List[HarEntry]:
+        """
+        Folds the new, finished entries of an export into the page totals.
+
+        :param entries: Entries of the export, starting at index ``offset``
+        :type entries: List[dict]
+        :param offset: Index of the first entry in the whole log
+        :type offset: int
+        :param pages: The ``pages`` of the export
+        :type pages: List[dict]
+        :return: The entries that were added
+        :rtype: List[HarEntry]
+        """
+        for page in pages or []:
+            if page["id"] not in self._page_order:
+                self._page_order.append(page["id"])
+            if page["id"] not in self._pages:
+                self._pages[page["id"]] = _new_aggregator(
+                    page["id"], self.watches, self.keep_entries
+                )
+            self._pages[page["id"]].page = page
+
+        added, pending = [], None
+        for index, raw_entry in enumerate(entries, start=offset):
+            key = self.entry_key(index, raw_entry)
+            if key in self._seen:
+                continue
+            if not is_complete(raw_entry):
+                self._pending[key] = self._pending.get(key, 0) + 1
+                if self._pending[key] < self.max_pending:
+                    if pending is None:
+                        pending = index
+                    continue
+            self._pending.pop(key, None)
+            self._seen.add(key)
+            page_id = raw_entry.get("pageref", "unknown")
+            aggregator = self._pages.get(page_id)
+            if aggregator is None:
+                aggregator = self._pages[page_id] = _new_aggregator(
+                    page_id, self.watches, self.keep_entries
+                )
+            entry = HarEntry(raw_entry)
+            aggregator.add(entry)
+            added.append(entry)
+        self.entry_count += len(added)
+        self.offset = offset + len(entries) if pending is None else pending
+        return added
+
+
+def aggregate_har_file(
+    har_file: str,
+    watches: Dict[str, EntryFilter] = None,
+    keep_entries: Iterable[str] = (),
+) -> List[PageAggregator]:
+    """
+    Streams a HAR file and summarises every page without loading the whole
+    file into memory.
+
+    :param har_file: Path to the HAR file
+    :type har_file: str
+    :param watches: Additional filters to track on every page
+    :type watches: Dict[str, EntryFilter]
+    :param keep_entries: Names of the filters whose entries should be kept
+    :type keep_entries: Iterable[str]
+    :return: One aggregator per page, ordered like ``HarParser.pages``
+    :rtype: List[PageAggregator]
+    """
+    watches = watches or {}
+    keep_entries = set(keep_entries)
+    pages: Dict[str, PageAggregator] = {}
+    reader = HarStreamReader(har_file)
+    for entry in reader.iter_entries():
+        page_id = entry.get("pageref", "unknown")
+        aggregator = pages.get(page_id)
+        if aggregator is None:
+            aggregator = pages[page_id] = _new_aggregator(page_id, watches, keep_entries)
+        aggregator.add(entry)
+
+    # Like HarParser.pages: the unknown page first, then the pages of the HAR
+    # file. Entries referencing a page that does not exist are dropped.
+    results = []
+    if "unknown" in pages:
+        results.append(pages["unknown"])
+    for page in reader.log.get("pages", []):
+        aggregator = pages.get(page["id"])
+        if aggregator is None:
+            aggregator = _new_aggregator(page["id"], watches, keep_entries)
+        aggregator.page = page
+        results.append(aggregator)
+    return results
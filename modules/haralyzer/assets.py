@@ -5,20 +5,89 @@ Provides all of the main functional classes for analyzing HAR files
 
 
 import datetime
+import json
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from collections import Counter, defaultdict
 from functools import wraps, cached_property
 
-# TODO: Prob convert this to better date module
+import numpy as np
 from dateutil import parser
 
+from .compact import CompactHar
+from .connections import ConnectionStats, group_connections
 from .errors import PageNotFoundError
+from .filters import EntryFilter, compile_pattern
+from .histogram import LatencyHistogram, get_percentiles
 from .http import Request, Response
+from .intervals import union_length
 from .mixins import MimicDict
+from .table import HarTable, _as_number
+from .throughput import (
+    SERIES_STEP,
+    SERIES_WINDOW,
+    ThroughputSeries,
+    ThroughputStats,
+    get_throughput,
+    group_throughput,
+)
 
 DECIMAL_PRECISION = 0
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# Marks lazily computed HarEntry values that have not been computed yet
+NOT_PARSED = object()
+
+# Format written to ``startedDateTime`` by HAR exporters,
+# i.e. - 2021-11-11T01:52:05.393-08:00 or 2021-11-11T09:52:05.393Z
+ISO_8601_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+
+def parse_datetime(value: str) -> Optional[datetime.datetime]:
+    """
+    Parses a HAR timestamp. The fixed ISO-8601 format HAR exporters emit is
+    normalised into something ``datetime.fromisoformat`` understands on every
+    supported python version, anything else falls back to dateutil.
+
+    :param value: Timestamp to parse
+    :type value: str
+    :return: Parsed timestamp or None if it could not be parsed
+    :rtype: Optional[datetime.datetime]
+    """
+    match = ISO_8601_RE.match(value)
+    if match:
+        date_time, fraction, offset = match.groups()
+        if fraction:
+            date_time += "." + fraction[:6].ljust(6, "0")
+        if offset == "Z":
+            date_time += "+00:00"
+        elif offset:
+            date_time += offset if ":" in offset else f"{offset[:3]}:{offset[3:]}"
+        try:
+            return datetime.datetime.fromisoformat(date_time)
+        except ValueError:
+            pass
+    try:
+        return parser.parse(value)
+    except (parser.ParserError, OverflowError):
+        return None
+
+
+def datetime_to_ms(value: datetime.datetime) -> float:
+    """
+    Converts a datetime to milliseconds since the epoch. Naive datetimes are
+    treated as UTC so the result does not depend on the local timezone.
+
+    :param value: Datetime to convert
+    :type value: datetime.datetime
+    :return: Milliseconds since the epoch
+    :rtype: float
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return ((value - EPOCH) // datetime.timedelta(microseconds=1)) / 1000
 
 
 def convert_to_entry(func):
@@ -54,6 +123,47 @@ class HarParser:
                 " to instantiate this class. Please RTFM."
             )
         self.har_data = har_data["log"]
+        self.har_file = None
+        self.compact = None
+
+    @classmethod
+    def from_file(cls, har_file: str, use_cache: bool = True) -> "HarParser":
+        """
+        Loads a HAR file from disk.
+
+        If the file was converted with ``CompactHar.write`` (see har_compact.py)
+        and the cache is up to date, the cache is opened instead. The page
+        tables are then memory-mapped from the cache and the JSON is only read
+        if the entries themselves are needed.
+
+        :param har_file: Path to the HAR file
+        :type har_file: str
+        :param use_cache: Whether to use the compact cache if there is one
+        :type use_cache: bool
+        :return: Parser for the HAR file
+        :rtype: HarParser
+        """
+        compact = CompactHar.open(har_file) if use_cache else None
+        if compact is None:
+            with open(har_file, "r") as f:
+                har_parser = cls(json.load(f))
+        else:
+            har_parser = cls.__new__(cls)
+            har_parser.compact = compact
+        har_parser.har_file = har_file
+        return har_parser
+
+    @cached_property
+    def har_data(self) -> dict:
+        """
+        The ``log`` of the HAR file. Only used when the parser was opened from
+        a compact cache, it is then loaded the first time it is needed.
+
+        :return: The ``log`` of the HAR file
+        :rtype: dict
+        """
+        with open(self.har_file, "r") as f:
+            return json.load(f)["log"]
 
     # @staticmethod
     # @convert_to_entry
@@ -117,7 +227,7 @@ class HarParser:
         """
         mime_type = entry.response.mimeType
 
-        if regex and re.search(content_type, mime_type, flags=re.IGNORECASE):
+        if regex and compile_pattern(content_type).search(mime_type):
             return True
         if content_type == mime_type:
             return True
@@ -143,10 +253,7 @@ class HarParser:
         :rtype: bool
         """
         if regex:
-            return (
-                re.search(request_type, entry.request.method, flags=re.IGNORECASE)
-                is not None
-            )
+            return compile_pattern(request_type).search(entry.request.method) is not None
         return entry.request.method == request_type
 
     @staticmethod
@@ -169,10 +276,7 @@ class HarParser:
         """
         response_version = entry.response.httpVersion
         if regex:
-            return (
-                re.search(http_version, response_version, flags=re.IGNORECASE)
-                is not None
-            )
+            return compile_pattern(http_version).search(response_version) is not None
         return response_version == http_version
 
     @staticmethod
@@ -195,9 +299,33 @@ class HarParser:
         :return: Status code matches
         :rtype: bool
         """
+        status = str(entry.response.status)
         if regex:
-            return re.search(status_code, str(entry.response.status)) is not None
-        return str(entry.response.status) == status_code
+            return compile_pattern(status_code, 0).search(status) is not None
+        return status == status_code
+
+    @staticmethod
+    def get_asset_busy_time(asset_list: List["HarEntry"]) -> int:
+        """
+        Returns the number of milliseconds where at least one of the requested
+        assets was loading. This is the same value as
+        ``len(create_asset_timeline(asset_list))`` but is calculated by merging
+        the load intervals of the assets, so no per-millisecond timeline is
+        built.
+
+        :param asset_list: The assets to calculate the busy time for.
+        :type asset_list: List[HarEntry]
+        :return: Milliseconds where at least one asset was loading
+        :rtype: int
+        """
+        intervals = []
+        for asset in asset_list:
+            start = asset.startTimeMs
+            if start is None:
+                continue
+            # Every asset occupies at least the millisecond it started in
+            intervals.append((start, start + max(int(asset.time), 1)))
+        return int(round(union_length(intervals)))
 
     @staticmethod
     def create_asset_timeline(asset_list: List["HarEntry"]) -> defaultdict:
@@ -207,6 +335,9 @@ class HarParser:
         one of the requested assets was loaded. The value is a `list` of ALL
         assets that were loading at that time.
 
+        NOTE: This allocates one key per millisecond of load time. Use
+        ``get_asset_busy_time`` if only the total load time is needed.
+
         :param asset_list: The assets to create a timeline for.
         :type asset_list: List[HarEntry]
         :return: Milliseconds and assets that were loaded
@@ -229,7 +360,34 @@ class HarParser:
 
         return results
 
-    @property
+    @cached_property
+    def page_index(self) -> dict:
+        """
+        Maps every page ID to the raw page ``dict`` of the HAR file.
+
+        :return: Page ID and page data
+        :rtype: dict
+        """
+        pages = self.compact.pages if self.compact else self.har_data["pages"]
+        return {page["id"]: page for page in pages}
+
+    @cached_property
+    def entry_index(self) -> dict:
+        """
+        Groups the raw entries of the HAR file by their ``pageref``. This is
+        built with a single pass over the entries so each page does not have to
+        scan the whole log. Entries with no page ID are stored under
+        ``unknown``.
+
+        :return: Page ID and the raw entries for that page
+        :rtype: dict
+        """
+        index = defaultdict(list)
+        for entry in self.har_data["entries"]:
+            index[entry.get("pageref", "unknown")].append(entry)
+        return dict(index)
+
+    @cached_property
     def pages(self) -> List["HarPage"]:
         """
         This is a list of HarPage objects, each of which represents a page
@@ -241,14 +399,19 @@ class HarParser:
         # Start with a page object for unknown entries if the HAR data has
         # any entries with no page ID
         pages = []
-        if any("pageref" not in entry for entry in self.har_data["entries"]):
+        page_ids = self.compact.page_rows if self.compact else self.entry_index
+        if "unknown" in page_ids:
             pages.append(HarPage("unknown", har_parser=self))
-        for har_page in self.har_data["pages"]:
-            page = HarPage(har_page["id"], har_parser=self)
-            pages.append(page)
+        for page_id in self.page_index:
+            pages.append(HarPage(page_id, har_parser=self))
 
         return pages
 
+    @property
+    def _log(self) -> dict:
+        """The HAR log, without reading the entries if a cache is open"""
+        return self.compact.log if self.compact else self.har_data
+
     @property
     def browser(self) -> str:
         """
@@ -257,7 +420,7 @@ class HarParser:
         :return: Browser of the Har File
         :rtype: str
         """
-        return self.har_data["browser"]
+        return self._log["browser"]
 
     @property
     def version(self) -> str:
@@ -267,7 +430,7 @@ class HarParser:
         :return: Version of HAR used
         :rtype: str
         """
-        return self.har_data["version"]
+        return self._log["version"]
 
     @property
     def creator(self) -> str:
@@ -277,7 +440,7 @@ class HarParser:
         :return: Program that created the HarFile
         :rtype: str
         """
-        return self.har_data["creator"]
+        return self._log["creator"]
 
     @cached_property
     def hostname(self) -> str:
@@ -297,6 +460,18 @@ class HarPage:
     An object representing one page of a HAR resource
     """
 
+    # This maps the content type attributes to their respective regex
+    # representations
+    ASSET_TYPES = {
+        "image": "image.*",
+        "css": ".*css",
+        "text": "text.*",
+        "js": ".*javascript",
+        "audio": "audio.*",
+        "video": "video.*|.*flash",
+        "html": "html",
+    }
+
     def __init__(
         self, page_id: str, har_parser: "HarParser" = None, har_data: dict = None
     ):
@@ -310,6 +485,7 @@ class HarPage:
         """
         self.page_id = page_id
         self._index = 0
+        self._table = None
         if har_parser is None and har_data is None:
             raise ValueError("Either parser or har_data is required")
         if har_parser:
@@ -317,34 +493,18 @@ class HarPage:
         else:
             self.parser = HarParser(har_data=har_data)
 
-        # This maps the content type attributes to their respective regex
-        # representations
-        self.asset_types = {
-            "image": "image.*",
-            "css": ".*css",
-            "text": "text.*",
-            "js": ".*javascript",
-            "audio": "audio.*",
-            "video": "video.*|.*flash",
-            "html": "html",
-        }
+        self.asset_types = dict(self.ASSET_TYPES)
 
         # Init properties that mimic the actual 'pages' object from the HAR file
-        raw_data = self.parser.har_data
-        valid = False
-        if self.page_id == "unknown":
-            valid = True
-        for page in raw_data["pages"]:
-            if page["id"] == self.page_id:
-                valid = True
-                self.title = page.get("title", "")
-                self.startedDateTime = page["startedDateTime"]
-                self.pageTimings = page["pageTimings"]
-
-        if not valid:
-            page_ids = [page["id"] for page in raw_data["pages"]]
+        page_index = self.parser.page_index
+        if self.page_id in page_index:
+            page = page_index[self.page_id]
+            self.title = page.get("title", "")
+            self.startedDateTime = page["startedDateTime"]
+            self.pageTimings = page["pageTimings"]
+        elif self.page_id != "unknown":
             raise PageNotFoundError(
-                f"No page found with id {self.page_id}\n\nPage ID's are {page_ids}"
+                f"No page found with id {self.page_id}\n\nPage ID's are {list(page_index)}"
             )
 
     def __repr__(self):
@@ -362,6 +522,279 @@ class HarPage:
         self._index += 1
         return result
 
+    def to_columns(self) -> HarTable:
+        """
+        Columnar representation of the entries of the page. Built once and
+        reused by the filtering, size and load time helpers.
+
+        :return: Table of the page entries, in the same order as ``entries``
+        :rtype: HarTable
+        """
+        if self._table is None:
+            if self.parser.compact:
+                self._table = self.parser.compact.table(self.page_id)
+            else:
+                self._table = HarTable.from_entries(self.entries)
+        return self._table
+
+    def _get_asset_filter(self, asset_type: str) -> EntryFilter:
+        """
+        :param asset_type: Asset type to filter for
+        :type asset_type: str
+        :return: Shared filter for the asset type
+        :rtype: EntryFilter
+        """
+        return EntryFilter.cached(content_type=self.asset_types[asset_type])
+
+    @cached_property
+    def asset_summary(self) -> Dict[str, dict]:
+        """
+        Classifies every entry into its asset type(s) in one pass and totals
+        all the asset types together. The *_files, *_count, *_size and
+        *_load_time properties of the asset types are all read from here.
+
+        :return: Asset type and its 'count', 'size', 'size_trans',
+            'load_time' and the 'mask' of its rows in ``to_columns()``
+        :rtype: Dict[str, dict]
+        """
+        table = self.to_columns()
+        buckets = table.classify(
+            {asset_type: self._get_asset_filter(asset_type) for asset_type in self.asset_types}
+        )
+        summary = {}
+        if not buckets:
+            return summary
+        masks = np.array(list(buckets.values())).reshape(len(buckets), len(table))
+        counts = masks.sum(axis=1)
+        sizes = masks @ np.where(table.body_size > 0, table.body_size, 0)
+        sizes_trans = masks @ table.transfer_size
+        for i, (asset_type, mask) in enumerate(buckets.items()):
+            summary[asset_type] = dict(
+                count=int(counts[i]),
+                size=int(sizes[i]),
+                size_trans=int(sizes_trans[i]),
+                load_time=table.busy_time(mask),
+                mask=mask,
+            )
+        return summary
+
+    @cached_property
+    def asset_histograms(self) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """
+        Latency histograms of the ``receive``, ``wait`` and total ``time`` of
+        every asset type.
+
+        :return: Asset type, metric name and histogram
+        :rtype: Dict[str, Dict[str, LatencyHistogram]]
+        """
+        table = self.to_columns()
+        return {
+            asset_type: table.histograms(summary["mask"])
+            for asset_type, summary in self.asset_summary.items()
+        }
+
+    @cached_property
+    def server_histograms(self) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """
+        Latency histograms of the ``receive``, ``wait`` and total ``time`` of
+        the entries of every server IP address.
+
+        :return: Server IP address, metric name and histogram
+        :rtype: Dict[str, Dict[str, LatencyHistogram]]
+        """
+        table = self.to_columns()
+        valid = table.mask(EntryFilter())
+        return {
+            table.server_ips[code]: table.histograms(valid & (table.server_code == code))
+            for code in np.unique(table.server_code[valid])
+        }
+
+    def get_latency_percentiles(self, group_by: str = "asset_type") -> Dict[str, dict]:
+        """
+        50th, 90th and 99th percentile of the ``receive``, ``wait`` and total
+        ``time`` of the entries.
+
+        :param group_by: 'asset_type' or 'server_ip'
+        :type group_by: str
+        :return: Group, metric name and percentiles, i.e. -
+            {'image': {'receive': {'p50': 12.5, 'p90': 80.0, 'p99': 121.0}}}
+        :rtype: Dict[str, dict]
+        """
+        if group_by == "asset_type":
+            return get_percentiles(self.asset_histograms)
+        if group_by == "server_ip":
+            return get_percentiles(self.server_histograms)
+        raise ValueError("group_by must be 'asset_type' or 'server_ip'")
+
+    @cached_property
+    def throughput_stats(self) -> Dict[str, Dict[str, ThroughputStats]]:
+        """
+        Goodput (response body bytes over receive time) of the entries,
+        grouped by 'asset_type', 'server_ip' and 'hostname', and of the whole
+        page under 'page'. Entries without a body or a receive time are not
+        counted.
+
+        :return: Grouping, group name and totals
+        :rtype: Dict[str, Dict[str, ThroughputStats]]
+        """
+        table = self.to_columns()
+        valid = table.mask(EntryFilter())
+        sizes = np.where(valid, table.body_size, 0)
+        receives = table.receive
+        page = ThroughputStats()
+        page.add_many(sizes, receives)
+        stats = dict(page=dict(all=page), asset_type={})
+        for asset_type, summary in self.asset_summary.items():
+            totals = stats["asset_type"][asset_type] = ThroughputStats()
+            totals.add_many(sizes[summary["mask"]], receives[summary["mask"]])
+        stats["server_ip"] = group_throughput(
+            sizes, receives, table.server_code, table.server_ips
+        )
+        hosts, host_codes = table.hostnames()
+        stats["hostname"] = group_throughput(sizes, receives, host_codes, hosts)
+        return stats
+
+    def get_throughput(self, group_by: str = "asset_type") -> Dict[str, dict]:
+        """
+        Goodput of the entries, see ``throughput_stats``.
+
+        :param group_by: 'asset_type', 'server_ip', 'hostname' or 'page'
+        :type group_by: str
+        :return: Group and its 'count', 'bytes', 'receive', 'throughput'
+            (bytes/s) and the percentiles of the throughput of its entries
+        :rtype: Dict[str, dict]
+        """
+        if group_by not in self.throughput_stats:
+            raise ValueError(
+                "group_by must be 'asset_type', 'server_ip', 'hostname' or 'page'"
+            )
+        return {
+            name: stats.to_dict() for name, stats in self.throughput_stats[group_by].items()
+        }
+
+    @cached_property
+    def throughput_series(self) -> ThroughputSeries:
+        """
+        :return: Bytes and receive time of the entries by the second they
+            finished in
+        :rtype: ThroughputSeries
+        """
+        return self.get_throughput_series()
+
+    def get_throughput_series(
+        self, asset_type: str = None, step: int = SERIES_STEP
+    ) -> ThroughputSeries:
+        """
+        :param asset_type: Only include this asset type
+        :type asset_type: str
+        :param step: Width of the buckets in ms
+        :type step: int
+        :return: Bytes and receive time of the entries by the time they
+            finished, call ``rolling(window)`` for the throughput over time
+        :rtype: ThroughputSeries
+        """
+        table = self.to_columns()
+        mask = (
+            table.mask(EntryFilter())
+            if asset_type is None
+            else self.asset_summary[asset_type]["mask"]
+        )
+        series = ThroughputSeries(step)
+        series.add_many(
+            table.start[mask] + table.time[mask], table.body_size[mask], table.receive[mask]
+        )
+        return series
+
+    def get_throughput_over_time(
+        self, asset_type: str = None, window: int = SERIES_WINDOW
+    ) -> Dict[str, np.ndarray]:
+        """
+        :param asset_type: Only include this asset type
+        :type asset_type: str
+        :param window: Width of the rolling window in ms
+        :type window: int
+        :return: See ``ThroughputSeries.rolling``
+        :rtype: Dict[str, np.ndarray]
+        """
+        series = (
+            self.throughput_series
+            if asset_type is None
+            else self.get_throughput_series(asset_type)
+        )
+        return series.rolling(window)
+
+    @cached_property
+    def connection_stats(self) -> Dict[str, Dict[str, ConnectionStats]]:
+        """
+        Connection setup totals of all the entries, grouped by 'server_ip'
+        and 'http_version', and of the whole page under 'page'.
+
+        :return: Grouping, group name and totals
+        :rtype: Dict[str, Dict[str, ConnectionStats]]
+        """
+        table = self.to_columns()
+        ids = table.connection_ids()
+        return dict(
+            page=group_connections(table, np.zeros(len(table), dtype=np.int32), ["all"], ids),
+            server_ip=group_connections(table, table.server_code, table.server_ips, ids),
+            http_version=group_connections(
+                table, table.version_code, table.http_versions, ids
+            ),
+        )
+
+    def get_connection_breakdown(self, group_by: str = "server_ip") -> Dict[str, dict]:
+        """
+        Connection reuse, handshake cost, DNS cache effectiveness and blocked
+        time of the entries, see ``ConnectionStats.to_dict``.
+
+        :param group_by: 'server_ip', 'http_version' or 'page'
+        :type group_by: str
+        :return: Group and its connection setup metrics
+        :rtype: Dict[str, dict]
+        """
+        if group_by not in self.connection_stats:
+            raise ValueError("group_by must be 'server_ip', 'http_version' or 'page'")
+        return {
+            name: stats.to_dict() for name, stats in self.connection_stats[group_by].items()
+        }
+
+    def get_connections(self) -> List[dict]:
+        """
+        Every connection the entries were sent on, in the order they were
+        first used (see ``HarTable.connection_ids``).
+
+        :return: 'server_ip', 'requests', 'handshake' (ms), 'start' (ms since
+            the epoch of its first request) and whether the page 'opened' it
+            of every connection
+        :rtype: List[dict]
+        """
+        table = self.to_columns()
+        ids = table.connection_ids()
+        if not len(ids):
+            return []
+        count = ids.max() + 1
+        first = np.full(count, len(ids))
+        np.minimum.at(first, ids, np.arange(len(ids)))
+        requests = np.bincount(ids, minlength=count)
+        handshake = np.bincount(
+            ids, weights=np.where(table.connect > 0, table.connect, 0), minlength=count
+        )
+        with np.errstate(invalid="ignore"):
+            opened = np.bincount(ids, weights=table.connect >= 0, minlength=count) > 0
+        starts = np.full(count, np.inf)
+        np.fmin.at(starts, ids, table.start)
+        connections = [
+            dict(
+                server_ip=table.server_ips[int(table.server_code[first[i]])],
+                requests=int(requests[i]),
+                handshake=_as_number(handshake[i]),
+                start=None if np.isinf(starts[i]) else float(starts[i]),
+                opened=bool(opened[i]),
+            )
+            for i in range(count)
+        ]
+        return sorted(connections, key=lambda c: np.inf if c["start"] is None else c["start"])
+
     def _get_asset_files(self, asset_type: str) -> List["HarEntry"]:
         """
         Returns a list of all HarEntry object of a certain file type.
@@ -370,21 +803,30 @@ class HarPage:
         :return: List of HarEntry objects that meet the
         :rtype: List[HarEntry]
         """
-        return self.filter_entries(content_type=self.asset_types[asset_type])
+        entries = self.entries
+        return [entries[i] for i in self.asset_summary[asset_type]["mask"].nonzero()[0]]
 
-    # def _get_asset_size_trans(self, asset_type: str) -> int:
-    #     """
-    #     Helper function to dynamically create *_size properties.
-    #     :param asset_type: Asset type to filter for
-    #     :type asset_type: str
-    #     :return: Size of transferred data
-    #     :rtype: int
-    #     """
-    #     if asset_type == "page":
-    #         assets = self.entries
-    #     else:
-    #         assets = getattr(self, f"{asset_type}_files", None)
-    #     return self.get_total_size_trans(assets)
+    def _get_asset_size_trans(self, asset_type: str) -> int:
+        """
+        Helper function to dynamically create *_size_trans properties.
+        :param asset_type: Asset type to filter for
+        :type asset_type: str
+        :return: Size of transferred data
+        :rtype: int
+        """
+        if asset_type == "page":
+            return self.to_columns().total_transfer_size()
+        return self.asset_summary[asset_type]["size_trans"]
+
+    def _get_asset_count(self, asset_type: str) -> int:
+        """
+        Helper function to dynamically create *_count properties.
+        :param asset_type: Asset type to filter for
+        :type asset_type: str
+        :return: Number of assets
+        :rtype: int
+        """
+        return self.asset_summary[asset_type]["count"]
 
     def _get_asset_size(self, asset_type: str):
         """
@@ -395,10 +837,8 @@ class HarPage:
         :rtype: int
         """
         if asset_type == "page":
-            assets = self.entries
-        else:
-            assets = getattr(self, f"{asset_type}_files", None)
-        return self.get_total_size(assets)
+            return self.to_columns().total_size()
+        return self.asset_summary[asset_type]["size"]
 
     def _get_asset_load(self, asset_type: str) -> Optional[int]:
         """
@@ -410,13 +850,13 @@ class HarPage:
         :rtype: int
         """
         if asset_type == "initial":
-            return self.actual_page.time
+            return self.to_columns().initial_load_time()
         if asset_type == "content":
-            return self.pageTimings["onContentLoad"]
+            return self.pageTimings.get("onContentLoad")
         if asset_type == "page":
             if self.page_id == "unknown":
                 return None
-            return self.pageTimings["onLoad"]
+            return self.pageTimings.get("onLoad")
             # TODO - should we return a slightly fake total load time to
             # accommodate HAR data that cannot understand things like JS
             # rendering or just throw a warning?
@@ -425,7 +865,7 @@ class HarPage:
             #   content_type='.*',
             #   status_code='.*',
             #   asynchronous=False)
-        return self.get_load_time(content_type=self.asset_types[asset_type])
+        return self.asset_summary[asset_type]["load_time"]
 
     def filter_entries(
         self,
@@ -438,7 +878,7 @@ class HarPage:
         content_size: int = None,
         regex: bool = True,
     ) -> List["HarEntry"]:
-        # pylint: disable=R0913,W0105
+        # pylint: disable=R0913
         """
         Generate a list of entries with from criteria
 
@@ -463,56 +903,31 @@ class HarPage:
         :return: List of entry objects based on the filtered criteria.
         :rtype: List[HarEntry]
         """
-        results = []
+        return self._apply_filter(
+            EntryFilter(
+                request_type=request_type,
+                content_type=content_type,
+                status_code=status_code,
+                http_version=http_version,
+                load_time__gt=load_time__gt,
+                receive_time__gt=receive_time__gt,
+                content_size=content_size,
+                regex=regex,
+            )
+        )
 
-        for entry in self.entries:
-            """
-            So yea... this is a bit ugly. We are looking for:
-
-                * The request type using self._match_request_type()
-                * The content type using self._match_headers() 
-                * The HTTP response status code using self._match_status_code()
-                * The HTTP version using self._match_headers()
-
-                # TODO: do we even need match_headers()?
-
-            Oh lords of python.... please forgive my soul
-            """
-            valid_entry = True
-            p = self.parser
-            if request_type is not None and not p.match_request_type(
-                entry, request_type, regex=regex
-            ):
-                valid_entry = False
-            if content_type is not None:
-                if not self.parser.match_content_type(entry, content_type, regex=regex):
-                    valid_entry = False
-            if status_code is not None and not p.match_status_code(
-                entry, status_code, regex=regex
-            ):
-                valid_entry = False
-            if http_version is not None and not p.match_http_version(
-                entry, http_version, regex=regex
-            ):
-                valid_entry = False
-            if load_time__gt is not None and entry.time < load_time__gt:
-                valid_entry = False
-            if (
-                receive_time__gt is not None and entry.timings.get("receive")
-                and entry.timings["receive"] < receive_time__gt
-            ):
-                valid_entry = False
-            if content_size is not None and  content_size > entry.response.bodySize:                
-                valid_entry = False
-
-            # If no receive time, this isn't a valid entry TODO: ugly
-            if not entry.timings.get("receive"): 
-                valid_entry = False
-
-            if valid_entry:
-                results.append(entry)
+    def _apply_filter(self, entry_filter: EntryFilter) -> List["HarEntry"]:
+        """
+        Returns the entries that match a compiled filter.
 
-        return results
+        :param entry_filter: Compiled filter criteria
+        :type entry_filter: EntryFilter
+        :return: List of entry objects that match the filter
+        :rtype: List[HarEntry]
+        """
+        mask = self.to_columns().mask(entry_filter)
+        entries = self.entries
+        return [entries[i] for i in mask.nonzero()[0]]
 
     def get_load_time(
         self,
@@ -548,20 +963,20 @@ class HarPage:
         :return: Total load time
         :rtype: int
         """
-        entries = self.filter_entries(
-            request_type=request_type,
-            content_type=content_type,
-            status_code=status_code,
+        table = self.to_columns()
+        mask = table.mask(
+            EntryFilter.cached(
+                request_type=request_type,
+                content_type=content_type,
+                status_code=status_code,
+            )
         )
 
         asynchronous = kwargs.get("async", asynchronous)
 
         if not asynchronous:
-            time = 0
-            for entry in entries:
-                time += entry.time
-            return time
-        return len(self.parser.create_asset_timeline(entries))
+            return table.total_time(mask)
+        return table.busy_time(mask)
 
     @staticmethod
     def get_total_size(entries: List["HarEntry"]) -> int:
@@ -578,34 +993,29 @@ class HarPage:
                 size += entry.response.bodySize
         return size
 
-    # @staticmethod
-    # def get_total_size_trans(entries: List["HarEntry"]) -> int:
-    #     """
-    #     Returns the total size of a collection of entries - transferred.
+    @staticmethod
+    def get_total_size_trans(entries: List["HarEntry"]) -> int:
+        """
+        Returns the total size of a collection of entries - transferred.
 
-    #     NOTE: use with har file generated with chrome-har-capturer
+        NOTE: ``_transferSize`` is only exported by Chrome, for other browsers
+        the headers size plus the body size is used.
 
-    #     :param entries: ``list`` of entries to calculate the total size of.
-    #     :return: Total size of entries that was transferred
-    #     :rtype: int
-    #     """
-    #     size = 0
-    #     for entry in entries:
-    #         if entry.response.raw_entry["_transferSize"] > 0:
-    #             size += entry.response.raw_entry["_transferSize"]
-    #     return size
+        :param entries: ``list`` of entries to calculate the total size of.
+        :return: Total size of entries that was transferred
+        :rtype: int
+        """
+        return sum(entry.response.transferSize for entry in entries)
 
     # BEGIN PROPERTIES #
 
     @cached_property
-    def hostname(self) -> str:  # pylint: disable=R1710
+    def hostname(self) -> Optional[str]:
         """
         :return: Hostname of the initial request
-        :rtype: str
+        :rtype: Optional[str]
         """
-        for header in self.entries[0].request.headers:
-            if header["name"] == "Host":
-                return header["value"]
+        return self.entries[0].request.host
 
     @cached_property
     def url(self) -> Optional[str]:
@@ -628,16 +1038,12 @@ class HarPage:
         :return: All entries that make up the page
         :rtype: List[HarEntry]
         """
-        page_entries = []
-        for entry in self.parser.har_data["entries"]:
-            if "pageref" not in entry:
-                if self.page_id == "unknown":
-                    page_entries.append(HarEntry(entry))
-            elif entry["pageref"] == self.page_id:
-                page_entries.append(HarEntry(entry))
+        page_entries = [
+            HarEntry(entry) for entry in self.parser.entry_index.get(self.page_id, [])
+        ]
         # Make sure the entries are sorted chronologically
-        if all(x.startTime for x in page_entries):
-            return sorted(page_entries, key=lambda entry: entry.startTime)
+        if all(x.startTimeMs is not None for x in page_entries):
+            return sorted(page_entries, key=lambda entry: entry.startTimeMs)
         return page_entries
 
     @cached_property
@@ -650,17 +1056,7 @@ class HarPage:
         # As such, it would not have a TTFB
         if self.page_id == "unknown":
             return None
-        ttfb = 0
-        for entry in self.entries:
-            if entry.response.status == 200:
-                for k, v in entry.timings.items():
-                    if k != "receive":
-                        if v > 0:
-                            ttfb += v
-                break
-            ttfb += entry.time
-
-        return ttfb
+        return self.to_columns().time_to_first_byte()
 
     @cached_property
     def get_requests(self) -> List["HarEntry"]:
@@ -780,6 +1176,76 @@ class HarPage:
         """
         return self._get_asset_files("html")
 
+    @cached_property
+    def image_count(self) -> int:
+        """
+        Number of image files for a page
+
+        :return: Number of image entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("image")
+
+    @cached_property
+    def css_count(self) -> int:
+        """
+        Number of CSS files for a page
+
+        :return: Number of CSS entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("css")
+
+    @cached_property
+    def text_count(self) -> int:
+        """
+        Number of text files for a page
+
+        :return: Number of text entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("text")
+
+    @cached_property
+    def js_count(self) -> int:
+        """
+        Number of JS files for a page
+
+        :return: Number of JS entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("js")
+
+    @cached_property
+    def audio_count(self) -> int:
+        """
+        Number of audio files for a page
+
+        :return: Number of audio entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("audio")
+
+    @cached_property
+    def video_count(self) -> int:
+        """
+        Number of video files for a page
+
+        :return: Number of video entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("video")
+
+    @cached_property
+    def html_count(self) -> int:
+        """
+        Number of HTML files for a page
+
+        :return: Number of HTML entries for a page
+        :rtype: int
+        """
+        return self._get_asset_count("html")
+
     @cached_property
     def page_size(self) -> int:
         """
@@ -1014,10 +1480,21 @@ class HarPage:
 class HarEntry(MimicDict):
     """
     An object that represent one entry in a HAR Page
+
+    Entries are created for every request of a HAR file, so they are slotted
+    and only hold the raw entry plus the few values that are expensive to
+    compute. The Request and Response wrappers are only created when they
+    are used. Everything else is read from the raw entry on access.
     """
 
+    __slots__ = ("raw_entry", "_request", "_response", "_startTime", "_startTimeMs")
+
     def __init__(self, entry: dict):
         self.raw_entry = entry
+        self._request = None
+        self._response = None
+        self._startTime = NOT_PARSED
+        self._startTimeMs = NOT_PARSED
         super().__init__()
 
     def __str__(self):
@@ -1026,37 +1503,53 @@ class HarEntry(MimicDict):
     def __repr__(self):
         return f"HarEntry for {self.url}"
 
-    @cached_property
+    @property
     def request(self) -> Request:
         """
         :return: Request of the entry
         :rtype: Request
         """
-        return Request(entry=self.raw_entry["request"])
+        if self._request is None:
+            self._request = Request(entry=self.raw_entry["request"])
+        return self._request
 
-    @cached_property
+    @property
     def response(self) -> Response:
         """
         :return: Response of the entry
         :rtype: Response
         """
-        return Response(url=self.url, entry=self.raw_entry["response"])
+        if self._response is None:
+            self._response = Response(url=self.url, entry=self.raw_entry["response"])
+        return self._response
 
-    @cached_property
+    @property
     def startTime(self) -> Optional[datetime.datetime]:
-        # pylint: disable=W0212
         """
         Start time and date
 
         :return: Start time of entry
         :rtype: Optional[datetime.datetime]
         """
-        try:
-            return parser.parse(self.raw_entry.get("startedDateTime", ""))
-        except parser._parser.ParserError:
-            return None
+        if self._startTime is NOT_PARSED:
+            self._startTime = parse_datetime(self.raw_entry.get("startedDateTime", ""))
+        return self._startTime
 
-    @cached_property
+    @property
+    def startTimeMs(self) -> Optional[float]:
+        """
+        Start time as milliseconds since the epoch. Cheaper to sort and do
+        arithmetic on than ``startTime``.
+
+        :return: Start time of entry in ms
+        :rtype: Optional[float]
+        """
+        if self._startTimeMs is NOT_PARSED:
+            start_time = self.startTime
+            self._startTimeMs = None if start_time is None else datetime_to_ms(start_time)
+        return self._startTimeMs
+
+    @property
     def cache(self) -> str:
         """
         :return: Cached objects
@@ -1064,7 +1557,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry["cache"]
 
-    @cached_property
+    @property
     def cookies(self) -> list:
         """
         :return: Request and Response Cookies
@@ -1072,7 +1565,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry.get("cookies", [])
 
-    @cached_property
+    @property
     def pageref(self) -> str:
         """
         :return: Page for the entry
@@ -1080,7 +1573,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry["pageref"]
 
-    @cached_property
+    @property
     def port(self) -> int:
         """
         :return: Port connection was made to
@@ -1088,7 +1581,7 @@ class HarEntry(MimicDict):
         """
         return int(self.raw_entry["connection"])
 
-    @cached_property
+    @property
     def secure(self) -> bool:
         """
         :return: Connection was secure
@@ -1096,7 +1589,20 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry.get("_securityState", "") == "secure"
 
-    @cached_property
+    @property
+    def throughput(self) -> Optional[float]:
+        """
+        :return: Response body bytes per second of receive time, None if
+            there was no body or no receive time
+        :rtype: Optional[float]
+        """
+        body_size = self.response.bodySize
+        receive = self.raw_entry.get("timings", {}).get("receive")
+        if not isinstance(receive, (int, float)) or body_size <= 0 or receive <= 0:
+            return None
+        return get_throughput(body_size, receive)
+
+    @property
     def serverAddress(self) -> str:
         """
         :return: IP Address of the server
@@ -1104,7 +1610,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry.get("serverIPAddress", "unknown")
 
-    @cached_property
+    @property
     def status(self) -> int:
         """
         :return: HTTP Status Code
@@ -1112,7 +1618,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry["response"]["status"]
 
-    @cached_property
+    @property
     def time(self) -> int:
         """
         :return: Time taken to complete entry
@@ -1120,7 +1626,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry["time"]
 
-    @cached_property
+    @property
     def timings(self) -> dict:
         """
         :return: Timing of the page load
@@ -1128,7 +1634,7 @@ class HarEntry(MimicDict):
         """
         return self.raw_entry["timings"]
 
-    @cached_property
+    @property
     def url(self) -> str:
         """
         :return: URL of Entry
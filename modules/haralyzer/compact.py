@@ -0,0 +1,180 @@
+"""
+Compact on-disk cache of a HAR file. The hot per-entry columns of every page
+(see HarTable) are written to one ``.npy`` file that is memory-mapped on load,
+and the strings (URLs, mime types, server IPs...) are interned into a small
+JSON string table next to it. Reopening the cache does not parse any JSON
+entries and the columns are shared between processes through the OS page
+cache.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .table import HarTable, StringTable
+
+FORMAT_VERSION = 3
+CACHE_SUFFIX = ".harc"
+COLUMNS_FILENAME = "columns.npy"
+META_FILENAME = "meta.json"
+
+
+def get_cache_path(har_file: str) -> str:
+    """
+    :param har_file: Path to the HAR file
+    :type har_file: str
+    :return: Path to the cache directory of the HAR file
+    :rtype: str
+    """
+    return f"{har_file}{CACHE_SUFFIX}"
+
+
+class CompactHar:
+    """
+    A HAR file converted to columns. The rows of every page are stored next to
+    each other, in the same order as ``HarPage.entries``.
+    """
+
+    DTYPE = np.dtype(list(HarTable.COLUMNS))
+
+    def __init__(self, rows: np.ndarray, meta: dict):
+        """
+        :param rows: Structured array with a field for every HarTable column
+        :type rows: np.ndarray
+        :param meta: Page metadata, page row ranges and string tables
+        :type meta: dict
+        """
+        self.rows = rows
+        self.meta = meta
+        self.string_tables = {
+            name: StringTable(meta["strings"][name]) for name in HarTable.STRING_TABLES
+        }
+
+    @property
+    def log(self) -> dict:
+        """
+        :return: The ``log`` of the HAR file without the pages and entries
+        :rtype: dict
+        """
+        return self.meta["log"]
+
+    @property
+    def pages(self) -> List[dict]:
+        """
+        :return: The ``pages`` of the HAR file
+        :rtype: List[dict]
+        """
+        return self.meta["pages"]
+
+    @property
+    def page_rows(self) -> Dict[str, List[int]]:
+        """
+        :return: Page ID and the [start, end) row range of its entries
+        :rtype: Dict[str, List[int]]
+        """
+        return self.meta["page_rows"]
+
+    def table(self, page_id: str) -> HarTable:
+        """
+        Columns of one page. The arrays are views into the memory-mapped rows,
+        nothing is copied.
+
+        :param page_id: Page ID
+        :type page_id: str
+        :return: Table of the page entries
+        :rtype: HarTable
+        """
+        start, end = self.page_rows.get(page_id, (0, 0))
+        rows = self.rows[start:end]
+        columns = {name: rows[name] for name in HarTable.NUMERIC_COLUMNS}
+        return HarTable(columns, self.string_tables)
+
+    @classmethod
+    def write(cls, har_file: str) -> str:
+        """
+        Converts a HAR file to a compact cache next to it.
+
+        :param har_file: Path to the HAR file
+        :type har_file: str
+        :return: Path to the cache directory
+        :rtype: str
+        """
+        # pylint: disable=C0415
+        from .assets import HarParser
+
+        stat = os.stat(har_file)
+        har_parser = HarParser.from_file(har_file)
+        string_tables = {name: StringTable() for name in HarTable.STRING_TABLES}
+        tables, page_rows, row = [], {}, 0
+        for page in har_parser.pages:
+            table = HarTable.from_entries(page.entries, string_tables=string_tables)
+            tables.append(table)
+            page_rows[page.page_id] = [row, row + len(table)]
+            row += len(table)
+
+        rows = np.zeros(row, dtype=cls.DTYPE)
+        for table, (start, end) in zip(tables, page_rows.values()):
+            for name in HarTable.NUMERIC_COLUMNS:
+                rows[name][start:end] = table.columns[name]
+
+        meta = dict(
+            version=FORMAT_VERSION,
+            source=dict(size=stat.st_size, mtime=stat.st_mtime),
+            log={
+                k: v
+                for k, v in har_parser.har_data.items()
+                if k not in ("pages", "entries")
+            },
+            pages=har_parser.har_data["pages"],
+            page_rows=page_rows,
+            strings={name: table.values for name, table in string_tables.items()},
+        )
+
+        # The meta file is written last so a cache is only ever picked up
+        # once it is complete
+        cache_path = get_cache_path(har_file)
+        os.makedirs(cache_path, exist_ok=True)
+        columns_file = os.path.join(cache_path, COLUMNS_FILENAME)
+        meta_file = os.path.join(cache_path, META_FILENAME)
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
+        with open(f"{columns_file}.tmp", "wb") as f:
+            np.save(f, rows)
+        os.replace(f"{columns_file}.tmp", columns_file)
+        with open(f"{meta_file}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_file}.tmp", meta_file)
+        return cache_path
+
+    @classmethod
+    def open(cls, har_file: str) -> Optional["CompactHar"]:
+        """
+        Opens the cache of a HAR file if there is one that is at least as new
+        as the HAR file.
+
+        :param har_file: Path to the HAR file
+        :type har_file: str
+        :return: The cache or None if it is missing or stale
+        :rtype: Optional[CompactHar]
+        """
+        cache_path = get_cache_path(har_file)
+        meta_file = os.path.join(cache_path, META_FILENAME)
+        try:
+            stat = os.stat(har_file)
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != FORMAT_VERSION or meta.get("source") != dict(
+            size=stat.st_size, mtime=stat.st_mtime
+        ):
+            return None
+
+        columns_file = os.path.join(cache_path, COLUMNS_FILENAME)
+        # An empty array can not be memory-mapped
+        mmap_mode = "r" if any(end > start for start, end in meta["page_rows"].values()) else None
+        rows = np.load(columns_file, mmap_mode=mmap_mode)
+        if rows.dtype != cls.DTYPE:
+            return None
+        return cls(rows, meta)
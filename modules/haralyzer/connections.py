@@ -0,0 +1,224 @@
+"""
+Connection setup costs of HAR entries. Entries are grouped (by server, HTTP
+version or the whole page) and the ``blocked``, ``dns``, ``connect`` and
+``ssl`` timings of every group are totalled in one pass over the columns:
+how many requests reused a connection, how much the handshakes cost per
+request, how often DNS was answered from the cache and how long requests
+queued before they were sent.
+
+Requests are put on connections by ``HarTable.connection_ids``. A connection
+was opened by the page when one of its requests has a ``connect`` timing
+that is not -1 (the HAR value for "not applicable", i.e. - the connection
+was reused), those are the ones counted in ``connections``.
+"""
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .histogram import PERCENTILES, LatencyHistogram
+
+
+def _positive_sum(values: np.ndarray, inverse: np.ndarray, groups: int) -> np.ndarray:
+    """Sum of the values above 0 of every group"""
+    with np.errstate(invalid="ignore"):
+        weights = np.where(values > 0, values, 0)
+    return np.bincount(inverse, weights=weights, minlength=groups)
+
+
+class ConnectionStats:
+    # pylint: disable=R0902
+    """
+    Connection setup totals of a group of entries. ``handshake`` is the time
+    spent connecting (which includes ``ssl``), all times are in ms.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.handshake = 0.0
+        self.ssl = 0.0
+        self.dns_lookups = 0
+        self.dns = 0.0
+        self.time = 0.0
+        self.blocked = LatencyHistogram()
+
+    def __repr__(self):
+        return f"ConnectionStats of {self.requests} requests on {self.connections} new connections"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ConnectionStats):
+            return NotImplemented
+        return (
+            self.requests == other.requests
+            and self.connections == other.connections
+            and self.dns_lookups == other.dns_lookups
+            and np.allclose(
+                [self.handshake, self.ssl, self.dns, self.time],
+                [other.handshake, other.ssl, other.dns, other.time],
+            )
+            and self.blocked == other.blocked
+        )
+
+    def __iadd__(self, other: "ConnectionStats") -> "ConnectionStats":
+        self.merge(other)
+        return self
+
+    def merge(self, other: "ConnectionStats") -> None:
+        """
+        :param other: Totals to add to these
+        :type other: ConnectionStats
+        """
+        self.requests += other.requests
+        self.connections += other.connections
+        self.handshake += other.handshake
+        self.ssl += other.ssl
+        self.dns_lookups += other.dns_lookups
+        self.dns += other.dns
+        self.time += other.time
+        self.blocked.merge(other.blocked)
+
+    @property
+    def reuse_ratio(self) -> Optional[float]:
+        """
+        :return: Share of the requests sent on a connection that was already
+            open, None if there are no requests
+        :rtype: Optional[float]
+        """
+        return 1 - self.connections / self.requests if self.requests else None
+
+    @property
+    def handshake_per_request(self) -> Optional[float]:
+        """
+        :return: Handshake time amortised over all the requests in ms
+        :rtype: Optional[float]
+        """
+        return self.handshake / self.requests if self.requests else None
+
+    @property
+    def handshake_per_connection(self) -> Optional[float]:
+        """
+        :return: Mean time to set up a connection in ms
+        :rtype: Optional[float]
+        """
+        return self.handshake / self.connections if self.connections else None
+
+    @property
+    def handshake_share(self) -> Optional[float]:
+        """
+        :return: Share of the total time of the requests spent on handshakes
+        :rtype: Optional[float]
+        """
+        return self.handshake / self.time if self.time else None
+
+    @property
+    def dns_cache_ratio(self) -> Optional[float]:
+        """
+        :return: Share of the new connections that did not wait for a DNS
+            lookup, None if no connection was opened
+        :rtype: Optional[float]
+        """
+        if not self.connections:
+            return None
+        return max(1 - self.dns_lookups / self.connections, 0.0)
+
+    def to_dict(self, pcts: Iterable[float] = PERCENTILES) -> dict:
+        """
+        :param pcts: Percentiles of the blocked time to include
+        :type pcts: Iterable[float]
+        :return: The totals, the ratios and the percentiles of the blocked
+            time, i.e. - 'blocked_p90'
+        :rtype: dict
+        """
+        result = dict(
+            requests=self.requests,
+            connections=self.connections,
+            reuse_ratio=self.reuse_ratio,
+            handshake=self.handshake,
+            ssl=self.ssl,
+            handshake_per_request=self.handshake_per_request,
+            handshake_per_connection=self.handshake_per_connection,
+            handshake_share=self.handshake_share,
+            dns_lookups=self.dns_lookups,
+            dns=self.dns,
+            dns_cache_ratio=self.dns_cache_ratio,
+        )
+        result.update(
+            {f"blocked_{name}": value for name, value in self.blocked.percentiles(pcts).items()}
+        )
+        return result
+
+
+def group_connections(
+    table: "HarTable", codes: np.ndarray, names, connection_ids: np.ndarray = None  # noqa: F821
+) -> Dict[str, ConnectionStats]:
+    """
+    Totals the connection setup of the rows of every group with one
+    ``bincount`` per timing.
+
+    :param table: Columns of the entries
+    :type table: HarTable
+    :param codes: Group code of every row
+    :type codes: np.ndarray
+    :param names: Name of every code, i.e. - a StringTable
+    :type names: Sequence[str]
+    :param connection_ids: ``table.connection_ids()``, computed if not given
+    :type connection_ids: np.ndarray
+    :return: Group name and its totals
+    :rtype: Dict[str, ConnectionStats]
+    """
+    if connection_ids is None:
+        connection_ids = table.connection_ids()
+    groups, inverse = np.unique(codes, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    size = len(groups)
+    requests = np.bincount(inverse, minlength=size)
+    with np.errstate(invalid="ignore"):
+        opened = table.connect >= 0
+        looked_up = table.dns > 0
+    # distinct connections of the group that one of its rows opened
+    opened_pairs = np.unique(
+        np.stack([inverse[opened], connection_ids[opened]], axis=1), axis=0
+    )
+    connections = np.bincount(opened_pairs[:, 0], minlength=size)
+    dns_lookups = np.bincount(inverse, weights=looked_up, minlength=size)
+    handshake = _positive_sum(table.connect, inverse, size)
+    ssl = _positive_sum(table.ssl, inverse, size)
+    dns = _positive_sum(table.dns, inverse, size)
+    time = _positive_sum(table.time, inverse, size)
+
+    # the blocked times sorted by group, to fill the histograms from slices
+    order = np.argsort(inverse, kind="stable")
+    blocked = np.split(table.blocked[order], np.cumsum(requests)[:-1])
+
+    results = {}
+    for i, code in enumerate(groups):
+        stats = results.setdefault(names[int(code)], ConnectionStats())
+        stats.requests += int(requests[i])
+        stats.connections += int(connections[i])
+        stats.dns_lookups += int(dns_lookups[i])
+        stats.handshake += float(handshake[i])
+        stats.ssl += float(ssl[i])
+        stats.dns += float(dns[i])
+        stats.time += float(time[i])
+        stats.blocked.add_many(blocked[i])
+    return results
+
+
+def merge_connections(
+    groups: Iterable[Dict[str, Dict[str, ConnectionStats]]]
+) -> Dict[str, Dict[str, ConnectionStats]]:
+    """
+    Adds up the ``connection_stats`` of several pages.
+
+    :param groups: Grouping, group name and totals
+    :type groups: Iterable[Dict[str, Dict[str, ConnectionStats]]]
+    :return: The merged totals of every grouping and group
+    :rtype: Dict[str, Dict[str, ConnectionStats]]
+    """
+    merged = {}
+    for stats in groups:
+        for group_by, group_stats in stats.items():
+            merged_groups = merged.setdefault(group_by, {})
+            for name, totals in group_stats.items():
+                merged_groups.setdefault(name, ConnectionStats()).merge(totals)
+    return merged
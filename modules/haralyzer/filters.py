@@ -0,0 +1,175 @@
+"""
+Compiles the criteria accepted by ``HarPage.filter_entries`` into a single
+predicate so the regexes are only built once per filter instead of once per
+entry.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Pattern
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, flags: int = re.IGNORECASE) -> Pattern:
+    """
+    Compiles and caches a regex used to match entries.
+
+    :param pattern: Regex to compile
+    :type pattern: str
+    :param flags: Regex flags
+    :type flags: int
+    :return: Compiled regex
+    :rtype: Pattern
+    """
+    return re.compile(pattern, flags)
+
+
+def compile_matcher(
+    value: Optional[str], regex: bool = True, flags: int = re.IGNORECASE
+) -> Optional[Callable[[str], bool]]:
+    """
+    Builds a function that matches a string against ``value``, either as a
+    regex search or as an exact match.
+
+    :param value: Regex or string to match
+    :type value: str
+    :param regex: Whether to use regex or exact match
+    :type regex: bool
+    :param flags: Regex flags
+    :type flags: int
+    :return: Matching function or None if there is nothing to match
+    :rtype: Optional[Callable[[str], bool]]
+    """
+    if value is None:
+        return None
+    if regex:
+        search = compile_pattern(value, flags).search
+        return lambda string: search(string) is not None
+    return lambda string: string == value
+
+
+class EntryFilter:
+    """
+    A compiled set of ``HarPage.filter_entries`` criteria. Calling the filter
+    with a HarEntry returns whether the entry matches all the criteria.
+    """
+
+    def __init__(
+        self,
+        request_type: str = None,
+        content_type: str = None,
+        status_code: str = None,
+        http_version: str = None,
+        load_time__gt: int = None,
+        receive_time__gt: int = None,
+        content_size: int = None,
+        regex: bool = True,
+    ):
+        # pylint: disable=R0913
+        """
+        :param request_type: The request type (i.e. - GET or POST)
+        :type request_type: str
+        :param content_type: Regex to use for finding content type
+        :type content_type: str
+        :param status_code: The desired status code
+        :type status_code: str
+        :param http_version: HTTP version of request
+        :type http_version: str
+        :param load_time__gt: Minimum load time in milliseconds
+        :type load_time__gt: int
+        :param receive_time__gt: Minimum receive time in milliseconds
+        :type receive_time__gt: int
+        :param content_size: Minimum response body size
+        :type content_size: int
+        :param regex: Whether to use regex or exact match.
+        :type regex: bool
+        """
+        self.content_type = content_type
+        self.load_time__gt = load_time__gt
+        self.receive_time__gt = receive_time__gt
+        self.content_size = content_size
+        self._request_type = compile_matcher(request_type, regex)
+        self._content_type = compile_matcher(content_type, regex)
+        self._http_version = compile_matcher(http_version, regex)
+        # Status codes are matched as strings (i.e. - '(200|206)'), but there
+        # are only a handful of distinct codes in a HAR file, so the result is
+        # remembered per status code instead of matching every entry.
+        self._status_code = compile_matcher(status_code, regex, flags=0)
+        self._status_codes: Dict[Any, bool] = {}
+
+    @classmethod
+    @lru_cache(maxsize=128)
+    def cached(cls, **criteria) -> "EntryFilter":
+        """
+        Returns a shared filter for the criteria. Used for filters that are
+        applied over and over again, like the asset type filters of HarPage.
+
+        :return: Compiled filter
+        :rtype: EntryFilter
+        """
+        return cls(**criteria)
+
+    def match_request_type(self, method: str) -> bool:
+        """
+        :param method: Request method of an entry
+        :type method: str
+        :return: Request method matches
+        :rtype: bool
+        """
+        return self._request_type is None or self._request_type(method)
+
+    def match_content_type(self, mime_type: str) -> bool:
+        """
+        :param mime_type: Response mime type of an entry
+        :type mime_type: str
+        :return: Mime type matches
+        :rtype: bool
+        """
+        if self._content_type is None:
+            return True
+        return self._content_type(mime_type) or mime_type == self.content_type
+
+    def match_http_version(self, http_version: str) -> bool:
+        """
+        :param http_version: Response HTTP version of an entry
+        :type http_version: str
+        :return: HTTP version matches
+        :rtype: bool
+        """
+        return self._http_version is None or self._http_version(http_version)
+
+    def match_status_code(self, status: Any) -> bool:
+        """
+        :param status: Response status of an entry
+        :type status: Any
+        :return: Status code matches
+        :rtype: bool
+        """
+        if self._status_code is None:
+            return True
+        matches = self._status_codes.get(status)
+        if matches is None:
+            matches = self._status_codes[status] = self._status_code(str(status))
+        return matches
+
+    def __call__(self, entry: "HarEntry") -> bool:  # noqa: F821
+        timings = entry.timings
+        receive = timings.get("receive")
+        # If no receive time, this isn't a valid entry
+        if not receive:
+            return False
+        if self.receive_time__gt is not None and receive < self.receive_time__gt:
+            return False
+        if self.load_time__gt is not None and entry.time < self.load_time__gt:
+            return False
+        response = entry.response
+        if (
+            self.content_size is not None
+            and self.content_size > response.bodySize
+        ):
+            return False
+        return (
+            self.match_content_type(response.mimeType)
+            and self.match_status_code(response.status)
+            and self.match_http_version(response.httpVersion)
+            and self.match_request_type(entry.request.method)
+        )
@@ -0,0 +1,210 @@
+"""
+Mergeable latency histograms. Values are counted in fixed logarithmic buckets
+(like an HDR histogram), so percentiles can be read with a bounded relative
+error without keeping the samples, and the histograms of several pages or HAR
+files can be added together.
+"""
+import math
+from typing import Dict, Iterable, Union
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+# Relative width of a bucket, the error of a percentile is at most half of it
+PRECISION = 0.01
+
+
+class LatencyHistogram:
+    """
+    Counts of latencies in ms. Bucket 0 holds everything below 1 ms and bucket
+    ``i`` holds [base ** (i - 1), base ** i) with ``base = 1 + precision``.
+    Negative values (-1 is "not applicable" in HAR timings) and NaN are not
+    counted. Only the buckets that have values are stored.
+    """
+
+    def __init__(self, precision: float = PRECISION):
+        """
+        :param precision: Relative width of a bucket
+        :type precision: float
+        """
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def __repr__(self):
+        return f"LatencyHistogram of {self.count} values"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, LatencyHistogram):
+            return NotImplemented
+        return (
+            self.precision == other.precision
+            and self.counts == other.counts
+            and self.min == other.min
+            and self.max == other.max
+        )
+
+    def __add__(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        merged = LatencyHistogram(self.precision)
+        merged.merge(self)
+        merged.merge(other)
+        return merged
+
+    def __iadd__(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        self.merge(other)
+        return self
+
+    def bucket(self, value: float) -> int:
+        """
+        :param value: Latency in ms
+        :type value: float
+        :return: Index of the bucket the value is counted in
+        :rtype: int
+        """
+        if value < 1:
+            return 0
+        return 1 + int(math.log(value) / self._log_base)
+
+    def bucket_range(self, bucket: int):
+        """
+        :param bucket: Index of a bucket
+        :type bucket: int
+        :return: (low, high) bounds of the values in the bucket
+        :rtype: Tuple[float, float]
+        """
+        if bucket == 0:
+            return 0.0, 1.0
+        return math.exp((bucket - 1) * self._log_base), math.exp(bucket * self._log_base)
+
+    def add(self, value: Union[int, float]) -> None:
+        """
+        :param value: Latency in ms
+        :type value: Union[int, float]
+        """
+        self.add_many(np.array([value], dtype=np.float64))
+
+    def add_many(self, values: Union[np.ndarray, Iterable[float]]) -> None:
+        """
+        Counts an array of latencies at once.
+
+        :param values: Latencies in ms
+        :type values: Union[np.ndarray, Iterable[float]]
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[values >= 0]
+        if not len(values):
+            return
+        buckets = np.zeros(len(values), dtype=np.int64)
+        above = values >= 1
+        buckets[above] = 1 + (np.log(values[above]) / self._log_base).astype(np.int64)
+        for bucket, count in zip(*np.unique(buckets, return_counts=True)):
+            bucket = int(bucket)
+            self.counts[bucket] = self.counts.get(bucket, 0) + int(count)
+        self._update(
+            len(values), float(values.sum()), float(values.min()), float(values.max())
+        )
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Adds the counts of another histogram to this one.
+
+        :param other: Histogram with the same precision
+        :type other: LatencyHistogram
+        """
+        if other.precision != self.precision:
+            raise ValueError("Histograms with a different precision can not be merged")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        if other.count:
+            self._update(other.count, other.total, other.min, other.max)
+
+    def _update(self, count: int, total: float, low: float, high: float) -> None:
+        self.count += count
+        self.total += total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    @property
+    def mean(self):
+        """
+        :return: Mean of the values, None if there are none
+        :rtype: float
+        """
+        return self.total / self.count if self.count else None
+
+    def percentile(self, pct: float):
+        """
+        The value at the ``pct`` percentile (nearest rank). It is the middle
+        of the bucket the rank falls in, limited to the smallest and largest
+        value counted.
+
+        :param pct: Percentile between 0 and 100
+        :type pct: float
+        :return: The percentile in ms, None if there are no values
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(self.count * pct / 100), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                break
+        low, high = self.bucket_range(bucket)
+        return min(max((low + high) / 2, self.min), self.max)
+
+    def percentiles(self, pcts: Iterable[float] = PERCENTILES) -> Dict[str, float]:
+        """
+        :param pcts: Percentiles between 0 and 100
+        :type pcts: Iterable[float]
+        :return: Percentiles by name, i.e. - {'p50': 120.5, 'p90': ...}
+        :rtype: Dict[str, float]
+        """
+        return {f"p{pct}": self.percentile(pct) for pct in pcts}
+
+
+Histograms = Dict[str, Dict[str, LatencyHistogram]]
+
+
+def merge_histograms(groups: Iterable[Histograms]) -> Histograms:
+    """
+    Adds up grouped histograms, i.e. - the ``asset_histograms`` of several
+    pages.
+
+    :param groups: Group name, metric name and histogram
+    :type groups: Iterable[Dict[str, Dict[str, LatencyHistogram]]]
+    :return: The merged histograms of every group and metric
+    :rtype: Dict[str, Dict[str, LatencyHistogram]]
+    """
+    merged: Histograms = {}
+    for histograms in groups:
+        for group, metrics in histograms.items():
+            merged_metrics = merged.setdefault(group, {})
+            for metric, histogram in metrics.items():
+                merged_metrics.setdefault(
+                    metric, LatencyHistogram(histogram.precision)
+                ).merge(histogram)
+    return merged
+
+
+def get_percentiles(
+    histograms: Histograms, pcts: Iterable[float] = PERCENTILES
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    :param histograms: Group name, metric name and histogram
+    :type histograms: Dict[str, Dict[str, LatencyHistogram]]
+    :param pcts: Percentiles between 0 and 100
+    :type pcts: Iterable[float]
+    :return: The percentiles of every group and metric, i.e. -
+        {'image': {'receive': {'p50': 12.5, ...}}}
+    :rtype: Dict[str, Dict[str, Dict[str, float]]]
+    """
+    return {
+        group: {metric: histogram.percentiles(pcts) for metric, histogram in metrics.items()}
+        for group, metrics in histograms.items()
+    }
@@ -1,12 +1,35 @@
 """Creates the Request and Response sub class that are used by each entry"""
 from typing import Optional
-from functools import cached_property
 from .mixins import HttpTransaction
 
 
+def get_transfer_size(response: dict) -> int:
+    """
+    Number of bytes of a response that went over the wire. Chrome exports
+    this as ``_transferSize``, for other browsers (i.e. - Firefox) it is the
+    size of the headers plus the size of the body.
+
+    :param response: The ``response`` of a HAR entry
+    :type response: dict
+    :return: Transfer size in bytes, 0 if unknown
+    :rtype: int
+    """
+    size = response.get("_transferSize")
+    if isinstance(size, (int, float)) and not isinstance(size, bool) and size >= 0:
+        return int(size)
+    size = 0
+    for key in ("headersSize", "bodySize"):
+        value = response.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            size += int(value)
+    return size
+
+
 class Request(HttpTransaction):
     """Request object for an HarEntry"""
 
+    __slots__ = ()
+
     def __str__(self):
         return f"HarEntry.Request for {self.url}"
 
@@ -15,7 +38,7 @@ class Request(HttpTransaction):
 
     # Root Level values
 
-    @cached_property
+    @property
     def bodySize(self) -> int:
         """
         :return: Body size of the request
@@ -23,7 +46,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["bodySize"]
 
-    @cached_property
+    @property
     def cookies(self) -> list:
         """
         :return: Cookies from the request
@@ -31,7 +54,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["cookies"]
 
-    @cached_property
+    @property
     def headersSize(self) -> int:
         """
         :return: Headers size from the request
@@ -39,7 +62,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["headersSize"]
 
-    @cached_property
+    @property
     def httpVersion(self) -> str:
         """
         :return: HTTP version used in the request
@@ -47,7 +70,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["httpVersion"]
 
-    @cached_property
+    @property
     def method(self) -> str:
         """
         :return: HTTP method of the request
@@ -55,7 +78,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["method"]
 
-    @cached_property
+    @property
     def queryString(self) -> list:
         """
         :return: Query string from the request
@@ -63,7 +86,7 @@ class Request(HttpTransaction):
         """
         return self.raw_entry["queryString"]
 
-    @cached_property
+    @property
     def url(self) -> str:
         """
         :return: URL of the request
@@ -73,7 +96,7 @@ class Request(HttpTransaction):
 
     # Header Values
 
-    @cached_property
+    @property
     def accept(self) -> str:
         """
         :return: HTTP Accept header
@@ -81,7 +104,7 @@ class Request(HttpTransaction):
         """
         return self.get_header_value("Accept")
 
-    @cached_property
+    @property
     def cacheControl(self) -> str:
         """
         :return: HTTP CacheControl header
@@ -89,7 +112,7 @@ class Request(HttpTransaction):
         """
         return self.get_header_value("Cache-Control")
 
-    @cached_property
+    @property
     def encoding(self) -> str:
         """
         :return: HTTP Accept-Encoding Header
@@ -97,7 +120,7 @@ class Request(HttpTransaction):
         """
         return self.get_header_value("Accept-Encoding")
 
-    @cached_property
+    @property
     def host(self) -> str:
         """
         :return: HTTP Host header
@@ -105,7 +128,7 @@ class Request(HttpTransaction):
         """
         return self.get_header_value("Host")
 
-    @cached_property
+    @property
     def language(self) -> str:
         """
         :return: HTTP language header
@@ -113,7 +136,7 @@ class Request(HttpTransaction):
         """
         return self.get_header_value("Accept-Language")
 
-    @cached_property
+    @property
     def userAgent(self) -> str:
         """
         :return: User Agent
@@ -125,6 +148,8 @@ class Request(HttpTransaction):
 class Response(HttpTransaction):
     """Response object for a HarEntry"""
 
+    __slots__ = ("url",)
+
     def __init__(self, url: str, entry: dict):
         """
 
@@ -143,7 +168,7 @@ class Response(HttpTransaction):
 
     # Root Level values
 
-    @cached_property
+    @property
     def bodySize(self) -> int:
         """
         :return: Body Size
@@ -151,7 +176,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["bodySize"]
 
-    @cached_property
+    @property
     def headersSize(self) -> int:
         """
         :return: Header size
@@ -159,7 +184,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["headersSize"]
 
-    @cached_property
+    @property
     def httpVersion(self) -> str:
         """
         :return: HTTP Version
@@ -167,7 +192,15 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["httpVersion"]
 
-    @cached_property
+    @property
+    def transferSize(self) -> int:
+        """
+        :return: Bytes transferred, see ``get_transfer_size``
+        :rtype: int
+        """
+        return get_transfer_size(self.raw_entry)
+
+    @property
     def redirectURL(self) -> Optional[str]:
         """
         :return: Redirect URL
@@ -175,7 +208,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry.get("redirectURL", None)
 
-    @cached_property
+    @property
     def status(self) -> int:
         """
         :return: HTTP Status
@@ -183,7 +216,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["status"]
 
-    @cached_property
+    @property
     def statusText(self) -> str:
         """
         :return: HTTP Status Text
@@ -193,7 +226,7 @@ class Response(HttpTransaction):
 
     # Header Values
 
-    @cached_property
+    @property
     def cacheControl(self) -> str:
         """
         :return: Cache Control Header
@@ -201,7 +234,7 @@ class Response(HttpTransaction):
         """
         return self.get_header_value("cache-control")
 
-    @cached_property
+    @property
     def contentSecurityPolicy(self) -> str:
         """
         :return: Content Security Policy Header
@@ -209,7 +242,7 @@ class Response(HttpTransaction):
         """
         return self.get_header_value("content-security-policy")
 
-    @cached_property
+    @property
     def contentSize(self) -> int:
         """
         :return: Content Size
@@ -217,7 +250,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["content"]["size"]
 
-    @cached_property
+    @property
     def contentType(self) -> str:
         """
         :return: Content Type
@@ -225,7 +258,7 @@ class Response(HttpTransaction):
         """
         return self.get_header_value("content-type")
 
-    @cached_property
+    @property
     def date(self) -> str:
         """
         :return: Date of response
@@ -233,7 +266,7 @@ class Response(HttpTransaction):
         """
         return self.get_header_value("date")
 
-    @cached_property
+    @property
     def lastModified(self) -> str:
         """
         :return: Last modified time
@@ -241,7 +274,7 @@ class Response(HttpTransaction):
         """
         return self.get_header_value("last-modified")
 
-    @cached_property
+    @property
     def mimeType(self) -> str:
         """
         :return: Mime Type of response
@@ -249,7 +282,7 @@ class Response(HttpTransaction):
         """
         return self.raw_entry["content"].get("mimeType", "")
 
-    @cached_property
+    @property
     def text(self) -> str:
         """
         :return: Response body
@@ -0,0 +1,89 @@
+"""
+Interval helpers used to calculate how long a set of assets kept the
+network busy without building a per-millisecond timeline.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Tuple
+
+Interval = Tuple[float, float]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Sweeps over the intervals in start order and merges every overlapping or
+    touching pair. Empty intervals (end <= start) are dropped.
+
+    :param intervals: (start, end) pairs, in any order
+    :type intervals: Iterable[Tuple[float, float]]
+    :return: Disjoint intervals sorted by start
+    :rtype: List[Tuple[float, float]]
+    """
+    merged = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def union_length(intervals: Iterable[Interval]) -> float:
+    """
+    Total length covered by at least one of the intervals. Overlapping time is
+    only counted once.
+
+    :param intervals: (start, end) pairs, in any order
+    :type intervals: Iterable[Tuple[float, float]]
+    :return: Length of the union of the intervals
+    :rtype: float
+    """
+    return sum(end - start for start, end in merge_intervals(intervals))
+
+
+class IntervalUnion:
+    """
+    Keeps the union of intervals that are added one at a time. Only the merged
+    intervals are stored, so memory grows with the number of separate busy
+    periods rather than with the number of intervals added. Adding intervals
+    in start order (like HAR entries) appends to the end of the union.
+    """
+
+    def __init__(self):
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self.length = 0
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def add(self, start: float, end: float) -> None:
+        """
+        Adds an interval to the union. Empty intervals (end <= start) are
+        ignored.
+
+        :param start: Start of the interval
+        :type start: float
+        :param end: End of the interval
+        :type end: float
+        """
+        if end <= start:
+            return
+        # Merged intervals that overlap or touch the new interval are i..j-1
+        i = bisect_left(self._ends, start)
+        j = bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+            self.length -= sum(self._ends[k] - self._starts[k] for k in range(i, j))
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+        self.length += end - start
+
+    @property
+    def intervals(self) -> List[Interval]:
+        """
+        :return: Disjoint intervals sorted by start
+        :rtype: List[Tuple[float, float]]
+        """
+        return list(zip(self._starts, self._ends))
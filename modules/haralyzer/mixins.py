@@ -1,13 +1,30 @@
 """Mixin Objects that allow for shared methods"""
 from collections.abc import MutableMapping
-from typing import Any, Optional
-from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional
 
 
 class GetHeaders:
-    # pylint: disable=R0903
     """Mixin to get a header"""
 
+    __slots__ = ("_header_index",)
+
+    @property
+    def header_index(self) -> Dict[str, List[Optional[str]]]:
+        """
+        Case-folded header names mapped to all of their values, in the order
+        they appear in the HAR file. Built once, on the first header lookup.
+
+        :return: Header names and values
+        :rtype: Dict[str, List[Optional[str]]]
+        """
+        index = getattr(self, "_header_index", None)
+        if index is None:
+            index = {}
+            for header in self.raw_entry["headers"]:
+                index.setdefault(header["name"].casefold(), []).append(header["value"])
+            self._header_index = index
+        return index
+
     def get_header_value(self, name: str) -> Optional[str]:
         """
         Returns the header value of the header defined in ``name``
@@ -17,15 +34,38 @@ class GetHeaders:
         :return: Value of the header
         :rtype: Optional[str]
         """
-        for header in self.raw_entry["headers"]:
-            if header["name"].lower() == name.lower():
-                return header["value"]
-        return None
+        values = self.header_index.get(name.casefold())
+        return values[0] if values else None
+
+    def get_header_values(self, name: str) -> List[Optional[str]]:
+        """
+        Returns every value of a header that is sent more than once
+        (i.e. - Set-Cookie)
+
+        :param name: Name of the header to get the values of
+        :type name: str
+        :return: Values of the header
+        :rtype: List[Optional[str]]
+        """
+        return list(self.header_index.get(name.casefold(), []))
+
+    def get_headers(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Returns the values of several headers at once
+
+        :param names: Names of the headers to get the values of
+        :type names: Iterable[str]
+        :return: Header name and value, None for missing headers
+        :rtype: Dict[str, Optional[str]]
+        """
+        return {name: self.get_header_value(name) for name in names}
 
 
 class MimicDict(MutableMapping):
     """Mixin for functions to mimic a dictionary for backward compatibility"""
 
+    __slots__ = ()
+
     def __getitem__(self, item: str) -> Any:
         return self.raw_entry[item]
 
@@ -45,12 +85,14 @@ class MimicDict(MutableMapping):
 class HttpTransaction(GetHeaders, MimicDict):
     """Class the represents a request or response"""
 
+    __slots__ = ("raw_entry",)
+
     def __init__(self, entry: dict):
         self.raw_entry = entry
         super().__init__()
 
     # Base class gets properties that belong to both request/response
-    @cached_property
+    @property
     def headers(self) -> list:
         """
         Headers from the entry
@@ -1,13 +1,117 @@
 """Contains the mutlihar parse object"""
+import math
+from concurrent.futures import ProcessPoolExecutor
 from statistics import stdev
 from statistics import mean
-from typing import Union, List
-from cached_property import cached_property
-from .assets import HarParser
+from typing import Dict, Union, List
+from functools import cached_property
+
+import numpy as np
+
+from .assets import HarPage, HarParser
+from .connections import ConnectionStats, merge_connections
+from .histogram import PERCENTILES, LatencyHistogram, get_percentiles, merge_histograms
+from .throughput import (
+    SERIES_STEP,
+    SERIES_WINDOW,
+    ThroughputSeries,
+    ThroughputStats,
+    merge_throughput,
+)
 
 DECIMAL_PRECISION = 0
 
 
+def percentile(values: List[Union[int, float]], pct: float) -> Union[int, float]:
+    """
+    Percentile of a list of values, linearly interpolated between the closest
+    ranks (the same method as ``numpy.percentile``).
+
+    :param values: Values to calculate the percentile of
+    :type values: List[Union[int, float]]
+    :param pct: Percentile between 0 and 100
+    :type pct: float
+    :return: The percentile
+    :rtype: int, float
+    """
+    if not values:
+        raise ValueError("percentile requires at least one value")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class PageMetrics:
+    """
+    The metrics of one HarPage without any of the HAR data. Has the same
+    attribute names as HarPage, so it can be aggregated the same way, but is
+    small and cheap to send back from a worker process.
+    """
+
+    LOAD_TIMES = ("page", "initial", "content", "image", "css", "js", "audio", "video", "html")
+    SIZES = ("page", "image", "css", "text", "js", "audio", "video")
+
+    def __init__(self, page_id: str, har_file: str = None, **metrics):
+        """
+        :param page_id: Page ID
+        :type page_id: str
+        :param har_file: HAR file the page was read from
+        :type har_file: str
+        :param metrics: Metric names and values, i.e. - image_load_time=1200
+        """
+        self.page_id = page_id
+        self.har_file = har_file
+        self.asset_types = dict(HarPage.ASSET_TYPES)
+        self.metrics = metrics
+        self.__dict__.update(metrics)
+
+    def __repr__(self):
+        return f"PageMetrics for {self.page_id} of {self.har_file}"
+
+    @classmethod
+    def from_page(cls, page: HarPage, har_file: str = None) -> "PageMetrics":
+        """
+        :param page: Page to calculate the metrics of
+        :type page: HarPage
+        :param har_file: HAR file the page was read from
+        :type har_file: str
+        :return: Metrics of the page
+        :rtype: PageMetrics
+        """
+        names = ["time_to_first_byte", "asset_histograms", "server_histograms"]
+        names += ["throughput_stats", "throughput_series", "connection_stats"]
+        names += [f"{asset_type}_load_time" for asset_type in cls.LOAD_TIMES]
+        names += [f"{asset_type}_size" for asset_type in cls.SIZES]
+        names += [f"{asset_type}_size_trans" for asset_type in cls.SIZES]
+        names += [f"{asset_type}_count" for asset_type in page.asset_types]
+        return cls(
+            page.page_id,
+            har_file=har_file,
+            **{name: getattr(page, name, None) for name in names},
+        )
+
+
+def analyze_har_file(har_file: str, page_id: str = None) -> List[PageMetrics]:
+    """
+    Parses a HAR file and returns the metrics of its pages. Used as the worker
+    function of ``MultiHarParser`` when it is given file paths.
+
+    :param har_file: Path to the HAR file
+    :type har_file: str
+    :param page_id: Only return the metrics for this page
+    :type page_id: str
+    :return: Metrics of the pages in the file
+    :rtype: List[PageMetrics]
+    """
+    har_parser = HarParser.from_file(har_file)
+    return [
+        PageMetrics.from_page(page, har_file=har_file)
+        for page in har_parser.pages
+        if page_id is None or page.page_id == page_id
+    ]
+
+
 class MultiHarParser:
     """
     An object that represents multiple HAR files OF THE SAME CONTENT.
@@ -16,11 +120,26 @@ class MultiHarParser:
     testing.
     """
 
-    def __init__(self, har_data, page_id=None, decimal_precision=DECIMAL_PRECISION):
+    def __init__(
+        self,
+        har_data=None,
+        page_id=None,
+        decimal_precision=DECIMAL_PRECISION,
+        har_files=None,
+        workers=None,
+    ):
+        # pylint: disable=R0913
         """
         :param har_data: A list of dict representing the JSON
         of a HAR file. See the docstring of HarParser.__init__ for more detail.
         :type har_data: List[dict]
+        :param har_files: Instead of ``har_data``, a list of paths to HAR
+        files. The files are parsed in a process pool and only the metrics of
+        each page (see PageMetrics) are kept.
+        :type har_files: List[str]
+        :param workers: Number of processes used for ``har_files``. Defaults
+        to the number of CPUs.
+        :type workers: int
         :param page_id: IF a the page ID is provided, the
         multiparser will return aggregate results for this specific page. If
         not, it will assume that there is only one page in the run (this was
@@ -29,7 +148,11 @@ class MultiHarParser:
         :param decimal_precision: The precision of the.
         :type decimal_precision: int
         """
+        if har_data is None and har_files is None:
+            raise ValueError("Either har_data or har_files is required")
         self.har_data = har_data
+        self.har_files = har_files
+        self.workers = workers
         self.page_id = page_id
         self.decimal_precision = decimal_precision
 
@@ -79,14 +202,18 @@ class MultiHarParser:
             return 0
         return round(stdev(load_times), self.decimal_precision)
 
-    @property
+    @cached_property
     def pages(self) -> List["HarPage"]:  # noqa: F821
         """
-        Aggregate pages of all the parser objects.
+        Aggregate pages of all the parser objects. Every HAR file is only
+        parsed once, so the ``cached_property`` values of the pages are shared
+        by all the aggregates.
 
         :return: All the pages from parsers
         :rtype: List[haralyzer.assets.HarPage]
         """
+        if self.har_files is not None:
+            return self._get_file_pages()
         pages = []
         for har_dict in self.har_data:
             har_parser = HarParser(har_data=har_dict)
@@ -98,14 +225,189 @@ class MultiHarParser:
                 pages = pages + har_parser.pages
         return pages
 
+    def _get_file_pages(self) -> List[PageMetrics]:
+        """
+        Analyzes ``har_files`` in a process pool.
+
+        :return: Metrics of all the pages, in the order of ``har_files``
+        :rtype: List[PageMetrics]
+        """
+        page_ids = [self.page_id] * len(self.har_files)
+        if self.workers == 1 or len(self.har_files) < 2:
+            results = map(analyze_har_file, self.har_files, page_ids)
+            return [page for pages in results for page in pages]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(analyze_har_file, self.har_files, page_ids)
+            return [page for pages in results for page in pages]
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Calculates every aggregate in one pass over the pages. For the TTFB
+        (``ttfb``), the page load time (``page``) and every asset type, the
+        number of pages with a value, the mean, the standard deviation and the
+        50th, 90th and 99th percentile of the load times are returned.
+
+        :return: Aggregates per asset type, i.e. - {'image': {'mean': 1250, ...}}
+        :rtype: Dict[str, dict]
+        """
+        asset_types = ["ttfb", "page"] + list(self.asset_types)
+        load_times = {asset_type: [] for asset_type in asset_types}
+        for page in self.pages:
+            for asset_type in asset_types:
+                if asset_type == "ttfb":
+                    val = page.time_to_first_byte
+                else:
+                    val = getattr(page, f"{asset_type}_load_time", None)
+                if val is not None:
+                    load_times[asset_type].append(val)
+
+        results = {}
+        for asset_type, values in load_times.items():
+            stats = {"count": len(values), "mean": None, "stdev": None}
+            stats.update({f"p{pct}": None for pct in PERCENTILES})
+            if values:
+                stats["mean"] = round(mean(values), self.decimal_precision)
+                stats["stdev"] = (
+                    round(stdev(values), self.decimal_precision)
+                    if len(values) > 1 and sum(values)
+                    else 0
+                )
+                for pct in PERCENTILES:
+                    stats[f"p{pct}"] = round(
+                        percentile(values, pct), self.decimal_precision
+                    )
+            results[asset_type] = stats
+        return results
+
+    def get_latency_histograms(
+        self, group_by: str = "asset_type"
+    ) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """
+        Merges the latency histograms of all the pages.
+
+        :param group_by: 'asset_type' or 'server_ip'
+        :type group_by: str
+        :return: Group, metric name and histogram
+        :rtype: Dict[str, Dict[str, LatencyHistogram]]
+        """
+        if group_by == "asset_type":
+            return merge_histograms(page.asset_histograms for page in self.pages)
+        if group_by == "server_ip":
+            return merge_histograms(page.server_histograms for page in self.pages)
+        raise ValueError("group_by must be 'asset_type' or 'server_ip'")
+
+    def get_latency_percentiles(self, group_by: str = "asset_type") -> Dict[str, dict]:
+        """
+        50th, 90th and 99th percentile of the ``receive``, ``wait`` and total
+        ``time`` of the entries of all the pages.
+
+        :param group_by: 'asset_type' or 'server_ip'
+        :type group_by: str
+        :return: Group, metric name and percentiles, i.e. -
+            {'image': {'receive': {'p50': 12, 'p90': 80, 'p99': 121}}}
+        :rtype: Dict[str, dict]
+        """
+        results = get_percentiles(self.get_latency_histograms(group_by))
+        for metrics in results.values():
+            for pcts in metrics.values():
+                for name, value in pcts.items():
+                    if value is not None:
+                        pcts[name] = round(value, self.decimal_precision)
+        return results
+
+    def get_throughput_stats(self, group_by: str = "asset_type") -> Dict[str, ThroughputStats]:
+        """
+        Merges the goodput totals of all the pages.
+
+        :param group_by: 'asset_type', 'server_ip', 'hostname' or 'page'
+        :type group_by: str
+        :return: Group and its totals
+        :rtype: Dict[str, ThroughputStats]
+        """
+        if group_by not in ("asset_type", "server_ip", "hostname", "page"):
+            raise ValueError(
+                "group_by must be 'asset_type', 'server_ip', 'hostname' or 'page'"
+            )
+        merged = merge_throughput(page.throughput_stats for page in self.pages)
+        return merged.get(group_by, {})
+
+    def get_throughput(self, group_by: str = "asset_type") -> Dict[str, dict]:
+        """
+        Goodput of the entries of all the pages.
+
+        :param group_by: 'asset_type', 'server_ip', 'hostname' or 'page'
+        :type group_by: str
+        :return: Group and its 'count', 'bytes', 'receive', 'throughput'
+            (bytes/s) and the percentiles of the throughput of its entries
+        :rtype: Dict[str, dict]
+        """
+        results = {}
+        for name, stats in self.get_throughput_stats(group_by).items():
+            result = results[name] = stats.to_dict()
+            for key, value in result.items():
+                if isinstance(value, float):
+                    result[key] = round(value, self.decimal_precision)
+        return results
+
+    def get_throughput_over_time(self, window: int = SERIES_WINDOW) -> Dict[str, np.ndarray]:
+        """
+        Throughput of all the pages over a rolling window. The series are
+        merged by time, so runs that overlap are added up.
+
+        :param window: Width of the rolling window in ms
+        :type window: int
+        :return: See ``ThroughputSeries.rolling``
+        :rtype: Dict[str, np.ndarray]
+        """
+        series = ThroughputSeries(SERIES_STEP)
+        for page in self.pages:
+            series.merge(page.throughput_series)
+        return series.rolling(window)
+
+    def get_connection_stats(self, group_by: str = "server_ip") -> Dict[str, ConnectionStats]:
+        """
+        Merges the connection setup totals of all the pages.
+
+        :param group_by: 'server_ip', 'http_version' or 'page'
+        :type group_by: str
+        :return: Group and its totals
+        :rtype: Dict[str, ConnectionStats]
+        """
+        if group_by not in ("server_ip", "http_version", "page"):
+            raise ValueError("group_by must be 'server_ip', 'http_version' or 'page'")
+        merged = merge_connections(page.connection_stats for page in self.pages)
+        return merged.get(group_by, {})
+
+    def get_connection_breakdown(self, group_by: str = "server_ip") -> Dict[str, dict]:
+        """
+        Connection reuse, handshake cost, DNS cache effectiveness and blocked
+        time of the entries of all the pages. Grouping by 'http_version'
+        compares the setup overhead of i.e. - HTTP/3 and HTTP/2 runs.
+
+        :param group_by: 'server_ip', 'http_version' or 'page'
+        :type group_by: str
+        :return: Group and its connection setup metrics, the times in ms are
+            rounded to ``decimal_precision``
+        :rtype: Dict[str, dict]
+        """
+        results = {}
+        for name, stats in self.get_connection_stats(group_by).items():
+            result = results[name] = stats.to_dict()
+            for key, value in result.items():
+                if isinstance(value, float) and not key.endswith(("_ratio", "_share")):
+                    result[key] = round(value, self.decimal_precision)
+        return results
+
     @cached_property
     def asset_types(self) -> dict:
         """
         Mimic the asset types stored in HarPage
 
-        :return: Asset types from HarPage
+        :return: Asset types from HarPage, the defaults if there are no pages
         :rtype: dict
         """
+        if not self.pages:
+            return dict(HarPage.ASSET_TYPES)
         return self.pages[0].asset_types
 
     @cached_property
@@ -0,0 +1,150 @@
+"""
+Incremental HAR reader. Walks the JSON document with a small tokenizer and
+only decodes one ``log.entries`` item at a time, so memory use is bounded by
+the largest single entry instead of the size of the HAR file.
+"""
+import json
+from typing import IO, Iterator, Optional, Union
+
+WHITESPACE = " \t\n\r"
+CHUNK_SIZE = 1 << 16
+
+
+class HarStreamReader:
+    """
+    Reads the entries of a HAR file one at a time.
+
+    Everything in ``log`` except the entries (``pages``, ``version``,
+    ``creator``, ``browser``...) is decoded in full and stored in ``log`` as
+    it is encountered. Exporters usually write those keys before the entries,
+    but ``log`` is only guaranteed to be complete once ``iter_entries`` has
+    been exhausted.
+    """
+
+    def __init__(self, har_file: Union[str, IO[str]], chunk_size: int = CHUNK_SIZE):
+        """
+        :param har_file: Path to a HAR file or a text file object
+        :type har_file: Union[str, IO[str]]
+        :param chunk_size: Number of characters read at a time
+        :type chunk_size: int
+        """
+        self.har_file = har_file
+        self.chunk_size = chunk_size
+        self.log = {}
+        self._file: Optional[IO[str]] = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.iter_entries()
+
+    def iter_entries(self) -> Iterator[dict]:
+        """
+        Yields the raw ``dict`` of every entry in ``log.entries``.
+
+        :return: Entries of the HAR file
+        :rtype: Iterator[dict]
+        """
+        if isinstance(self.har_file, str):
+            with open(self.har_file, "r") as f:
+                yield from self._iter_document(f)
+        else:
+            yield from self._iter_document(self.har_file)
+
+    def _iter_document(self, f: IO[str]) -> Iterator[dict]:
+        self._file, self._buffer, self._pos, self._eof = f, "", 0, False
+        self.log = {}
+        for key in self._iter_object_keys():
+            if key == "log":
+                yield from self._iter_log()
+            else:
+                self._read_value()
+
+    def _iter_log(self) -> Iterator[dict]:
+        for key in self._iter_object_keys():
+            if key == "entries":
+                yield from self._iter_array()
+            else:
+                self.log[key] = self._read_value()
+
+    def _iter_object_keys(self) -> Iterator[str]:
+        """
+        Yields the keys of the object at the current position. The value of
+        every key must be consumed by the caller before the next key is read.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at position {self._pos}")
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def _iter_array(self) -> Iterator:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._read_value()
+            if self._expect(",]") == "]":
+                return
+
+    def _fill(self, size: int = None) -> bool:
+        """Reads more data into the buffer. Returns False at end of file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(size or self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop everything that has already been consumed
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skips whitespace and returns the next character"""
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in WHITESPACE:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self._fill():
+                raise ValueError("Unexpected end of HAR file")
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r} at position {self._pos}, got {char!r}"
+            )
+        self._pos += 1
+        return char
+
+    def _read_value(self):
+        """Decodes the JSON value at the current position"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # The value is not complete yet, read at least as much again as
+                # what is buffered so large values are not re-decoded too often
+                if not self._fill(max(self.chunk_size, len(self._buffer))):
+                    raise
+                continue
+            # A number at the very end of the buffer might continue in the next
+            # chunk (i.e. - '12' of '1234')
+            if end == len(self._buffer) and not self._eof:
+                self._fill()
+                continue
+            self._pos = end
+            return value
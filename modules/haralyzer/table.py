@@ -0,0 +1,429 @@
+"""
+Columnar representation of the entries of a HAR page. The hot numeric fields
+of every entry are stored in contiguous NumPy arrays and the string fields are
+stored as integer codes into a table of distinct values, so filtering and
+summing over thousands of entries can be done with vectorized masks.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .filters import EntryFilter
+from .histogram import LatencyHistogram
+from .http import get_transfer_size
+
+TIMING_PHASES = ("blocked", "dns", "connect", "ssl", "send", "wait", "receive")
+# Columns that latency histograms are kept for
+LATENCY_METRICS = ("receive", "wait", "time")
+
+
+def _number(value, default=np.nan):
+    """Returns ``value`` if it is a number, otherwise ``default``"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return default
+
+
+def _status(value) -> int:
+    """Status codes are sometimes exported as strings"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _as_number(value: float):
+    """Converts a numpy scalar back to an ``int`` or ``float``"""
+    value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class StringTable:
+    """
+    Interns strings into integer codes. The code of a string is its index in
+    ``values``.
+    """
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def code(self, value: str) -> int:
+        """
+        :param value: String to intern
+        :type value: str
+        :return: Code of the string
+        :rtype: int
+        """
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, matcher) -> np.ndarray:
+        """
+        Applies ``matcher`` to every distinct string once.
+
+        :param matcher: Function that takes a string and returns a bool
+        :type matcher: Callable[[str], bool]
+        :return: Boolean array indexed by string code
+        :rtype: np.ndarray
+        """
+        return np.fromiter(
+            (bool(matcher(value)) for value in self.values),
+            dtype=bool,
+            count=len(self.values),
+        )
+
+
+class HarTable:
+    # pylint: disable=R0902
+    """
+    The entries of a page as columns. Row ``i`` of every column belongs to
+    entry ``i`` of the list the table was built from.
+
+    Timings that are missing from an entry are stored as NaN. Timings the HAR
+    file reports as not applicable keep their value of -1.
+    """
+
+    # Name and dtype of every column
+    COLUMNS = (
+        ("start", np.float64),
+        ("time", np.float64),
+        ("status", np.int64),
+        ("body_size", np.int64),
+        ("headers_size", np.int64),
+        ("transfer_size", np.int64),
+        ("mime_code", np.int32),
+        ("server_code", np.int32),
+        ("version_code", np.int32),
+        ("method_code", np.int32),
+        ("url_code", np.int32),
+        ("connection_code", np.int32),
+    ) + tuple((phase, np.float64) for phase in TIMING_PHASES)
+    NUMERIC_COLUMNS = tuple(name for name, _ in COLUMNS)
+
+    # The *_code columns are indexes into these tables
+    STRING_TABLES = (
+        "mime_types",
+        "server_ips",
+        "http_versions",
+        "methods",
+        "urls",
+        "connections",
+    )
+
+    def __init__(
+        self, columns: Dict[str, np.ndarray], string_tables: Dict[str, StringTable]
+    ):
+        """
+        :param columns: Array for every name in ``NUMERIC_COLUMNS``
+        :type columns: Dict[str, np.ndarray]
+        :param string_tables: StringTable for every name in ``STRING_TABLES``:
+            response mime types, server IP addresses, response HTTP versions,
+            request methods, request URLs and connection IDs
+        :type string_tables: Dict[str, StringTable]
+        """
+        self.columns = columns
+        self.string_tables = string_tables
+        for name in self.NUMERIC_COLUMNS:
+            setattr(self, name, columns[name])
+        for name in self.STRING_TABLES:
+            setattr(self, name, string_tables[name])
+
+    def __len__(self) -> int:
+        return len(self.columns["start"])
+
+    @classmethod
+    def from_entries(
+        cls,
+        entries: List["HarEntry"],  # noqa: F821
+        string_tables: Dict[str, StringTable] = None,
+    ) -> "HarTable":
+        """
+        Extracts the columns from a list of entries in a single pass.
+
+        :param entries: Entries to convert
+        :type entries: List[HarEntry]
+        :param string_tables: Tables to intern the strings into. Pass the same
+            tables when building several tables that should share codes.
+        :type string_tables: Dict[str, StringTable]
+        :return: Table of the entries
+        :rtype: HarTable
+        """
+        if string_tables is None:
+            string_tables = {name: StringTable() for name in cls.STRING_TABLES}
+        mime_types = string_tables["mime_types"]
+        server_ips = string_tables["server_ips"]
+        http_versions = string_tables["http_versions"]
+        methods, urls = string_tables["methods"], string_tables["urls"]
+        connections = string_tables["connections"]
+        rows = {name: [] for name in cls.NUMERIC_COLUMNS}
+        for entry in entries:
+            raw = entry.raw_entry
+            request, response = raw["request"], raw["response"]
+            timings = raw.get("timings", {})
+            start = entry.startTimeMs
+            rows["start"].append(np.nan if start is None else start)
+            rows["time"].append(_number(raw.get("time"), 0))
+            rows["status"].append(_status(response.get("status")))
+            rows["body_size"].append(_number(response.get("bodySize"), -1))
+            rows["headers_size"].append(_number(response.get("headersSize"), -1))
+            rows["transfer_size"].append(get_transfer_size(response))
+            rows["mime_code"].append(
+                mime_types.code(response.get("content", {}).get("mimeType", ""))
+            )
+            rows["server_code"].append(
+                server_ips.code(raw.get("serverIPAddress", "unknown"))
+            )
+            rows["version_code"].append(
+                http_versions.code(response.get("httpVersion", ""))
+            )
+            rows["method_code"].append(methods.code(request.get("method", "")))
+            rows["url_code"].append(urls.code(request.get("url", "")))
+            rows["connection_code"].append(
+                connections.code(str(raw.get("connection") or ""))
+            )
+            for phase in TIMING_PHASES:
+                rows[phase].append(_number(timings.get(phase)))
+
+        columns = {
+            name: np.array(rows[name], dtype=dtype) for name, dtype in cls.COLUMNS
+        }
+        return cls(columns, string_tables)
+
+    def mask(self, entry_filter: EntryFilter) -> np.ndarray:
+        """
+        Vectorized version of applying ``entry_filter`` to every entry. The
+        string criteria are only evaluated once per distinct value.
+
+        :param entry_filter: Compiled filter criteria
+        :type entry_filter: EntryFilter
+        :return: Boolean array of the rows that match the filter
+        :rtype: np.ndarray
+        """
+        receive = self.receive
+        # If no receive time, this isn't a valid entry
+        mask = ~np.isnan(receive) & (receive != 0)
+        if entry_filter.receive_time__gt is not None:
+            mask &= receive >= entry_filter.receive_time__gt
+        if entry_filter.load_time__gt is not None:
+            mask &= self.time >= entry_filter.load_time__gt
+        if entry_filter.content_size is not None:
+            mask &= self.body_size >= entry_filter.content_size
+        mask &= self.mime_types.lookup(entry_filter.match_content_type)[self.mime_code]
+        mask &= self.http_versions.lookup(entry_filter.match_http_version)[
+            self.version_code
+        ]
+        mask &= self.methods.lookup(entry_filter.match_request_type)[self.method_code]
+        statuses, inverse = np.unique(self.status, return_inverse=True)
+        status_matches = np.fromiter(
+            (entry_filter.match_status_code(int(s)) for s in statuses),
+            dtype=bool,
+            count=len(statuses),
+        )
+        mask &= status_matches[inverse.reshape(-1)]
+        return mask
+
+    def classify(self, filters: Dict[str, EntryFilter]) -> Dict[str, np.ndarray]:
+        """
+        Sorts the rows into buckets by content type in one go. Every distinct
+        mime type is matched against all the filters once, instead of building
+        a separate mask for every filter. Only the content type of the filters
+        is used, the rest of the criteria are the ``filter_entries`` defaults.
+
+        :param filters: Bucket name and the filter for its content type
+        :type filters: Dict[str, EntryFilter]
+        :return: Bucket name and a boolean array of the rows in the bucket
+        :rtype: Dict[str, np.ndarray]
+        """
+        membership = np.zeros((len(filters), len(self.mime_types)), dtype=bool)
+        for code, mime_type in enumerate(self.mime_types.values):
+            for i, entry_filter in enumerate(filters.values()):
+                membership[i, code] = entry_filter.match_content_type(mime_type)
+        buckets = membership[:, self.mime_code] & self.mask(EntryFilter())
+        return dict(zip(filters, buckets))
+
+    def _select(self, column: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        return column if mask is None else column[mask]
+
+    def total_size(self, mask: Optional[np.ndarray] = None) -> int:
+        """
+        Same as ``HarPage.get_total_size`` for the rows in ``mask``.
+
+        :param mask: Rows to include, all rows if not given
+        :type mask: np.ndarray
+        :return: Total response body size
+        :rtype: int
+        """
+        sizes = self._select(self.body_size, mask)
+        return int(sizes[sizes > 0].sum())
+
+    def total_transfer_size(self, mask: Optional[np.ndarray] = None) -> int:
+        """
+        Same as ``HarPage.get_total_size_trans`` for the rows in ``mask``.
+
+        :param mask: Rows to include, all rows if not given
+        :type mask: np.ndarray
+        :return: Total bytes transferred
+        :rtype: int
+        """
+        return int(self._select(self.transfer_size, mask).sum())
+
+    def total_time(self, mask: Optional[np.ndarray] = None):
+        """
+        Sum of the load time of the rows in ``mask``.
+
+        :param mask: Rows to include, all rows if not given
+        :type mask: np.ndarray
+        :return: Total load time in ms
+        :rtype: int, float
+        """
+        return _as_number(self._select(self.time, mask).sum())
+
+    def busy_time(self, mask: Optional[np.ndarray] = None) -> int:
+        """
+        Vectorized version of ``HarParser.get_asset_busy_time`` for the rows
+        in ``mask``.
+
+        :param mask: Rows to include, all rows if not given
+        :type mask: np.ndarray
+        :return: Milliseconds where at least one of the rows was loading
+        :rtype: int
+        """
+        starts = self._select(self.start, mask)
+        times = self._select(self.time, mask)
+        known = ~np.isnan(starts)
+        starts, times = starts[known], times[known]
+        if not len(starts):
+            return 0
+        order = np.argsort(starts, kind="stable")
+        starts = starts[order]
+        ends = starts + np.maximum(np.trunc(times[order]), 1)
+        # The running maximum of the ends is where the current merged interval
+        # ends. A new interval starts whenever a start is past that.
+        reach = np.maximum.accumulate(ends)
+        new_interval = np.empty(len(starts), dtype=bool)
+        new_interval[0] = True
+        new_interval[1:] = starts[1:] > reach[:-1]
+        first = np.flatnonzero(new_interval)
+        last = np.append(first[1:] - 1, len(starts) - 1)
+        return int(round((reach[last] - starts[first]).sum()))
+
+    def histograms(
+        self, mask: Optional[np.ndarray] = None, metrics: Iterable[str] = LATENCY_METRICS
+    ) -> Dict[str, LatencyHistogram]:
+        """
+        :param mask: Rows to include, all rows if not given
+        :type mask: np.ndarray
+        :param metrics: Columns to count
+        :type metrics: Iterable[str]
+        :return: Histogram of every column in ``metrics``
+        :rtype: Dict[str, LatencyHistogram]
+        """
+        histograms = {}
+        for metric in metrics:
+            histogram = histograms[metric] = LatencyHistogram()
+            histogram.add_many(self._select(self.columns[metric], mask))
+        return histograms
+
+    def hostnames(self) -> Tuple[StringTable, np.ndarray]:
+        """
+        Hostname of every row, parsed once per distinct URL.
+
+        :return: Table of the hostnames and the code of the hostname of
+            every row in it
+        :rtype: Tuple[StringTable, np.ndarray]
+        """
+        hosts = StringTable()
+        host_of_url = np.fromiter(
+            (hosts.code(urlsplit(url).hostname or "") for url in self.urls.values),
+            dtype=np.int32,
+            count=len(self.urls),
+        )
+        return hosts, host_of_url[self.url_code]
+
+    def connection_ids(self) -> np.ndarray:
+        """
+        Which connection every row was sent on, numbered from 0. A
+        ``connection`` ID exported by the browser (i.e. - Chrome) is used as
+        it is, per server. Firefox exports the remote port there instead, so a
+        numeric ``connection`` only separates the rows by port. Without an ID
+        every row that opened a connection (``connect`` is not -1) starts a
+        new one, and the rows that reused a connection are put on the last
+        one opened to the same server and port before them.
+
+        :return: Connection number of every row
+        :rtype: np.ndarray
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        has_id = self.connections.lookup(lambda value: value and not value.isdigit())[
+            self.connection_code
+        ]
+        # the port, or -1 if the row has an ID or nothing was exported
+        port = np.where(
+            self.connections.lookup(str.isdigit)[self.connection_code],
+            self.connection_code,
+            -1,
+        ).astype(np.int64)
+        server = self.server_code.astype(np.int64)
+
+        order = np.lexsort((self.start, port, server))
+        with np.errstate(invalid="ignore"):
+            opened = (self.connect[order] >= 0).astype(np.int64)
+        # number of connections opened to the server and port up to every row
+        opened_before = np.cumsum(opened)
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (server[order][1:] != server[order][:-1]) | (
+            port[order][1:] != port[order][:-1]
+        )
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+        sequence = np.empty(len(order), dtype=np.int64)
+        sequence[order] = opened_before - (opened_before - opened)[group_start]
+
+        key = np.where(has_id, self.connection_code, sequence)
+        keys = np.stack([has_id.astype(np.int64), server, port, key], axis=1)
+        return np.unique(keys, axis=0, return_inverse=True)[1].reshape(-1)
+
+    def time_to_first_byte(self):
+        """
+        Load time of every row before the first 200 response, plus the time
+        that response spent before receiving (every positive timing except
+        ``receive``).
+
+        :return: Time to first byte in ms
+        :rtype: int, float
+        """
+        first = np.flatnonzero(self.status == 200)
+        if not len(first):
+            return _as_number(self.time.sum())
+        row = first[0]
+        phases = np.array(
+            [self.columns[phase][row] for phase in TIMING_PHASES if phase != "receive"]
+        )
+        return _as_number(self.time[:row].sum() + phases[phases > 0].sum())
+
+    def initial_load_time(self):
+        """
+        Load time of the first row that is not a redirect.
+
+        :return: Load time in ms or None if every row is a redirect
+        :rtype: int, float
+        """
+        rows = np.flatnonzero((self.status < 300) | (self.status > 399))
+        if not len(rows):
+            return None
+        return _as_number(self.time[rows[0]])
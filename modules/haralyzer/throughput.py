@@ -0,0 +1,264 @@
+"""
+Goodput of HAR entries: the response body bytes of an entry divided by the
+time spent receiving them. The totals keep the bytes and the receive time
+apart, so they can be merged across pages and HAR files and the throughput of
+any group is total bytes over total receive time, not a mean of ratios.
+"""
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from .histogram import PERCENTILES, LatencyHistogram
+
+# Width of the buckets of a throughput series and the default rolling window
+SERIES_STEP = 1000
+SERIES_WINDOW = 10000
+
+
+def get_throughput(
+    size: Union[int, float, np.ndarray], receive: Union[int, float, np.ndarray]
+) -> Union[float, np.ndarray]:
+    """
+    :param size: Response body size in bytes
+    :type size: Union[int, float, np.ndarray]
+    :param receive: Receive time in ms
+    :type receive: Union[int, float, np.ndarray]
+    :return: Bytes per second, NaN where there is no body or no receive time
+    :rtype: Union[float, np.ndarray]
+    """
+    size = np.asarray(size, dtype=np.float64)
+    receive = np.asarray(receive, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        throughput = np.where((size > 0) & (receive > 0), size * 1000 / receive, np.nan)
+    return throughput.item() if throughput.ndim == 0 else throughput
+
+
+def _measured(sizes: np.ndarray, receives: np.ndarray) -> np.ndarray:
+    """Rows that transferred a body and spent time receiving it"""
+    with np.errstate(invalid="ignore"):
+        return (sizes > 0) & (receives > 0)
+
+
+class ThroughputStats:
+    """
+    Bytes received and time spent receiving them for a group of entries, and
+    a histogram of the throughput of the single entries (in bytes/s).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.receive = 0.0
+        self.histogram = LatencyHistogram()
+
+    def __repr__(self):
+        return f"ThroughputStats of {self.count} entries"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ThroughputStats):
+            return NotImplemented
+        return (
+            self.count == other.count
+            and self.bytes == other.bytes
+            and np.isclose(self.receive, other.receive)
+            and self.histogram == other.histogram
+        )
+
+    def __iadd__(self, other: "ThroughputStats") -> "ThroughputStats":
+        self.merge(other)
+        return self
+
+    def add_many(self, sizes: np.ndarray, receives: np.ndarray) -> None:
+        """
+        Counts the entries that transferred a body, the others are ignored.
+
+        :param sizes: Response body sizes in bytes
+        :type sizes: np.ndarray
+        :param receives: Receive times in ms
+        :type receives: np.ndarray
+        """
+        sizes = np.asarray(sizes, dtype=np.float64)
+        receives = np.asarray(receives, dtype=np.float64)
+        measured = _measured(sizes, receives)
+        sizes, receives = sizes[measured], receives[measured]
+        self.count += len(sizes)
+        self.bytes += int(sizes.sum())
+        self.receive += float(receives.sum())
+        self.histogram.add_many(sizes * 1000 / receives)
+
+    def merge(self, other: "ThroughputStats") -> None:
+        """
+        :param other: Totals to add to these
+        :type other: ThroughputStats
+        """
+        self.count += other.count
+        self.bytes += other.bytes
+        self.receive += other.receive
+        self.histogram.merge(other.histogram)
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """
+        :return: Bytes per second over all the entries, None if there are none
+        :rtype: Optional[float]
+        """
+        return self.bytes * 1000 / self.receive if self.receive else None
+
+    def to_dict(self, pcts: Iterable[float] = PERCENTILES) -> dict:
+        """
+        :param pcts: Percentiles of the entry throughput to include
+        :type pcts: Iterable[float]
+        :return: 'count', 'bytes', 'receive', 'throughput' and the percentiles
+            of the throughput of the entries, i.e. - 'p50'
+        :rtype: dict
+        """
+        return dict(
+            count=self.count,
+            bytes=self.bytes,
+            receive=self.receive,
+            throughput=self.throughput,
+            **self.histogram.percentiles(pcts),
+        )
+
+
+def group_throughput(
+    sizes: np.ndarray, receives: np.ndarray, codes: np.ndarray, names
+) -> Dict[str, ThroughputStats]:
+    """
+    Splits the rows by group code and totals every group, in one sort over
+    the rows instead of one mask per group.
+
+    :param sizes: Response body sizes in bytes
+    :type sizes: np.ndarray
+    :param receives: Receive times in ms
+    :type receives: np.ndarray
+    :param codes: Group code of every row
+    :type codes: np.ndarray
+    :param names: Name of every code, i.e. - a StringTable
+    :type names: Sequence[str]
+    :return: Group name and its totals
+    :rtype: Dict[str, ThroughputStats]
+    """
+    measured = _measured(sizes, receives)
+    codes, sizes, receives = codes[measured], sizes[measured], receives[measured]
+    order = np.argsort(codes, kind="stable")
+    codes, sizes, receives = codes[order], sizes[order], receives[order]
+    groups, starts = np.unique(codes, return_index=True)
+    results = {}
+    for code, group_sizes, group_receives in zip(
+        groups, np.split(sizes, starts[1:]), np.split(receives, starts[1:])
+    ):
+        stats = results.setdefault(names[int(code)], ThroughputStats())
+        stats.add_many(group_sizes, group_receives)
+    return results
+
+
+def merge_throughput(
+    groups: Iterable[Dict[str, Dict[str, ThroughputStats]]]
+) -> Dict[str, Dict[str, ThroughputStats]]:
+    """
+    Adds up the ``throughput_stats`` of several pages.
+
+    :param groups: Grouping, group name and totals
+    :type groups: Iterable[Dict[str, Dict[str, ThroughputStats]]]
+    :return: The merged totals of every grouping and group
+    :rtype: Dict[str, Dict[str, ThroughputStats]]
+    """
+    merged = {}
+    for stats in groups:
+        for group_by, group_stats in stats.items():
+            merged_groups = merged.setdefault(group_by, {})
+            for name, totals in group_stats.items():
+                merged_groups.setdefault(name, ThroughputStats()).merge(totals)
+    return merged
+
+
+class ThroughputSeries:
+    """
+    Bytes and receive time bucketed by the time the entries finished, in
+    buckets of ``step`` ms aligned to the epoch, so the series of several
+    pages or HAR files can be merged.
+    """
+
+    def __init__(self, step: int = SERIES_STEP):
+        """
+        :param step: Width of a bucket in ms
+        :type step: int
+        """
+        self.step = step
+        self.buckets: Dict[int, list] = {}
+
+    def __repr__(self):
+        return f"ThroughputSeries of {len(self.buckets)} buckets"
+
+    def add_many(self, ends: np.ndarray, sizes: np.ndarray, receives: np.ndarray) -> None:
+        """
+        :param ends: Time every entry finished, in ms since the epoch
+        :type ends: np.ndarray
+        :param sizes: Response body sizes in bytes
+        :type sizes: np.ndarray
+        :param receives: Receive times in ms
+        :type receives: np.ndarray
+        """
+        ends = np.asarray(ends, dtype=np.float64)
+        sizes = np.asarray(sizes, dtype=np.float64)
+        receives = np.asarray(receives, dtype=np.float64)
+        measured = _measured(sizes, receives) & ~np.isnan(ends)
+        if not measured.any():
+            return
+        buckets = (ends[measured] // self.step).astype(np.int64)
+        groups, inverse = np.unique(buckets, return_inverse=True)
+        counts = np.bincount(inverse)
+        totals = np.bincount(inverse, weights=sizes[measured])
+        times = np.bincount(inverse, weights=receives[measured])
+        for bucket, count, total, time in zip(groups, counts, totals, times):
+            values = self.buckets.setdefault(int(bucket), [0, 0, 0.0])
+            values[0] += int(count)
+            values[1] += int(total)
+            values[2] += float(time)
+
+    def merge(self, other: "ThroughputSeries") -> None:
+        """
+        :param other: Series with the same step
+        :type other: ThroughputSeries
+        """
+        if other.step != self.step:
+            raise ValueError("Series with a different step can not be merged")
+        for bucket, (count, total, time) in other.buckets.items():
+            values = self.buckets.setdefault(bucket, [0, 0, 0.0])
+            values[0] += count
+            values[1] += total
+            values[2] += time
+
+    def rolling(self, window: int = SERIES_WINDOW) -> Dict[str, np.ndarray]:
+        """
+        Throughput over a window that moves one step at a time, from the first
+        to the last bucket with entries.
+
+        :param window: Width of the window in ms, a multiple of ``step``
+        :type window: int
+        :return: 'end' of every window in ms since the epoch, and the 'count',
+            'bytes', 'receive' and 'throughput' (bytes/s, NaN when nothing was
+            received) of the entries that finished within it
+        :rtype: Dict[str, np.ndarray]
+        """
+        if window % self.step:
+            raise ValueError("window must be a multiple of step")
+        if not self.buckets:
+            empty = np.array([], dtype=np.float64)
+            return dict(end=empty, count=empty, bytes=empty, receive=empty, throughput=empty)
+        first, last = min(self.buckets), max(self.buckets)
+        values = np.zeros((3, last - first + 1), dtype=np.float64)
+        for bucket, bucket_values in self.buckets.items():
+            values[:, bucket - first] = bucket_values
+        kernel = np.ones(window // self.step)
+        count, total, receive = (
+            np.convolve(row, kernel)[: values.shape[1]] for row in values
+        )
+        return dict(
+            end=(np.arange(first, last + 1) + 1) * float(self.step),
+            count=count,
+            bytes=total,
+            receive=receive,
+            throughput=get_throughput(total, receive),
+        )
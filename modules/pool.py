@@ -0,0 +1,88 @@
+import os
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from utils.applogger import apptest_logger
+
+
+class AccountPool:
+    """
+        Hands out accounts so that no two sessions that run at the same time
+        use the same account. A free account is picked at random.
+    """
+
+    def __init__(self, accounts: List[Dict[str, str]]):
+        if not accounts:
+            raise ValueError("At least one account is required")
+        self._free = list(accounts)
+        self._available = threading.Condition()
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Dict[str, str]]:
+        """
+            Waits for a free account and returns it to the pool afterwards.
+            Raises TimeoutError if no account is free within timeout seconds.
+        """
+        with self._available:
+            if not self._available.wait_for(lambda: self._free, timeout=timeout):
+                raise TimeoutError("No free account")
+            account = self._free.pop(random.randrange(len(self._free)))
+        try:
+            yield account
+        finally:
+            with self._available:
+                self._free.append(account)
+                self._available.notify()
+
+
+class SessionPool:
+    """
+        Runs browsing sessions on ``workers`` threads at once, each one driving
+        its own browser. Every worker has its own download directory under
+        har_location and every session gets an account that no other running
+        session uses.
+
+        A session is called as ``session(account=..., har_location=...,
+        analysis_executor=...)``. It should submit the analysis of its HAR
+        file to analysis_executor, a single thread shared by all the sessions,
+        so reports are written one at a time and the browser threads are free
+        to start the next session.
+    """
+
+    def __init__(self, workers: int, accounts: List[Dict[str, str]], har_location: str):
+        self.workers = workers
+        self.accounts = AccountPool(accounts)
+        self.har_location = har_location
+
+    def _run_session(self, session: Callable, analysis_executor: ThreadPoolExecutor):
+        har_location = os.path.join(self.har_location, threading.current_thread().name)
+        os.makedirs(har_location, exist_ok=True)
+        with self.accounts.acquire() as account:
+            return session(account=account, har_location=har_location, analysis_executor=analysis_executor)
+
+    def run(self, sessions: List[Callable]) -> List:
+        """
+            Runs the sessions and waits for them and their analysis to finish.
+            Returns the result of every session, or the exception it raised.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis") as analysis_executor:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="browser") as executor:
+                futures = [
+                    executor.submit(self._run_session, session, analysis_executor)
+                    for session in sessions
+                ]
+                for future in as_completed(futures):
+                    if future.exception():
+                        apptest_logger.debug(f"Exception running session: {future.exception()}")
+
+            results = []
+            for future in futures:
+                result = future.exception() or future.result()
+                # wait for the analysis the session submitted
+                if isinstance(result, Future):
+                    result = result.exception() or result.result()
+                results.append(result)
+        return results
@@ -0,0 +1,30 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+from modules.apptests.base import ThinkTime
+from modules.apptests.instagram import InstagramTest
+
+
+class BusyDriver:
+    """
+    Driver stub for a page that keeps loading resources, so the network is
+    never idle.
+    """
+
+    current_url = "https://www.instagram.com/"
+
+    def execute_script(self, script, *args):
+        return 0
+
+
+def test_network_idle_is_best_effort():
+    ig = InstagramTest(
+        username="user",
+        password="secret",
+        driver=BusyDriver(),
+        autologin=False,
+        default_element_timeout=0.1,
+        think_time=ThinkTime(0, 0),
+    )
+    assert ig.wait_for_network_idle() is False
+    with pytest.raises(TimeoutException):
+        ig.wait_for_network_idle(strict=True)
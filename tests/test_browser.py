@@ -0,0 +1,175 @@
+import json
+import os
+import pytest
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from modules.browser import FireFoxBrowser, HarCapture, ProxyCapture
+from modules.haralyzer.aggregate import HarTail
+from modules.haralyzer.stream import HarStreamReader
+
+EXTENSION_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "extensions", "firefox") + os.sep
+
+
+def test_profile_template(tmp_path):
+    """
+    The profile template is built once per set of inputs and copied for every
+    session.
+    """
+    browser = FireFoxBrowser(
+        host_type="linux",
+        extension_path=EXTENSION_PATH,
+        har_location=str(tmp_path / "hars"),
+        profile_cache_location=str(tmp_path / "profiles"),
+    )
+    template = browser._get_profile_template()
+    assert browser._get_profile_template() == template
+    assert os.listdir(tmp_path / "profiles") == [os.path.basename(template)]
+    assert sorted(os.listdir(os.path.join(template, "extensions"))) == [
+        "harexporttrigger@getfirebug.com.xpi",
+        "jid0-oEwF5ZcskGhjFv4Kk4lYc@jetpack.xpi",
+    ]
+
+    browser._build_profile()
+    assert browser.profile.path != template
+    with open(os.path.join(browser.profile.path, "user.js")) as f:
+        user_js = f.read()
+    assert '"network.http.http3.enabled", true' in user_js
+    assert str(tmp_path / "hars") in user_js
+
+    other = FireFoxBrowser(
+        host_type="linux",
+        extension_path=EXTENSION_PATH,
+        enable_quic=False,
+        profile_cache_location=str(tmp_path / "profiles"),
+    )
+    assert other._get_profile_template() != template
+
+
+class ProxyAPI(BaseHTTPRequestHandler):
+    """
+    Stand-in for the BrowserMob Proxy REST API. Every PUT of the HAR returns
+    the next chunk of entries, like the proxy returns what it recorded since
+    the last PUT.
+    """
+
+    def _reply(self, data=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        self.send_response(200 if body else 204)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self._reply({"port": 9091})
+
+    def do_PUT(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.server.requests.append(urllib.parse.parse_qs(self.rfile.read(length).decode()))
+        chunk = self.server.chunks.pop(0) if self.server.chunks else None
+        if chunk == "not json":
+            self.send_response(200)
+            self.send_header("Content-Length", "8")
+            self.end_headers()
+            self.wfile.write(b"not json")
+            return
+        self._reply(chunk and {"log": {"pages": self.server.pages, "entries": chunk}})
+
+    def do_DELETE(self):
+        self.server.closed.append(self.path)
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_har_capture_is_abstract():
+    class NoExport(HarCapture):
+        def get_entries(self, browser, start=0):
+            return {}
+
+    with pytest.raises(TypeError):
+        HarCapture()
+    with pytest.raises(TypeError):
+        NoExport()
+
+
+def test_proxy_capture(har_data, tmp_path):
+    """
+    The entries are paged from the proxy during the session, handed out from
+    the requested index on and written to a HAR file that has all of them.
+    """
+    log = har_data("instagram_1636626931.1164837.json")["log"]
+    entries = log["entries"]
+    server = HTTPServer(("127.0.0.1", 0), ProxyAPI)
+    server.pages, server.requests, server.closed = log["pages"], [], []
+    # nothing recorded yet when the capture starts
+    server.chunks = [None, entries[:100], entries[100:400], entries[400:]]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    browser = FireFoxBrowser(har_location=str(tmp_path), har_filename="session")
+    browser._build_options()
+    capture = ProxyCapture(api_url=f"http://127.0.0.1:{server.server_port}", poll_interval=3600)
+    try:
+        capture.prepare(browser)
+        assert browser.options.preferences["network.proxy.http_port"] == 9091
+        assert browser.options.preferences["network.proxy.ssl"] == "127.0.0.1"
+
+        capture.start(browser)
+        tail = HarTail()
+        capture._swap_har(browser.har_session_name)
+        export = capture.get_entries(browser, tail.offset)
+        assert export["start"] == 0 and export["entries"] == entries[:100]
+        tail.update(export["entries"], offset=export["start"], pages=export["pages"])
+
+        capture._swap_har(browser.har_session_name)
+        export = capture.get_entries(browser, tail.offset)
+        assert export["start"] == tail.offset
+        assert export["entries"] == entries[tail.offset:400]
+        tail.update(export["entries"], offset=export["start"], pages=export["pages"])
+        # the handed out entries are not kept
+        assert len(capture._entries) == 400 - tail.offset
+
+        assert capture.export(browser, str(tmp_path / "session.har"))
+    finally:
+        capture.stop(browser)
+        server.shutdown()
+
+    assert server.requests[0]["captureHeaders"] == ["true"]
+    assert server.requests[0]["initialPageRef"] == [browser.har_session_name]
+    assert server.closed == ["/proxy/9091"]
+    assert not os.path.exists(tmp_path / "session.har.part")
+    reader = HarStreamReader(str(tmp_path / "session.har"))
+    assert list(reader.iter_entries()) == entries
+    assert reader.log["pages"] == log["pages"]
+
+
+def test_proxy_capture_stop(har_data, tmp_path):
+    """
+    A bad response does not stop the paging, and stopping without an export
+    waits for the poller before closing the file.
+    """
+    entries = har_data("instagram_1636626931.1164837.json")["log"]["entries"]
+    server = HTTPServer(("127.0.0.1", 0), ProxyAPI)
+    server.pages, server.requests, server.closed = [], [], []
+    server.chunks = [None, "not json", entries[:50]]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    browser = FireFoxBrowser(har_location=str(tmp_path), har_filename="session")
+    browser._build_options()
+    capture = ProxyCapture(api_url=f"http://127.0.0.1:{server.server_port}", poll_interval=0.01)
+    try:
+        capture.prepare(browser)
+        capture.start(browser)
+        deadline = time.monotonic() + 10
+        while capture.entry_count < 50 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert capture.entry_count == 50
+    finally:
+        capture.stop(browser)
+        server.shutdown()
+
+    assert not capture._poller.is_alive()
+    assert capture._har_file is None
+    assert server.closed == ["/proxy/9091"]
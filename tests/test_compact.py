@@ -0,0 +1,56 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from modules.haralyzer.assets import HarParser
+from modules.haralyzer.compact import CompactHar, get_cache_path
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+PROPERTIES = ['page_size', 'image_size', 'video_size', 'image_count',
+              'image_load_time', 'js_load_time', 'initial_load_time',
+              'time_to_first_byte']
+
+
+@pytest.fixture
+def har_file(tmp_path):
+    path = str(tmp_path / 'test.har')
+    shutil.copy(os.path.join(DATA_PATH, 'missing_pageref.json'), path)
+    return path
+
+
+def test_compact_cache(har_file):
+    assert CompactHar.open(har_file) is None
+    CompactHar.write(har_file)
+    compact = CompactHar.open(har_file)
+    assert compact is not None
+    assert isinstance(compact.rows, np.memmap)
+
+    from_json = HarParser.from_file(har_file, use_cache=False)
+    from_cache = HarParser.from_file(har_file)
+    assert from_cache.compact is not None
+    assert from_cache.version == from_json.version
+    assert [p.page_id for p in from_cache.pages] == [p.page_id for p in from_json.pages]
+
+    for cached_page, page in zip(from_cache.pages, from_json.pages):
+        for prop in PROPERTIES:
+            assert getattr(cached_page, prop) == getattr(page, prop)
+        assert cached_page.get_load_time(
+            content_type='image.*', asynchronous=False
+        ) == page.get_load_time(content_type='image.*', asynchronous=False)
+    # None of that needed the JSON
+    assert 'har_data' not in from_cache.__dict__
+
+    # Entries are still available, the JSON is loaded when they are needed
+    page = from_cache.pages[-1]
+    assert page.filter_entries(content_type='image.*') == from_json.pages[-1].filter_entries(
+        content_type='image.*')
+
+
+def test_compact_cache_stale(har_file):
+    CompactHar.write(har_file)
+    with open(har_file, 'a') as f:
+        f.write('\n')
+    assert CompactHar.open(har_file) is None
+    assert HarParser.from_file(har_file).compact is None
+    assert os.path.isdir(get_cache_path(har_file))
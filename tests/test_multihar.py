@@ -0,0 +1,160 @@
+import os
+import pytest
+from statistics import mean, stdev
+from modules.haralyzer.assets import HarPage
+from modules.haralyzer.histogram import LatencyHistogram
+from modules.haralyzer.multihar import MultiHarParser, PageMetrics, percentile
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+TEST_HARS = ['instagram_1636621800.4872868.json',
+             'instagram_1636626931.1164837.json']
+
+
+def test_pages_are_parsed_once(har_data):
+    multi_har = MultiHarParser([har_data(f) for f in TEST_HARS])
+    assert multi_har.pages is multi_har.pages
+    assert len(multi_har.pages) == 2
+
+
+def test_summary(har_data):
+    multi_har = MultiHarParser([har_data(f) for f in TEST_HARS])
+    summary = multi_har.summary()
+
+    image_load_times = multi_har.get_load_times("image")
+    assert summary["image"]["count"] == 2
+    assert summary["image"]["mean"] == round(mean(image_load_times))
+    assert summary["image"]["stdev"] == round(stdev(image_load_times))
+    assert summary["image"]["stdev"] == multi_har.get_stdev("image")
+    assert summary["image"]["p50"] == round(percentile(image_load_times, 50))
+    assert summary["image"]["mean"] == multi_har.image_load_time
+    assert summary["ttfb"]["mean"] == multi_har.time_to_first_byte
+    # No text_load_time on HarPage
+    assert summary["text"]["count"] == 0
+    assert summary["text"]["mean"] is None
+
+
+def test_summary_without_pages():
+    summary = MultiHarParser([]).summary()
+    assert set(summary) == {"ttfb", "page", *HarPage.ASSET_TYPES}
+    assert summary["image"]["count"] == 0
+    assert summary["image"]["mean"] is None
+    assert summary["page"]["p90"] is None
+
+
+def test_percentile():
+    assert percentile([5], 99) == 5
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([4, 1, 3, 2], 100) == 4
+    with pytest.raises(ValueError):
+        percentile([], 50)
+
+
+def test_latency_histogram():
+    values = list(range(1, 1001)) + [-1, 0.25]
+    histogram = LatencyHistogram()
+    histogram.add_many(values)
+    assert histogram.count == 1001
+    assert histogram.min == 0.25
+    assert histogram.max == 1000
+    for pct in (50, 90, 99):
+        exact = percentile(values[:-2], pct)
+        assert abs(histogram.percentile(pct) - exact) <= exact * histogram.precision
+    assert histogram.percentile(100) == 1000
+    assert LatencyHistogram().percentile(50) is None
+
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.add_many(values[:500])
+    second.add_many(values[500:])
+    assert first + second == histogram
+    with pytest.raises(ValueError):
+        first.merge(LatencyHistogram(precision=0.1))
+
+
+def test_latency_percentiles(har_data):
+    """
+    Merged histograms count the entries of every page.
+    """
+    multi_har = MultiHarParser([har_data(f) for f in TEST_HARS])
+    histograms = multi_har.get_latency_histograms()
+    for asset_type in multi_har.asset_types:
+        assert histograms[asset_type]["time"].count == sum(
+            page.asset_histograms[asset_type]["time"].count for page in multi_har.pages
+        )
+    by_server = multi_har.get_latency_histograms("server_ip")
+    assert sum(h["time"].count for h in by_server.values()) == sum(
+        len(page.filter_entries()) for page in multi_har.pages
+    )
+    percentiles = multi_har.get_latency_percentiles()
+    assert percentiles["image"]["receive"]["p50"] == round(
+        histograms["image"]["receive"].percentile(50)
+    )
+    with pytest.raises(ValueError):
+        multi_har.get_latency_histograms("hostname")
+
+
+def test_throughput(har_data):
+    """
+    Merged throughput adds up the bytes and receive times of every page.
+    """
+    multi_har = MultiHarParser([har_data(f) for f in TEST_HARS])
+    stats = multi_har.get_throughput_stats("server_ip")
+    assert sum(s.bytes for s in stats.values()) == sum(
+        page.throughput_stats["page"]["all"].bytes for page in multi_har.pages
+    )
+    image = multi_har.get_throughput()["image"]
+    pages = [page.throughput_stats["asset_type"]["image"] for page in multi_har.pages]
+    assert image["count"] == sum(s.count for s in pages)
+    assert image["throughput"] == round(
+        sum(s.bytes for s in pages) * 1000 / sum(s.receive for s in pages)
+    )
+    series = multi_har.get_throughput_over_time(window=1000)
+    assert series["count"].sum() == sum(
+        page.throughput_stats["page"]["all"].count for page in multi_har.pages
+    )
+    with pytest.raises(ValueError):
+        multi_har.get_throughput("url")
+
+
+def test_throughput_without_pages():
+    multi_har = MultiHarParser([])
+    assert multi_har.get_throughput() == {}
+    series = multi_har.get_throughput_over_time()
+    assert all(len(values) == 0 for values in series.values())
+
+
+def test_connection_breakdown(har_data):
+    multi_har = MultiHarParser([har_data(f) for f in TEST_HARS])
+    stats = multi_har.get_connection_stats("page")["all"]
+    assert stats.requests == sum(len(page.entries) for page in multi_har.pages)
+    assert stats.connections == sum(
+        page.connection_stats["page"]["all"].connections for page in multi_har.pages
+    )
+    breakdown = multi_har.get_connection_breakdown("http_version")["HTTP/1.1"]
+    assert 0 < breakdown["reuse_ratio"] < 1
+    assert isinstance(breakdown["handshake_per_request"], float)
+    with pytest.raises(ValueError):
+        multi_har.get_connection_breakdown("hostname")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_har_files(har_data, workers):
+    """
+    Analyzing HAR files by path should give the same aggregates as passing
+    the loaded HAR data.
+    """
+    har_files = [os.path.join(DATA_PATH, f) for f in TEST_HARS]
+    from_data = MultiHarParser([har_data(f) for f in TEST_HARS])
+    from_files = MultiHarParser(har_files=har_files, workers=workers)
+
+    assert [p.har_file for p in from_files.pages] == har_files
+    assert all(isinstance(p, PageMetrics) for p in from_files.pages)
+    assert from_files.summary() == from_data.summary()
+    assert from_files.image_load_time == from_data.image_load_time
+    assert from_files.pages[0].image_size == from_data.pages[0].image_size
+    assert from_files.get_latency_histograms() == from_data.get_latency_histograms()
+    assert from_files.get_throughput("hostname") == from_data.get_throughput("hostname")
+    assert from_files.get_connection_stats() == from_data.get_connection_stats()
+
+    with pytest.raises(ValueError):
+        MultiHarParser()
@@ -1,6 +1,9 @@
 import datetime
+from urllib.parse import urlsplit
 import pytest
-from modules.haralyzer.assets import HarParser, HarPage, HarEntry
+from modules.haralyzer.assets import HarParser, HarPage, HarEntry, parse_datetime
+from modules.haralyzer.errors import PageNotFoundError
+from modules.haralyzer.filters import EntryFilter
 from dateutil import parser as du
 
 
@@ -133,3 +136,385 @@ def test_create_asset_timeline(har_data):
             assert du.parse(asset_timeline[time_key][0].raw_entry["startedDateTime"]) == entry.startTime
         time_key = time_key + datetime.timedelta(milliseconds=1)
 
+
+
+def test_asset_busy_time_matches_timeline(har_data):
+    """
+    The interval based busy time should be the same as the number of
+    milliseconds in the legacy asset timeline.
+    """
+    for har_file in (TEST_HAR_1, 'instagram_1636626931.1164837.json'):
+        har_parser = HarParser(har_data(har_file))
+        for page in har_parser.pages:
+            for content_type in ('image.*', 'video.*', '.*'):
+                entries = page.filter_entries(content_type=content_type)
+                assert har_parser.get_asset_busy_time(entries) == len(
+                    har_parser.create_asset_timeline(entries)
+                )
+
+
+def test_asset_busy_time_overlap(har_data):
+    """
+    Overlapping assets are only counted once, gaps are not counted at all.
+    """
+    har_parser = HarParser(har_data(TEST_HAR_1))
+    first = HarEntry(har_data('single_entry.json'))
+    first["time"] = 100
+    second = HarEntry(dict(har_data('single_entry.json'), time=100))
+    second["startedDateTime"] = "2021-11-11T01:52:05.443-08:00"
+    third = HarEntry(dict(har_data('single_entry.json'), time=10))
+    third["startedDateTime"] = "2021-11-11T01:52:06.393-08:00"
+
+    assert har_parser.get_asset_busy_time([first, second, third]) == 160
+    assert har_parser.get_asset_busy_time([]) == 0
+
+
+def test_page_and_entry_index(har_data):
+    """
+    Pages are built once from the indexes and every entry ends up on exactly
+    one page.
+    """
+    data = har_data('missing_pageref.json')
+    har_parser = HarParser(data)
+
+    assert har_parser.pages is har_parser.pages
+    assert set(har_parser.page_index) == {p["id"] for p in data["log"]["pages"]}
+    assert sum(len(e) for e in har_parser.entry_index.values()) == len(
+        data["log"]["entries"]
+    )
+    assert len(har_parser.entry_index["unknown"]) == 1
+
+    with pytest.raises(PageNotFoundError):
+        HarPage("does-not-exist", har_parser=har_parser)
+
+
+@pytest.mark.parametrize("value", [
+    "2021-11-11T01:52:05.393-08:00",
+    "2021-11-11T09:52:05.393Z",
+    "2021-11-11T09:52:05Z",
+    "2021-11-11T09:52:05.3931234+0100",
+    "2021-11-11T09:52:05.39+05:30",
+    "Thu, 11 Nov 2021 09:52:05 GMT",
+])
+def test_parse_datetime(value):
+    assert parse_datetime(value) == du.parse(value)
+
+
+def test_parse_datetime_invalid():
+    assert parse_datetime("") is None
+    assert parse_datetime("not a date") is None
+
+
+def test_entry_start_time_ms(har_data):
+    har_parser = HarParser(har_data(TEST_HAR_1))
+    for page in har_parser.pages:
+        for entry in page.entries:
+            expected = du.parse(entry.raw_entry["startedDateTime"])
+            assert entry.startTime == expected
+            assert entry.startTimeMs == pytest.approx(expected.timestamp() * 1000)
+        start_times = [entry.startTimeMs for entry in page.entries]
+        assert start_times == sorted(start_times)
+
+
+@pytest.mark.parametrize("criteria", [
+    dict(content_type="image.*"),
+    dict(content_type="(image|video|media|mp4)", receive_time__gt=200,
+         status_code="(200|206)"),
+    dict(request_type="get", http_version="HTTP/1"),
+    dict(content_type="image/jpeg", status_code="200", regex=False),
+    dict(content_type="(image|video)", status_code="200", content_size=20000),
+    dict(load_time__gt=500),
+])
+def test_filter_entries_matches_parser(har_data, criteria):
+    """
+    The compiled filter should select the same entries as the HarParser
+    match_* helpers.
+    """
+    har_parser = HarParser(har_data('instagram_1636626931.1164837.json'))
+    page = har_parser.pages[0]
+    regex = criteria.get("regex", True)
+
+    expected = []
+    for entry in page.entries:
+        if not entry.timings.get("receive"):
+            continue
+        if "request_type" in criteria and not har_parser.match_request_type(
+                entry, criteria["request_type"], regex=regex):
+            continue
+        if "content_type" in criteria and not har_parser.match_content_type(
+                entry, criteria["content_type"], regex=regex):
+            continue
+        if "status_code" in criteria and not har_parser.match_status_code(
+                entry, criteria["status_code"], regex=regex):
+            continue
+        if "http_version" in criteria and not har_parser.match_http_version(
+                entry, criteria["http_version"], regex=regex):
+            continue
+        if entry.time < criteria.get("load_time__gt", 0):
+            continue
+        if entry.timings["receive"] < criteria.get("receive_time__gt", 0):
+            continue
+        if criteria.get("content_size", -1) > entry.response.bodySize:
+            continue
+        expected.append(entry)
+
+    assert page.filter_entries(**criteria) == expected
+
+
+def test_table_columns(har_data):
+    """
+    The columnar table should agree with the entry objects it was built from.
+    """
+    har_parser = HarParser(har_data('instagram_1636626931.1164837.json'))
+    page = har_parser.pages[0]
+    table = page.to_columns()
+
+    assert page.to_columns() is table
+    assert len(table) == len(page.entries)
+    for i, entry in enumerate(page.entries):
+        assert table.start[i] == entry.startTimeMs
+        assert table.time[i] == entry.time
+        assert table.body_size[i] == entry.response.bodySize
+        assert table.mime_types[table.mime_code[i]] == entry.response.mimeType
+        assert table.server_ips[table.server_code[i]] == entry.serverAddress
+
+    entry_filter = EntryFilter(content_type="image.*", status_code="200")
+    mask = table.mask(entry_filter)
+    assert list(mask) == [entry_filter(entry) for entry in page.entries]
+    assert table.busy_time(mask) == har_parser.get_asset_busy_time(
+        page.filter_entries(content_type="image.*", status_code="200")
+    )
+    assert table.total_size(mask) == page.get_total_size(
+        page.filter_entries(content_type="image.*", status_code="200")
+    )
+
+
+def test_asset_summary_matches_filters(har_data):
+    """
+    The single pass classification should give the same totals as filtering
+    the entries of every asset type separately.
+    """
+    har_parser = HarParser(har_data('instagram_1636626931.1164837.json'))
+    page = har_parser.pages[0]
+    assert set(page.asset_summary) == set(page.asset_types)
+    for asset_type, content_type in page.asset_types.items():
+        entries = page.filter_entries(content_type=content_type)
+        assert page._get_asset_files(asset_type) == entries
+        assert page._get_asset_count(asset_type) == len(entries)
+        assert page._get_asset_size(asset_type) == page.get_total_size(entries)
+        assert page.asset_summary[asset_type]["load_time"] == (
+            har_parser.get_asset_busy_time(entries)
+        )
+    assert page.image_files == page.filter_entries(content_type="image.*")
+
+
+def test_latency_histograms(har_data):
+    """
+    The histograms count the timings of the entries of every asset type and
+    server IP address.
+    """
+    page = HarParser(har_data('instagram_1636626931.1164837.json')).pages[0]
+    for asset_type in page.asset_types:
+        entries = page.filter_entries(content_type=page.asset_types[asset_type])
+        histograms = page.asset_histograms[asset_type]
+        assert histograms["time"].count == len(entries)
+        if entries:
+            assert histograms["receive"].max == max(e.timings["receive"] for e in entries)
+    image = page.get_latency_percentiles()["image"]["wait"]
+    assert set(image) == {"p50", "p90", "p99"}
+
+    servers = page.get_latency_percentiles("server_ip")
+    assert set(servers) == {e.serverAddress for e in page.filter_entries()}
+    with pytest.raises(ValueError):
+        page.get_latency_percentiles("hostname")
+
+
+def test_throughput(har_data):
+    """
+    Throughput is body bytes over receive time, totalled per group in the
+    same way as adding up the entries one by one.
+    """
+    page = HarParser(har_data('instagram_1636626931.1164837.json')).pages[0]
+    measured = [e for e in page.filter_entries() if e.throughput is not None]
+    entry = measured[0]
+    assert entry.throughput == entry.response.bodySize * 1000 / entry.timings["receive"]
+
+    for group_by, key in (
+        ("server_ip", lambda e: e.serverAddress),
+        ("hostname", lambda e: urlsplit(e.url).hostname),
+    ):
+        stats = page.throughput_stats[group_by]
+        assert sum(s.count for s in stats.values()) == len(measured)
+        name = key(entry)
+        group = [e for e in measured if key(e) == name]
+        assert stats[name].bytes == sum(e.response.bodySize for e in group)
+        assert stats[name].receive == pytest.approx(sum(e.timings["receive"] for e in group))
+        assert stats[name].histogram.max == pytest.approx(max(e.throughput for e in group))
+
+    images = [e for e in page.image_files if e.throughput is not None]
+    image = page.get_throughput()["image"]
+    assert image["count"] == len(images)
+    assert image["throughput"] == pytest.approx(
+        sum(e.response.bodySize for e in images) * 1000 / sum(e.timings["receive"] for e in images)
+    )
+    assert page.get_throughput("page")["all"]["bytes"] == sum(e.response.bodySize for e in measured)
+    with pytest.raises(ValueError):
+        page.get_throughput("url")
+
+    series = page.get_throughput_over_time(window=5000)
+    assert series["count"].max() <= len(measured)
+    # every entry is counted in 5 windows, except at the end of the series
+    assert series["count"].sum() <= 5 * len(measured)
+    assert page.throughput_series.rolling(1000)["bytes"].sum() == sum(
+        e.response.bodySize for e in measured
+    )
+    with pytest.raises(ValueError):
+        page.throughput_series.rolling(1500)
+
+
+def test_connection_breakdown(har_data):
+    """
+    Connection setup totals match the timings of the entries, and every
+    entry is put on exactly one connection.
+    """
+    page = HarParser(har_data('instagram_1636626931.1164837.json')).pages[0]
+    entries = page.entries
+    opened = [e for e in entries if e.timings["connect"] >= 0]
+    stats = page.connection_stats["page"]["all"]
+    assert stats.requests == len(entries)
+    assert stats.connections == len(opened)
+    assert stats.handshake == sum(e.timings["connect"] for e in opened)
+    assert stats.dns_lookups == sum(1 for e in entries if e.timings["dns"] > 0)
+    assert stats.blocked.count == sum(1 for e in entries if e.timings["blocked"] >= 0)
+    breakdown = page.get_connection_breakdown("page")["all"]
+    assert breakdown["reuse_ratio"] == 1 - len(opened) / len(entries)
+    assert breakdown["handshake_per_request"] == stats.handshake / len(entries)
+    assert 0 <= breakdown["dns_cache_ratio"] <= 1
+
+    servers = page.get_connection_breakdown()
+    assert set(servers) == {e.serverAddress for e in entries}
+    assert sum(s["connections"] for s in servers.values()) == len(opened)
+    assert set(page.get_connection_breakdown("http_version")) == {
+        e.response.httpVersion for e in entries
+    }
+    with pytest.raises(ValueError):
+        page.get_connection_breakdown("hostname")
+
+    connections = page.get_connections()
+    assert sum(c["requests"] for c in connections) == len(entries)
+    assert sum(c["handshake"] for c in connections) == stats.handshake
+    assert sum(c["opened"] for c in connections) == stats.connections
+
+
+def test_connection_ports(har_data):
+    """
+    Firefox exports the remote port as the connection, the connections are
+    still told apart by the requests that opened them.
+    """
+    data = har_data('instagram_1636626931.1164837.json')
+    for entry in data["log"]["entries"]:
+        entry["connection"] = "443"
+    page = HarParser(data).pages[0]
+    entries = page.entries
+    opened = [e for e in entries if e.timings["connect"] >= 0]
+    connections = page.get_connections()
+    assert sum(c["opened"] for c in connections) == len(opened)
+    assert page.connection_stats["page"]["all"].connections == len(opened)
+    assert len(connections) > len({e.serverAddress for e in entries})
+
+    # a request to another port of the same server is on another connection
+    entries = data["log"]["entries"][:2]
+    for entry, port in zip(entries, ("443", "8443")):
+        entry["serverIPAddress"] = "10.0.0.1"
+        entry["connection"] = port
+        entry["timings"]["connect"] = -1
+    data["log"]["entries"] = entries
+    page = HarParser(data).pages[0]
+    assert sorted(page.to_columns().connection_ids()) == [0, 1]
+    assert page.connection_stats["page"]["all"].connections == 0
+
+
+def test_connection_ids(har_data):
+    """
+    Exported connection IDs are used as they are, per server.
+    """
+    data = har_data('instagram_1636626931.1164837.json')
+    entries = data["log"]["entries"][:6]
+    for i, entry in enumerate(entries):
+        entry["serverIPAddress"] = "10.0.0.1" if i < 4 else "10.0.0.2"
+        entry["connection"] = str(i % 2)
+    data["log"]["entries"] = entries
+    page = HarParser(data).pages[0]
+    ids = page.to_columns().connection_ids()
+    assert list(ids) == [0, 1, 0, 1, 2, 3]
+    assert sorted(c["requests"] for c in page.get_connections()) == [1, 1, 2, 2]
+
+
+def test_transfer_size(har_data):
+    """
+    Transfer sizes use _transferSize when exported and the headers plus body
+    size otherwise.
+    """
+    har_parser = HarParser(har_data('instagram_1636626931.1164837.json'))
+    page = har_parser.pages[0]
+    entry = page.entries[0]
+    response = entry.response.raw_entry
+    assert entry.response.transferSize == (
+        max(response["headersSize"], 0) + max(response["bodySize"], 0)
+    )
+    response["_transferSize"] = 1234
+    assert entry.response.transferSize == 1234
+    del response["_transferSize"]
+
+    assert page.page_size_trans == page.get_total_size_trans(page.entries)
+    for asset_type in page.asset_types:
+        assert page._get_asset_size_trans(asset_type) == (
+            page.get_total_size_trans(page._get_asset_files(asset_type))
+        )
+
+
+def test_header_index(har_data, header_types):
+    """
+    Header lookups through the index are case-insensitive and return the
+    first value, like a linear scan of the headers.
+    """
+    har_parser = HarParser(har_data('instagram_1636626931.1164837.json'))
+    page = har_parser.pages[0]
+    for entry in page.entries[:50]:
+        response = entry.response
+        for header_type in header_types:
+            expected = None
+            for header in response.headers:
+                if header["name"].lower() == header_type:
+                    expected = header["value"]
+                    break
+            assert response.get_header_value(header_type) == expected
+            assert response.get_header_value(header_type.upper()) == expected
+        assert response.get_headers(header_types) == {
+            h: response.get_header_value(h) for h in header_types
+        }
+        assert response.contentType == response.get_header_value("Content-Type")
+        assert entry.request.get_header_values("x-does-not-exist") == []
+
+    assert page.hostname == page.entries[0].request.get_header_value("host")
+
+
+def test_entry_is_slotted(har_data):
+    """
+    HarEntry and its Request/Response wrappers do not carry a __dict__, the
+    wrappers are created once and only when used.
+    """
+    entry = HarEntry(har_data('single_entry.json'))
+    assert not hasattr(entry, '__dict__')
+    assert entry._request is None and entry._response is None
+    assert entry.response is entry.response
+    assert entry.request is entry.request
+    assert not hasattr(entry.request, '__dict__')
+    assert not hasattr(entry.response, '__dict__')
+    assert entry.response.url == entry.url == entry.request.url
+    assert entry.startTime is entry.startTime
+
+    # Plain fields are read from the raw entry
+    entry["time"] = 42
+    assert entry.time == 42
+    assert entry["serverIPAddress"] == entry.serverAddress
@@ -0,0 +1,48 @@
+import threading
+import time
+import pytest
+from modules.pool import AccountPool, SessionPool
+
+ACCOUNTS = [{"username": f"user{i}", "password": "secret"} for i in range(3)]
+
+
+def test_account_pool():
+    pool = AccountPool(ACCOUNTS[:1])
+    with pool.acquire() as account:
+        assert account == ACCOUNTS[0]
+        with pytest.raises(TimeoutError):
+            with pool.acquire(timeout=0.01):
+                pass
+    with pool.acquire(timeout=0.01) as account:
+        assert account == ACCOUNTS[0]
+    with pytest.raises(ValueError):
+        AccountPool([])
+
+
+def test_session_pool(tmp_path):
+    """
+    Sessions that run at the same time never share an account or a download
+    directory, and their analysis runs on the analysis thread.
+    """
+    lock = threading.Lock()
+    running = {}
+    overlaps = []
+
+    def session(account, har_location, analysis_executor):
+        with lock:
+            if account["username"] in running.values() or har_location in running:
+                overlaps.append((account, har_location))
+            running[har_location] = account["username"]
+        time.sleep(0.05)
+        with lock:
+            del running[har_location]
+        return analysis_executor.submit(
+            lambda: (threading.current_thread().name, account["username"])
+        )
+
+    pool = SessionPool(2, ACCOUNTS, str(tmp_path))
+    results = pool.run([session] * 6)
+    assert not overlaps
+    assert len(results) == 6
+    assert all(name.startswith("analysis") for name, _ in results)
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,102 @@
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from modules.haralyzer.aggregate import aggregate_har_file
+from modules.haralyzer.filters import EntryFilter
+from utils.metrics import MediaStats, get_overall_score, get_score, get_throughput
+from utils.reports import ReportEntry, ResultsStore
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def get_report(har_file):
+    pages = aggregate_har_file(
+        os.path.join(DATA_PATH, har_file),
+        watches=dict(interesting=EntryFilter(content_type="(image|video)", receive_time__gt=100)),
+        keep_entries=["interesting"],
+    )
+    page = pages[-1]
+    entries = page.get_files("interesting")
+    return ReportEntry(page, entries, entries[0].startTime, har_file)
+
+
+def test_results_store(tmp_path):
+    """
+    Runs and their interesting entries are stored with numeric columns and
+    can be looked up by time, host and server.
+    """
+    report = get_report('instagram_1636626931.1164837.json')
+    path = str(tmp_path / "reports" / "results.db")
+    analyzed_at = datetime(2021, 11, 11, 12)
+    with ResultsStore(path) as store:
+        run_id = store.add_run(report, browsing_time=5, dl_threshold=100, analyzed_at=analyzed_at)
+        store.add_run(report, browsing_time=5, dl_threshold=100, analyzed_at=analyzed_at + timedelta(days=31))
+
+    with ResultsStore(path) as store:
+        assert store.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        runs = store.get_runs(since=analyzed_at, until=analyzed_at + timedelta(days=1))
+        assert [run["id"] for run in runs] == [run_id]
+        run = runs[0]
+        assert run["image_size"] == report.page.image_size
+        assert run["image_load_time_ms"] == report.page.image_load_time
+        assert run["interesting_count"] == report.num_entries
+        assert run["overall_score"] == report.overall_score
+        assert len(store.get_runs()) == 2
+
+        entries = store.connection.execute(
+            "SELECT * FROM entries WHERE run_id = ? ORDER BY id", (run_id,)
+        ).fetchall()
+        assert len(entries) == report.num_entries
+        first = report.interesting_entries[0]
+        assert entries[0]["body_size"] == first.response.bodySize
+        assert entries[0]["receive_ms"] == first.timings["receive"]
+        assert entries[0]["started_at_ms"] == round(first.startTimeMs)
+
+        host = entries[0]["host"]
+        by_host = store.get_entries(host=host)
+        assert by_host and all(entry["host"] == host for entry in by_host)
+        assert len(store.get_entries(since=first.startTime, server_ip=first.serverAddress)) >= 2
+
+        # the HAR times are -08:00, the same instant in UTC selects the same entries
+        first_utc = first.startTime.astimezone(timezone.utc)
+        assert first.startTime.utcoffset() != first_utc.utcoffset()
+        later = store.get_entries(since=first_utc + timedelta(milliseconds=1))
+        assert len(later) == len(store.get_entries()) - 2
+        assert [e["started_at_ms"] for e in later] == sorted(e["started_at_ms"] for e in later)
+        # naive datetimes are local time, like datetime.now()
+        local = first.startTime.astimezone().replace(tzinfo=None)
+        assert len(store.get_entries(since=local)) == len(store.get_entries())
+
+
+def test_scores():
+    """
+    Scores are seconds per MB whatever the size, and work on arrays.
+    """
+    mb = 1024 * 1024
+    assert get_score(mb, 2000) == 8.0
+    assert get_score(512 * 1024, 2000) == 6.0
+    assert get_score(2 * 1024 * mb, 204800) == 9.9
+    assert get_score(0, 2000) == 0
+    assert list(get_score(np.array([mb, 0, 2 * mb]), np.array([1000, 5, 1000]))) == [9.0, 0.0, 9.5]
+    assert get_throughput(mb, 2000) == mb / 2
+    assert np.isnan(get_throughput(mb, 0))
+    assert MediaStats(count=1, size=mb, load_time=500).throughput == 2 * mb
+    assert MediaStats().throughput is None
+    assert get_overall_score(8.0, 0) == 8.0
+    assert get_overall_score(0, 7.0) == 7.0
+    assert get_overall_score(8.0, 7.0) == 7.5
+
+    stats = MediaStats(count=2, size=2 * mb, load_time=1500)
+    assert stats.score == 9.25
+    assert stats.describe("images") == "2 (2.0 MB) images downloaded in 1.5 second(s)"
+
+
+def test_report_entry_numbers():
+    report = get_report('instagram_1636626931.1164837.json')
+    stats = report.overall_image_stats
+    assert stats["total_image_size"] == report.page.image_size
+    assert stats["total_image_load_time"] == report.page.image_load_time
+    assert stats["score"] == get_score(report.page.image_size, report.page.image_load_time)
+    entry = report.entry_stats[0]
+    assert entry["responseBodySize"] == report.interesting_entries[0].response.bodySize
+    assert isinstance(entry["receiveTiming"], (int, float))
@@ -0,0 +1,128 @@
+import copy
+import io
+import json
+import os
+import pytest
+from modules.haralyzer.assets import HarParser
+from modules.haralyzer.aggregate import HarTail, PageAggregator, aggregate_har_file, is_complete
+from modules.haralyzer.filters import EntryFilter
+from modules.haralyzer.intervals import IntervalUnion, union_length
+from modules.haralyzer.stream import HarStreamReader
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+TEST_HARS = ['instagram_1636621800.4872868.json',
+             'instagram_1636626931.1164837.json',
+             'missing_pageref.json']
+
+
+@pytest.mark.parametrize("har_file", TEST_HARS)
+@pytest.mark.parametrize("chunk_size", [7, 1 << 16])
+def test_stream_reader(har_data, har_file, chunk_size):
+    """
+    Streaming the entries should give the same result as loading the file.
+    """
+    data = har_data(har_file)
+    reader = HarStreamReader(os.path.join(DATA_PATH, har_file), chunk_size=chunk_size)
+
+    assert list(reader.iter_entries()) == data["log"]["entries"]
+    assert reader.log == {k: v for k, v in data["log"].items() if k != "entries"}
+
+
+def test_stream_reader_key_order():
+    """
+    Keys after the entries and numbers split over chunks are handled.
+    """
+    doc = '{"log": {"entries": [{"time": 12345}, {"time": 6}], "version": "1.2"}, "x": []}'
+    reader = HarStreamReader(io.StringIO(doc), chunk_size=3)
+    assert list(reader) == [{"time": 12345}, {"time": 6}]
+    assert reader.log == {"version": "1.2"}
+
+    with pytest.raises(ValueError):
+        list(HarStreamReader(io.StringIO('{"log": {"entries": [{}, '), chunk_size=3))
+
+
+def test_interval_union():
+    intervals = [(5, 10), (0, 2), (9, 12), (2, 3), (20, 21), (1, 4), (30, 30)]
+    union = IntervalUnion()
+    for start, end in intervals:
+        union.add(start, end)
+    assert union.length == union_length(intervals) == 12
+    assert union.intervals == [(0, 4), (5, 12), (20, 21)]
+
+
+@pytest.mark.parametrize("har_file", TEST_HARS)
+def test_aggregate_har_file(har_data, har_file):
+    """
+    The streamed totals should match the HarPage properties.
+    """
+    har_parser = HarParser(har_data(har_file))
+    aggregators = aggregate_har_file(os.path.join(DATA_PATH, har_file))
+
+    assert [a.page_id for a in aggregators] == [p.page_id for p in har_parser.pages]
+    for aggregator, page in zip(aggregators, har_parser.pages):
+        assert aggregator.entry_count == len(page.entries)
+        assert aggregator.page_size == page.page_size
+        assert aggregator.page_size_trans == page.page_size_trans
+        for asset_type in page.asset_types:
+            assert getattr(aggregator, f"{asset_type}_count") == getattr(
+                page, f"{asset_type}_count")
+            assert getattr(aggregator, f"{asset_type}_load_time") == page.get_load_time(
+                content_type=page.asset_types[asset_type])
+            assert aggregator.stats[asset_type].size == page.get_total_size(
+                getattr(page, f"{asset_type}_files"))
+            assert getattr(aggregator, f"{asset_type}_size_trans") == page._get_asset_size_trans(
+                asset_type)
+        if page.page_id != "unknown":
+            assert aggregator.pageTimings == page.pageTimings
+
+
+def test_aggregator_names():
+    """
+    Only the names registered by watch resolve, whatever their underscores.
+    """
+    aggregator = PageAggregator("page_1")
+    aggregator.watch("slow_load", EntryFilter(receive_time__gt=1000), keep_entries=True)
+    aggregator.watch("media", EntryFilter(content_type="video"))
+    assert aggregator.slow_load_count == 0
+    assert aggregator.slow_load_load_time == 0
+    assert aggregator.slow_load_size_trans == 0
+    assert aggregator.slow_load_files == []
+    assert aggregator.image_size == 0
+    for name in ("media_files", "slow_count", "load_time", "image_load", "size_trans"):
+        with pytest.raises(AttributeError):
+            getattr(aggregator, name)
+
+
+def test_har_tail(har_data):
+    """
+    Folding repeated exports of a growing log should count every entry once
+    and end up with the same totals as the whole HAR file.
+    """
+    har_file = 'instagram_1636626931.1164837.json'
+    log = har_data(har_file)["log"]
+    entries = log["entries"]
+    tail = HarTail()
+    seen = 0
+    for end in range(0, len(entries) + 10, 10):
+        export = copy.deepcopy(entries[tail.offset:end])
+        # The last entry of an export is still loading
+        if end < len(entries) and export:
+            export[-1]["response"]["status"] = 0
+            assert not is_complete(export[-1])
+        seen += len(tail.update(export, offset=tail.offset, pages=log["pages"]))
+        assert tail.offset <= end
+    # The requests that failed are folded in once they stop being pending
+    for _ in range(tail.max_pending):
+        export = copy.deepcopy(entries[tail.offset:])
+        seen += len(tail.update(export, offset=tail.offset, pages=log["pages"]))
+    assert seen == tail.entry_count == len(entries)
+    assert tail.offset == len(entries)
+    assert tail.update(copy.deepcopy(entries), pages=log["pages"]) == []
+
+    expected = aggregate_har_file(os.path.join(DATA_PATH, har_file))
+    assert [p.page_id for p in tail.pages] == [p.page_id for p in expected]
+    for page, expected_page in zip(tail.pages, expected):
+        assert page.entry_count == expected_page.entry_count
+        assert page.image_size == expected_page.image_size
+        assert page.image_load_time == expected_page.image_load_time
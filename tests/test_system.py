@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import threading
+import time
+import psutil
+from utils.system import terminate_procs, wait_for_file
+
+
+def test_wait_for_file(tmp_path):
+    har_file = tmp_path / "harfile.har"
+    assert not wait_for_file(str(har_file), timeout=0.2)
+
+    # Still downloading
+    har_file.write_text("{}")
+    (tmp_path / "harfile.har.part").write_text("")
+    assert not wait_for_file(str(har_file), expected_size=2, timeout=0.2)
+    (tmp_path / "harfile.har.part").unlink()
+
+    # Not the full size yet, the rest is written while waiting
+    har_file.write_text("{")
+    timer = threading.Timer(0.3, har_file.write_text, args=("{}",))
+    timer.start()
+    assert wait_for_file(str(har_file), expected_size=2, timeout=5)
+    timer.join()
+
+    # Unknown size, complete once it stops changing
+    assert wait_for_file(str(har_file), timeout=5)
+
+
+def test_terminate_procs():
+    """
+    Only the given processes are stopped, without a fixed wait.
+    """
+    launched = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        start = time.monotonic()
+        assert terminate_procs([psutil.Process(launched.pid)], timeout=5) == []
+        assert time.monotonic() - start < 5
+        assert launched.wait(timeout=5) is not None
+        assert other.poll() is None
+        # Already stopped
+        proc = psutil.Process(other.pid)
+        assert terminate_procs([proc], timeout=5) == []
+        assert terminate_procs([proc], timeout=5) == []
+    finally:
+        launched.kill()
+        other.kill()
@@ -1,16 +1,29 @@
 import logging
 import math
+from typing import Optional, Union
 
+import numpy as np
 
-def ms_to_s(n: int) -> float:
-    if isinstance(n, int):
-        return n / 1000
+from modules.haralyzer.throughput import get_throughput
+
+# Units of the report pipeline: sizes are int bytes, durations are int milliseconds and
+# throughput is bytes per second. Values are only converted to strings for display.
+MS_PER_S = 1000
+BYTES_PER_MB = 1024 * 1024
+MAX_SCORE = 10.0
+
+Number = Union[int, float]
+
+
+def ms_to_s(n: Number) -> float:
+    if isinstance(n, (int, float, np.number)) and not isinstance(n, bool):
+        return n / MS_PER_S
 
     return 0.0
 
 
 def convert_bytes(size_bytes: int) -> str:
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0B"
     size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
     i = int(math.floor(math.log(size_bytes, 1024)))
@@ -20,13 +33,68 @@ def convert_bytes(size_bytes: int) -> str:
     return "%s %s" % (s, size_name[i])
 
 
-def remove_size_suffix(bytes_: str) -> float:
-    try:
-        return float(bytes_.split()[0])
-    except:
+def get_score(size: Union[Number, np.ndarray], load_time: Union[Number, np.ndarray]):
+    """
+        MAX_SCORE minus the seconds it took to load one MB, rounded to 2 decimals. 0 if nothing
+        was loaded. Works on numbers and numpy arrays alike.
+    """
+    size = np.asarray(size, dtype=np.float64)
+    load_time = np.asarray(load_time, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(size > 0, MAX_SCORE - (load_time / MS_PER_S) / (size / BYTES_PER_MB), 0.0)
+    score = np.round(score, 2)
+    return score.item() if score.ndim == 0 else score
+
+
+def get_overall_score(*scores: float) -> float:
+    """
+        Mean of the scores that are not 0
+    """
+    scores = [score for score in scores if score]
+    return round(sum(scores) / len(scores), 2) if scores else 0
+
+
+class MediaStats:
+    """
+        Totals of one asset type of a page: count, size in bytes and load time in ms
+    """
+
+    def __init__(self, count: int = 0, size: int = 0, load_time: int = 0):
+        self.count = count
+        self.size = size
+        self.load_time = load_time
+
+    def __repr__(self):
+        return f"MediaStats({self.count} files, {self.size} bytes in {self.load_time} ms)"
+
+    @classmethod
+    def from_page(cls, page, asset_type: str) -> "MediaStats":
+        """
+            Reads <asset_type>_count, <asset_type>_size and <asset_type>_load_time of a
+            HarPage or PageAggregator
+        """
+        if page is None:
+            return cls()
+        return cls(
+            getattr(page, f"{asset_type}_count"),
+            getattr(page, f"{asset_type}_size"),
+            getattr(page, f"{asset_type}_load_time"),
+        )
 
-        return 0.0
+    @property
+    def throughput(self) -> Optional[float]:
+        """
+            Bytes per second over the load time, None if nothing was loaded
+        """
+        throughput = get_throughput(self.size, self.load_time)
+        return None if math.isnan(throughput) else throughput
 
+    @property
+    def score(self) -> float:
+        return get_score(self.size, self.load_time) if self.count else 0
 
-def gb_to_mb(n):
-    return n * 1000
+    def describe(self, name: str) -> str:
+        """
+            Human readable summary, i.e. - "12 (3.2 MB) images downloaded in 4.1 second(s)"
+        """
+        return f"{self.count} ({convert_bytes(self.size)}) {name} downloaded in {ms_to_s(self.load_time)} second(s)"
@@ -1,11 +1,14 @@
 import os
-import csv
+import sqlite3
 from typing import List, Optional
-from statistics import mean
 from datetime import datetime
-from utils.metrics import ms_to_s, convert_bytes, remove_size_suffix, gb_to_mb
+from urllib.parse import urlsplit
+from utils.metrics import MediaStats, get_overall_score, ms_to_s
 from utils.applogger import report_logger
 
+# results of every run, relative to the root of the project
+RESULTS_DB = "reports/results.db"
+
 
 class ReportEntry:
     def __init__(
@@ -19,6 +22,9 @@ class ReportEntry:
         self.first_start_time = first_start_time
         self.num_entries = len(interesting_entries)
         self.page = page
+        # sizes in bytes and load times in ms, formatted only when the report is displayed
+        self.image_stats = MediaStats.from_page(page, "image")
+        self.video_stats = MediaStats.from_page(page, "video")
         self.overall_image_stats = self._get_overall_image_stats()
         self.overall_video_stats = self._get_overall_video_stats()
         self.overall_score = self._get_overall_score()
@@ -26,48 +32,23 @@ class ReportEntry:
         self.har_filename = har_filename
 
     def _get_overall_image_stats(self) -> dict:
-        t_img_load_time = ms_to_s(self.page.image_load_time)
-        t_dl_size = convert_bytes(self.page.image_size)
         return dict(
-            image_files=len(self.page.image_files),
-            total_image_size=t_dl_size,
-            total_image_load_time=t_img_load_time,
-            score=round(
-                10.0
-                - (
-                    t_img_load_time
-                    / remove_size_suffix(
-                        gb_to_mb(t_dl_size) if "G" in t_dl_size else t_dl_size
-                    )
-                ),
-                2,
-            )  # TODO: very hacky and assumes a lot. Re-work
-            if self.page.image_files
-            else 0,
+            image_files=self.image_stats.count,
+            total_image_size=self.image_stats.size,
+            total_image_load_time=self.image_stats.load_time,
+            score=self.image_stats.score,
         )
 
     def _get_overall_video_stats(self) -> dict:
-        t_vid_load_time = ms_to_s(self.page.video_load_time)
-        t_dl_size = convert_bytes(self.page.video_size)
         return dict(
-            video_files=len(self.page.video_files),
-            total_video_size=t_dl_size,
-            total_video_load_time=t_vid_load_time,
-            score=round(10.0 - (t_vid_load_time / remove_size_suffix(t_dl_size)), 2)
-            if self.page.video_files
-            else 0,
+            video_files=self.video_stats.count,
+            total_video_size=self.video_stats.size,
+            total_video_load_time=self.video_stats.load_time,
+            score=self.video_stats.score,
         )
 
     def _get_overall_score(self) -> float:
-        if self.overall_image_stats["score"] and self.overall_video_stats["score"]:
-            overall_score = mean([self.overall_image_stats["score"], self.overall_video_stats["score"]])
-        elif self.overall_image_stats["score"] and not self.overall_video_stats["score"]:
-            overall_score = self.overall_image_stats["score"]
-        elif self.overall_video_stats["score"] and not self.overall_image_stats["score"]:
-            overall_score = self.overall_image_stats["score"]
-        else:
-            overall_score = 0
-        return round(overall_score, 2)
+        return get_overall_score(self.image_stats.score, self.video_stats.score)
 
     def _get_entry_stats(self) -> List[dict]:
         l = []
@@ -76,94 +57,197 @@ class ReportEntry:
                 dict(
                     startTime=entry.startTime,
                     responseMimeType=entry.response.mimeType,
-                    responseBodySize=convert_bytes(entry.response.bodySize),
-                    receiveTiming=ms_to_s(entry.timings["receive"]),
-                    url=entry.response.url.split("https://")[1].split("/")[0],
+                    responseBodySize=entry.response.bodySize,
+                    receiveTiming=entry.timings["receive"],
+                    url=urlsplit(entry.url).hostname,
                     serverAddress=entry.serverAddress,
                 )
             )
         return l
 
 
-def dump_report(
-    browsing_time: int, report_entry: ReportEntry, root_path: str, dl_threshold: int
-) -> None:  # TODO: make more reusable
+class ResultsStore:
     """
-    Dumps report to reports/ as a txt file and also creates a csv
+        SQLite database of the results of every run, in WAL mode so reports can be read
+        while runs are being written. There is one row per run in ``runs`` and one row
+        per interesting entry in ``entries``, with sizes in bytes and times in milliseconds.
+        Points in time are stored as ms since the epoch (UTC), so rows from HAR files with
+        different UTC offsets compare and sort correctly. Both tables are indexed on time,
+        so trends over months of runs are range lookups.
     """
-    now = str(datetime.now())
-    dl_threshold = ms_to_s(dl_threshold)
-
-    har_entry_stats = ""
-    for har_entry in report_entry.interesting_entries:
-        har_entry_stats += f"\t\t{har_entry.startTime} - Downloaded {har_entry.response.mimeType!r} ({convert_bytes(har_entry.response.bodySize)}) in {ms_to_s(har_entry.timings['receive'])} seconds from {har_entry.response.url.split('https://')[1].split('/')[0]} ({har_entry.serverAddress})\n"
-
-    
-
-    output = f"""
-    --------------------------------------------------------------------------------
-    Report for {report_entry.har_filename!r} analyzed at @ {now}
-    Browsed for {browsing_time} minute(s)
-    First download time of image/video content {report_entry.first_start_time} (Only includes files over threshold)
-    Images and Videos downloaded above threshold: {report_entry.num_entries}
-    {report_entry.overall_image_stats["image_files"]} ({report_entry.overall_image_stats["total_image_size"]}) images downloaded in {report_entry.overall_image_stats["total_image_load_time"]} seconds
-    {report_entry.overall_video_stats["video_files"]} ({report_entry.overall_video_stats["total_video_size"]}) videos downloaded in {report_entry.overall_video_stats["total_video_load_time"]} seconds
-    Images Score {report_entry.overall_image_stats["score"]}
-    Videos Score {report_entry.overall_video_stats["score"]}
-    Overall Score {report_entry.overall_score}
-
-    Har entries that exceeded the download duration threshold of {dl_threshold} second(s): \n{har_entry_stats}
-    --------------------------------------------------------------------------------
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            analyzed_at_ms INTEGER NOT NULL,
+            har_filename TEXT NOT NULL,
+            browsing_minutes REAL,
+            dl_threshold_ms INTEGER,
+            first_start_time_ms INTEGER,
+            interesting_count INTEGER NOT NULL,
+            image_count INTEGER NOT NULL,
+            image_size INTEGER NOT NULL,
+            image_load_time_ms INTEGER NOT NULL,
+            video_count INTEGER NOT NULL,
+            video_size INTEGER NOT NULL,
+            video_load_time_ms INTEGER NOT NULL,
+            images_score REAL,
+            videos_score REAL,
+            overall_score REAL
+        );
+        CREATE INDEX IF NOT EXISTS runs_analyzed_at_ms ON runs (analyzed_at_ms);
+        CREATE INDEX IF NOT EXISTS runs_har_filename ON runs (har_filename);
+
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+            started_at_ms INTEGER,
+            mime_type TEXT,
+            body_size INTEGER,
+            receive_ms REAL,
+            host TEXT,
+            server_ip TEXT
+        );
+        CREATE INDEX IF NOT EXISTS entries_run_id ON entries (run_id);
+        CREATE INDEX IF NOT EXISTS entries_started_at_ms ON entries (started_at_ms);
+        CREATE INDEX IF NOT EXISTS entries_host ON entries (host, started_at_ms);
+        CREATE INDEX IF NOT EXISTS entries_server_ip ON entries (server_ip, started_at_ms);
     """
-    report_logger.debug(output)
-
-    # create csv
-    csv_filename = f"{root_path}/reports/reports.csv"
-
-    fieldnames = [
-        "date",
-        "har_filename",
-        "images_videos_count",
-        "image_count",
-        "total_image_size",
-        "total_image_load_time",
-        "video_count",
-        "total_video_size",
-        "total_video_load_time",
-        "images_score",
-        "videos_score",
-        "overall_score"
-    ]
-    with open(csv_filename, "a+") as f:
-        dw = csv.DictWriter(
-            f, delimiter=",", fieldnames=fieldnames, lineterminator="\n"
-        )
-        if os.stat(csv_filename).st_size == 0:
-            dw.writeheader()
-
-        dw.writerow(
-            {
-                "date": now,
-                "har_filename": report_entry.har_filename,
-                "images_videos_count": report_entry.num_entries,
-                "image_count": report_entry.overall_image_stats["image_files"],
-                "total_image_size": report_entry.overall_image_stats[
-                    "total_image_size"
-                ],
-                "total_image_load_time": report_entry.overall_image_stats[
-                    "total_image_load_time"
-                ],
-                "video_count": report_entry.overall_video_stats["video_files"],
-                "total_video_size": report_entry.overall_video_stats[
-                    "total_video_size"
-                ],
-                "total_video_load_time": report_entry.overall_video_stats[
-                    "total_video_load_time"
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add_run(
+        self,
+        report_entry: ReportEntry,
+        browsing_time: Optional[float] = None,
+        dl_threshold: Optional[int] = None,
+        analyzed_at: Optional[datetime] = None,
+    ) -> int:
+        """
+            Stores a report and its interesting entries in one transaction, returns the id of the run
+        """
+        analyzed_at = analyzed_at or datetime.now()
+        with self.connection:
+            run_id = self.connection.execute(
+                """
+                    INSERT INTO runs (
+                        analyzed_at_ms, har_filename, browsing_minutes, dl_threshold_ms, first_start_time_ms,
+                        interesting_count, image_count, image_size, image_load_time_ms,
+                        video_count, video_size, video_load_time_ms, images_score, videos_score, overall_score
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    _epoch_ms(analyzed_at),
+                    report_entry.har_filename,
+                    browsing_time,
+                    dl_threshold,
+                    _epoch_ms(report_entry.first_start_time),
+                    report_entry.num_entries,
+                    report_entry.image_stats.count,
+                    report_entry.image_stats.size,
+                    report_entry.image_stats.load_time,
+                    report_entry.video_stats.count,
+                    report_entry.video_stats.size,
+                    report_entry.video_stats.load_time,
+                    report_entry.overall_image_stats["score"],
+                    report_entry.overall_video_stats["score"],
+                    report_entry.overall_score,
+                ),
+            ).lastrowid
+            self.connection.executemany(
+                """
+                    INSERT INTO entries (run_id, started_at_ms, mime_type, body_size, receive_ms, host, server_ip)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        run_id,
+                        _epoch_ms(entry.startTime),
+                        entry.response.mimeType,
+                        entry.response.bodySize,
+                        entry.timings.get("receive"),
+                        urlsplit(entry.url).hostname,
+                        entry.serverAddress,
+                    )
+                    for entry in report_entry.interesting_entries
                 ],
-                "images_score": report_entry.overall_image_stats["score"],
-                "videos_score": report_entry.overall_video_stats["score"],
-                "overall_score": report_entry.overall_score
-            }
-        )
+            )
+        return run_id
+
+    def get_runs(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[sqlite3.Row]:
+        """
+            Runs analyzed in [since, until), oldest first. Naive datetimes are local time.
+        """
+        where, params = _time_range("analyzed_at_ms", since, until)
+        return self.connection.execute(f"SELECT * FROM runs {where} ORDER BY analyzed_at_ms", params).fetchall()
+
+    def get_entries(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        host: Optional[str] = None,
+        server_ip: Optional[str] = None,
+    ) -> List[sqlite3.Row]:
+        """
+            Interesting entries that started in [since, until), optionally only the ones
+            from one host or server IP, oldest first. Naive datetimes are local time.
+        """
+        where, params = _time_range("started_at_ms", since, until)
+        for column, value in (("host", host), ("server_ip", server_ip)):
+            if value is not None:
+                where += f" {'AND' if where else 'WHERE'} {column} = ?"
+                params.append(value)
+        return self.connection.execute(f"SELECT * FROM entries {where} ORDER BY started_at_ms", params).fetchall()
+
+
+def _epoch_ms(value: Optional[datetime]) -> Optional[int]:
+    """
+        Milliseconds since the epoch, naive datetimes are taken as local time like datetime.now()
+    """
+    return round(value.timestamp() * 1000) if value else None
+
+
+def _time_range(column: str, since: Optional[datetime], until: Optional[datetime]):
+    conditions, params = [], []
+    if since is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(_epoch_ms(since))
+    if until is not None:
+        conditions.append(f"{column} < ?")
+        params.append(_epoch_ms(until))
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
 
-    return
+def dump_report(
+    browsing_time: int, report_entry: ReportEntry, root_path: str, dl_threshold: int
+) -> int:
+    """
+    Stores the report in reports/results.db and logs a one line summary of it
+    to reports/reports.txt. Returns the id of the run.
+    """
+    with ResultsStore(f"{root_path}/{RESULTS_DB}") as store:
+        run_id = store.add_run(report_entry, browsing_time, dl_threshold)
+
+    report_logger.debug(
+        f"Run {run_id}: {report_entry.har_filename!r}, browsed for {browsing_time} minute(s), "
+        f"{report_entry.num_entries} images/videos above {ms_to_s(dl_threshold)} second(s), "
+        f"{report_entry.image_stats.describe('images')}, {report_entry.video_stats.describe('videos')}, "
+        f"overall score {report_entry.overall_score}"
+    )
+    return run_id
@@ -1,3 +1,4 @@
+import os
 import psutil
 import logging
 import time
@@ -20,3 +21,71 @@ def kill_existing_proc(proc_names: List[str], kill_wait: Optional[int] = 10):
     time.sleep(kill_wait)
 
     return
+
+
+def terminate_procs(
+    procs: List[psutil.Process], timeout: Optional[float] = 10
+) -> List[psutil.Process]:
+    """
+    Terminates the given processes, and kills the ones that are still running
+    after timeout seconds. Does not wait longer than needed.
+
+    Returns the processes that could not be stopped
+    """
+    alive = []
+    for proc in procs:
+        try:
+            proc.terminate()
+            alive.append(proc)
+        except psutil.NoSuchProcess:
+            pass
+
+    _, alive = psutil.wait_procs(alive, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(alive, timeout=timeout)
+    for proc in alive:
+        logger.warning(f"Process {proc.pid} could not be stopped")
+
+    return alive
+
+
+def wait_for_file(
+    path: str,
+    expected_size: Optional[int] = None,
+    timeout: Optional[float] = 120,
+    poll_interval: Optional[float] = 0.1,
+    max_poll_interval: Optional[float] = 2,
+) -> bool:
+    """
+    Waits for a downloaded file to be complete: it exists, the browser's
+    ``.part`` file is gone and it has the expected size, or if the size is not
+    known, the size did not change between two polls. Polls with an
+    exponential backoff up to max_poll_interval.
+
+    Returns False if the file is not complete after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    last_size = None
+    while True:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+
+        if size is not None and not os.path.exists(f"{path}.part"):
+            if expected_size is not None and size >= expected_size:
+                return True
+            if expected_size is None and size == last_size:
+                return True
+        last_size = size
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(f"{path!r} was not complete after {timeout} seconds")
+            return False
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 2, max_poll_interval)